@@ -24,18 +24,43 @@ module kb_assembly_compare {
 
     /* filter_contigs_by_length()
     **
-    **  Remove Contigs that are under a minimum threshold
+    **  Remove Contigs that are under a minimum threshold, and optionally
+    **  those failing length, composition or rank predicates
     */
     typedef structure {
         workspace_name workspace_name;
 	data_obj_ref   input_assembly_refs;   /* Assemblies or AssemblySets */
-	int            min_contig_length;
+	list<int>      min_contig_length;     /* one output per threshold (a single int is also accepted) */
         data_obj_name  output_name;
+
+	/* optional predicates, applied to every threshold in the same pass */
+	int            max_contig_length;
+	float          min_gc_perc;
+	float          max_gc_perc;
+	float          max_n_perc;
+	int            top_n_longest;         /* keep only the N longest contigs */
+	float          cumulative_perc;       /* keep longest contigs until they hold this % of bases (90 = N90 contigs) */
+
+	bool           preview;               /* only count what would be kept; nothing is written or saved */
     } Filter_Contigs_by_Length_Params;
 
+    /* per assembly and threshold counts returned by preview */
+    typedef structure {
+	data_obj_ref  assembly_ref;
+	data_obj_name assembly_name;
+	int           min_contig_length;
+	int           original_contig_count;
+	int           original_base_count;
+	int           kept_contig_count;
+	int           kept_base_count;
+	int           removed_contig_count;
+	int           removed_base_count;
+    } Filter_Preview_Row;
+
     typedef structure {
 	data_obj_name report_name;
 	data_obj_ref  report_ref;
+	list<Filter_Preview_Row> preview;     /* only set in preview mode */
     } Filter_Contigs_by_Length_Output;
 
     funcdef run_filter_contigs_by_length (Filter_Contigs_by_Length_Params params)  returns (Filter_Contigs_by_Length_Output) authentication required;
@@ -49,6 +74,13 @@ module kb_assembly_compare {
         workspace_name workspace_name;
 	data_obj_ref   input_assembly_refs;   /* Assemblies or AssemblySets */
         /*data_obj_name  output_name;*/
+	list<float>    percentiles;           /* Nx/Lx to report (default 50, 75, 90) */
+	bool           full_nx_curve;         /* also export and plot N1..N100 */
+	list<int>      len_buckets;           /* length thresholds for contig count and sum (default 1M, 100K, 10K, 1K, 500, 1) */
+	bool           approximate;           /* fixed-memory approximate Nx/Lx and histograms for huge assemblies */
+	float          approximate_error_perc; /* relative error bound of approximate mode, in % (default 1) */
+	bool           interactive_report;    /* draw the plots in the browser from a JSON payload instead of PNG/PDF */
+	bool           composition_stats;     /* also report per-contig GC, non-ACGT and softmasked base distributions */
     } Contig_Distribution_Compare_Params;
 
     typedef structure {
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+CacheUtil: on-disk columnar store of per-assembly contig lengths
+
+Entries are keyed by the resolved workspace UPA (wsid/objid/version) and the
+object checksum, so a new version or changed data is never served stale.
+Each entry is the assembly's contig lengths sorted longest first, in one
+.npy column of the smallest unsigned type that holds them (uint32 unless a
+contig reaches 4Gbp), plus optional per-contig attribute columns in the same
+order.  Columns are written once after parsing and opened with
+np.load(mmap_mode='r'), so reading an entry costs page cache rather than
+heap.  The directory is bounded in size and the least recently used entries
+are evicted first.
+"""
+import os
+import re
+
+import numpy as np
+
+CACHE_FILE_EXT = '.npy'
+LENGTH_COLUMN  = 'lens'
+
+# length columns given as distinct lengths and counts are written this many contigs at a time
+WRITE_BLOCK_SIZE = 1 << 20
+
+
+def length_dtype (max_len):
+    """
+    Return the smallest unsigned dtype for contig lengths up to max_len
+    """
+    if max_len < (1 << 32):
+        return np.uint32
+    return np.uint64
+
+
+class StatsCache:
+    """
+    Size-bounded LRU store of sorted contig length columns
+
+    cache_dir: directory holding the entries (created if needed)
+    max_bytes: total size allowed on disk; 0 disables the cache
+
+    Entry <key> is the file <key>.lens.npy and any <key>.<attr>.npy
+    attribute columns.  Recency is the length column's mtime, refreshed on
+    every hit, so several workers can share one directory without any index
+    file.  Eviction removes whole entries.
+    """
+    def __init__ (self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        if self.enabled() and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def enabled (self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def entry_key (upa, checksum):
+        """
+        Return the cache key for a resolved UPA (wsid/objid/version) and object checksum
+
+        Objects without a checksum get None, and are not cached.
+        """
+        if not checksum:
+            return None
+        return re.sub('[^A-Za-z0-9_-]', '_', str(upa)+'-'+str(checksum))
+
+    def entry_path (self, key, column=LENGTH_COLUMN):
+        return os.path.join(self.cache_dir, key+'.'+column+CACHE_FILE_EXT)
+
+    def get (self, key):
+        """
+        Return the cached sorted lengths for key as a read-only memmap, or None on a miss
+
+        An unreadable entry is removed and treated as a miss.
+        """
+        if not self.enabled() or key is None:
+            return None
+        entry_path = self.entry_path(key)
+        lens = self.load_column(entry_path)
+        if lens is None:
+            return None
+        try:
+            os.utime(entry_path, None)  # mark as most recently used
+        except OSError:
+            pass
+        return lens
+
+    def get_attr (self, key, attr):
+        """
+        Return the attribute column attr of key (in length order) as a memmap, or None
+        """
+        if not self.enabled() or key is None:
+            return None
+        return self.load_column(self.entry_path(key, attr))
+
+    def load_column (self, column_path):
+        if not os.path.exists(column_path):
+            return None
+        try:
+            return np.load(column_path, mmap_mode='r', allow_pickle=False)
+        except (OSError, ValueError):
+            self.remove(column_path)
+            return None
+
+    def put (self, key, sorted_lens, attrs=None, counts=None):
+        """
+        Store sorted_lens (and any {name: column} attrs) under key, then evict down to max_bytes
+
+        If counts is given, sorted_lens are distinct lengths longest first and
+        the length column repeats each counts[i] times; it is filled in place
+        in the file rather than expanded in memory (attrs are not allowed then).
+        Each column is written to a temporary file and renamed into place so
+        concurrent readers never see a partial array; the length column is
+        written last, since its presence marks the entry as complete.
+        Returns False if the entry could not be written (e.g. scratch is full).
+        """
+        if not self.enabled() or key is None:
+            return False
+        sorted_lens = np.asarray(sorted_lens)
+        max_len = int(sorted_lens[0]) if sorted_lens.size > 0 else 0
+        columns = []
+        if attrs is not None:
+            for attr in sorted(attrs.keys()):
+                columns.append((self.entry_path(key, attr), np.asarray(attrs[attr]), None))
+        columns.append((self.entry_path(key), sorted_lens.astype(length_dtype(max_len)), counts))
+        for column_path, column, column_counts in columns:
+            if not self.write_column(column_path, column, column_counts):
+                return False
+        self.evict(keep_key=key)
+        return True
+
+    def write_column (self, column_path, column, counts=None):
+        tmp_path = column_path+'.'+str(os.getpid())+'.tmp'
+        try:
+            if counts is None or column.size == 0:
+                with open (tmp_path, 'wb') as column_handle:
+                    np.save(column_handle, column, allow_pickle=False)
+            else:
+                self.write_repeated_column(tmp_path, column, counts)
+            os.replace(tmp_path, column_path)
+        except OSError:
+            self.remove(tmp_path)
+            return False
+        return True
+
+    def write_repeated_column (self, column_path, values, counts, block_size=WRITE_BLOCK_SIZE):
+        """
+        Write each of values counts[i] times as one .npy column, about block_size values at a time
+
+        The blocks go through an ordinary file handle, so a full disk raises
+        OSError as np.save() would.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        cumulative_counts = np.cumsum(counts)
+        header = {'descr': np.lib.format.dtype_to_descr(values.dtype),
+                  'fortran_order': False,
+                  'shape': (int(cumulative_counts[-1]),)}
+        with open (column_path, 'wb') as column_handle:
+            np.lib.format.write_array_header_1_0(column_handle, header)
+            (value_beg, column_beg) = (0, 0)
+            while value_beg < values.size:
+                value_end = int(np.searchsorted(cumulative_counts, column_beg + block_size, side='right'))
+                if value_end <= value_beg:
+                    # one value repeated more than block_size times, written a block at a time
+                    value_end = value_beg + 1
+                    for block_beg in range(column_beg, int(cumulative_counts[value_beg]), block_size):
+                        block_len = min(block_size, int(cumulative_counts[value_beg]) - block_beg)
+                        column_handle.write(np.full(block_len, values[value_beg], dtype=values.dtype).tobytes())
+                else:
+                    column_handle.write(np.repeat(values[value_beg:value_end], counts[value_beg:value_end]).tobytes())
+                (value_beg, column_beg) = (value_end, int(cumulative_counts[value_end - 1]))
+
+    def evict (self, keep_key=None):
+        """
+        Remove least recently used entries until the cache fits in max_bytes
+
+        keep_key (the entry just written) is only removed if it alone is
+        larger than max_bytes.  Returns the bytes left in the cache.
+        """
+        entry_bytes = dict()
+        entry_files = dict()
+        entry_mtime = dict()
+        for column_file in os.listdir(self.cache_dir):
+            if not column_file.endswith(CACHE_FILE_EXT):
+                continue
+            key = column_file.split('.')[0]
+            column_path = os.path.join(self.cache_dir, column_file)
+            try:
+                column_stat = os.stat(column_path)
+            except OSError:
+                continue
+            entry_bytes[key] = entry_bytes.get(key, 0) + column_stat.st_size
+            entry_files.setdefault(key, []).append(column_path)
+            if column_file == key+'.'+LENGTH_COLUMN+CACHE_FILE_EXT or key not in entry_mtime:
+                entry_mtime[key] = column_stat.st_mtime
+        total_bytes = sum(entry_bytes.values())
+        # evictable entries first, oldest first
+        for key in sorted(entry_bytes.keys(), key=lambda key: (key == keep_key, entry_mtime[key])):
+            if total_bytes <= self.max_bytes:
+                break
+            for column_path in entry_files[key]:
+                self.remove(column_path)
+            total_bytes -= entry_bytes[key]
+        return total_bytes
+
+    def remove (self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,1302 @@
+# -*- coding: utf-8 -*-
+"""
+FastaUtil: shared FASTA reading and writing for kb_assembly_compare methods
+
+All readers work in binary mode and never grow a sequence by repeated string
+concatenation, so time is linear in the size of the file regardless of how
+long an individual contig is.  Plain FASTA files are memory-mapped and indexed;
+gzip and BGZF compressed files are streamed without decompressing to disk.
+"""
+import gzip
+import io
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kb_assembly_compare.Utils.ParallelUtil import call_task, run_parallel
+from kb_assembly_compare.Utils.StatsUtil import (composition_from_byte_counts,
+                                                 composition_from_spans,
+                                                 concat_compositions,
+                                                 ContigComposition,
+                                                 LengthAccumulator,
+                                                 LengthSketch,
+                                                 merge_accumulators,
+                                                 merge_sketches)
+
+read_buf_size   = 1 << 20
+write_buf_size  = 1 << 20
+scan_block_size = 1 << 22
+
+# files are only split for parallel scans when each piece would be at least this big
+split_min_size    = 1 << 26
+ranges_per_worker = 4
+
+# contig lengths buffered before being added to a LengthAccumulator or LengthSketch
+accumulate_chunk_size = 1 << 16
+
+# composition: bytes per np.bincount call (keeps its index array in cache), span length from which
+#   byte pairs are counted as uint16, and records shorter than short_record_size are batched
+#   up to composition_batch_size bytes (see StatsUtil.composition_from_spans())
+bincount_block_size    = 1 << 18
+pair_count_min_size    = 1 << 20
+short_record_size      = 1 << 15
+composition_batch_size = 1 << 20
+
+# BGZF blocks inflated per thread per batch, and gzip level for compressed output
+bgzf_blocks_per_thread = 16
+output_compresslevel   = 4
+
+# bytes that never count as sequence
+WHITESPACE = b' \t\r\n\x0b\x0c'
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def fasta_compression (fasta_path):
+    """
+    Return 'bgzf', 'gzip' or None depending on how fasta_path is compressed
+    """
+    with open (fasta_path, 'rb') as fasta_handle:
+        head = fasta_handle.read(18)
+    if not head.startswith(GZIP_MAGIC):
+        return None
+    if len(head) >= 16 and head[3] & 4 and head[12:14] == b'BC':
+        return 'bgzf'
+    return 'gzip'
+
+
+def can_stream_fasta (fasta_path):
+    """
+    True if fasta_path is a plain, gzip or BGZF FASTA that open_fasta() can read
+
+    Anything else (zip, tar, bz2, ...) still needs DataFileUtil.unpack_file().
+    """
+    lower_path = fasta_path.lower()
+    if lower_path.endswith('.tar.gz') or lower_path.endswith('.tgz'):
+        return False
+    if fasta_compression(fasta_path) is not None:
+        return True
+    with open (fasta_path, 'rb') as fasta_handle:
+        head = fasta_handle.read(read_buf_size).lstrip()
+    return head.startswith(b'>') or len(head) == 0
+
+
+def open_fasta (fasta_path, num_threads=1):
+    """
+    Open a plain, gzip or BGZF FASTA for binary reading
+
+    BGZF blocks are inflated by num_threads threads (zlib releases the GIL).
+    """
+    compression = fasta_compression(fasta_path)
+    if compression == 'bgzf':
+        return io.BufferedReader(BgzfReader(fasta_path, num_threads), read_buf_size)
+    if compression == 'gzip':
+        return gzip.open(fasta_path, 'rb')
+    return open (fasta_path, 'rb', read_buf_size)
+
+
+def open_fasta_output (out_path, compress=False):
+    """
+    Open out_path for binary writing, gzip compressed if compress is set
+    """
+    if compress:
+        return gzip.open(out_path, 'wb', compresslevel=output_compresslevel)
+    return open (out_path, 'wb', write_buf_size)
+
+
+class BgzfReader (io.RawIOBase):
+    """
+    Raw reader over the decompressed contents of a BGZF file
+
+    BGZF files are a series of independent gzip members of at most 64 KB, each
+    recording its own compressed size, so batches of blocks can be inflated
+    concurrently and then returned in order.
+    """
+
+    def __init__ (self, fasta_path, num_threads=1):
+        self._handle = open (fasta_path, 'rb')
+        self._num_threads = max(1, num_threads)
+        self._executor = ThreadPoolExecutor(self._num_threads) if self._num_threads > 1 else None
+        self._buf = b''
+        self._buf_pos = 0
+
+    def readable (self):
+        return True
+
+    def readinto (self, out_buf):
+        while self._buf_pos >= len(self._buf):
+            batch = []
+            for block_i in range(self._num_threads * bgzf_blocks_per_thread):
+                block = read_bgzf_block(self._handle)
+                if block is None:
+                    break
+                batch.append(block)
+            if len(batch) == 0:
+                return 0
+            if self._executor is not None:
+                self._buf = b''.join(self._executor.map(inflate_bgzf_block, batch))
+            else:
+                self._buf = b''.join(map(inflate_bgzf_block, batch))
+            self._buf_pos = 0
+        read_len = min(len(out_buf), len(self._buf) - self._buf_pos)
+        out_buf[:read_len] = self._buf[self._buf_pos:self._buf_pos+read_len]
+        self._buf_pos += read_len
+        return read_len
+
+    def close (self):
+        if not self.closed:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._handle.close()
+        super().close()
+
+
+def read_bgzf_block (handle):
+    """
+    Read one BGZF block, returning (deflate_data, crc32, isize) or None at EOF
+    """
+    header = handle.read(12)
+    if len(header) == 0:
+        return None
+    if len(header) < 12 or not header.startswith(GZIP_MAGIC) or not header[3] & 4:
+        raise ValueError ("Bad BGZF block header in "+str(handle.name))
+    xlen = struct.unpack('<H', header[10:12])[0]
+    extra = handle.read(xlen)
+    block_size = None
+    extra_pos = 0
+    while extra_pos + 4 <= len(extra):
+        sub_len = struct.unpack('<H', extra[extra_pos+2:extra_pos+4])[0]
+        if extra[extra_pos:extra_pos+2] == b'BC' and sub_len == 2:
+            block_size = struct.unpack('<H', extra[extra_pos+4:extra_pos+6])[0] + 1
+        extra_pos += 4 + sub_len
+    if block_size is None:
+        raise ValueError ("BGZF block without BC subfield in "+str(handle.name))
+    rest = handle.read(block_size - 12 - xlen)
+    if len(rest) != block_size - 12 - xlen:
+        raise ValueError ("Truncated BGZF block in "+str(handle.name))
+    (crc, isize) = struct.unpack('<II', rest[-8:])
+    return (rest[:-8], crc, isize)
+
+
+def inflate_bgzf_block (block):
+    (deflate_data, crc, isize) = block
+    data = zlib.decompress(deflate_data, -15)
+    if len(data) != isize or zlib.crc32(data) != crc:
+        raise ValueError ("BGZF block failed size or CRC check")
+    return data
+
+
+def iter_contig_lengths (fasta_path, num_threads=1):
+    """
+    Yield the sequence length of each record in fasta_path, in file order
+
+    Reads large binary blocks and counts non-whitespace bytes between headers
+    without building any sequence or per-line objects, so memory use does not
+    depend on contig length.  Records with no sequence yield 0.
+    """
+    with open_fasta (fasta_path, num_threads) as fasta_handle:
+        for seq_len, raw_record in iter_block_records(fasta_handle):
+            yield seq_len
+
+
+def iter_block_records (fasta_handle, keep_raw=False):
+    """
+    Yield (seq_len, raw_record) for each record read from a binary handle
+
+    raw_record is the record's original bytes (header and wrapped sequence)
+    if keep_raw is set, else None.
+    """
+    seen_header = False
+    in_header = False
+    at_line_start = True
+    seq_len = 0
+    raw_chunks = []
+    while True:
+        block = fasta_handle.read(scan_block_size)
+        if not block:
+            break
+        block_len = len(block)
+        raw_from = 0
+        pos = 0
+        while pos < block_len:
+            if in_header:
+                nl = block.find(b'\n', pos)
+                if nl < 0:
+                    break
+                in_header = False
+                pos = nl + 1
+                continue
+
+            # pos is at a line start unless we are continuing a line from the last block
+            if (pos > 0 or at_line_start) and block.startswith(b'>', pos):
+                header_pos = pos
+            else:
+                header_pos = block.find(b'\n>', pos)
+                if header_pos >= 0:
+                    header_pos += 1
+            seg_end = header_pos if header_pos >= 0 else block_len
+            if seen_header and seg_end > pos:
+                seg = block[pos:seg_end]
+                seq_len += len(seg.translate(None, WHITESPACE))
+            if header_pos < 0:
+                break
+            if seen_header:
+                if keep_raw:
+                    raw_chunks.append(block[raw_from:header_pos])
+                    yield (seq_len, b''.join(raw_chunks))
+                else:
+                    yield (seq_len, None)
+            seen_header = True
+            seq_len = 0
+            raw_chunks = []
+            raw_from = header_pos
+            in_header = True
+            pos = header_pos + 1
+        if keep_raw and seen_header:
+            raw_chunks.append(block[raw_from:])
+        at_line_start = block.endswith(b'\n')
+    if seen_header:
+        yield (seq_len, b''.join(raw_chunks) if keep_raw else None)
+
+
+def scan_contig_lengths (fasta_path, num_threads=1):
+    """
+    Return a list of the non-zero contig lengths in fasta_path, in file order
+    """
+    return [seq_len for seq_len in iter_contig_lengths(fasta_path, num_threads) if seq_len > 0]
+
+
+def accumulate_contig_lengths (fasta_path, num_threads=1):
+    """
+    Return a LengthAccumulator of the non-zero contig lengths in fasta_path
+
+    Lengths are added in fixed size chunks as the file streams past, so the
+    full list of lengths is never held.
+    """
+    accumulator = LengthAccumulator()
+    for chunk in iter_length_chunks(iter_contig_lengths(fasta_path, num_threads)):
+        accumulator.add(chunk)
+    return accumulator
+
+
+def sketch_contig_lengths (fasta_path, rel_err, len_buckets, num_threads=1):
+    """
+    Return a LengthSketch of the non-zero contig lengths in fasta_path, without composition
+
+    As accumulate_contig_lengths(), but each chunk is folded into a fixed-size sketch.
+    """
+    sketch = LengthSketch(rel_err, len_buckets)
+    for chunk in iter_length_chunks(iter_contig_lengths(fasta_path, num_threads)):
+        sketch.add_lengths(chunk)
+    return sketch
+
+
+def iter_length_chunks (seq_lens, chunk_size=accumulate_chunk_size):
+    """
+    Yield the non-zero of seq_lens in array('q') chunks of up to chunk_size lengths
+    """
+    chunk = array('q')
+    for seq_len in seq_lens:
+        if seq_len > 0:
+            chunk.append(seq_len)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = array('q')
+    if len(chunk) > 0:
+        yield chunk
+
+
+def filter_fasta_stream (fasta_path, out_paths, min_contig_lengths, compress_output=False, num_threads=1, contig_filter=None):
+    """
+    Streaming filter for compressed input that cannot be memory-mapped
+
+    Each record is read once and written, with its original bytes (so line
+    wrapping is preserved), to every out_paths[i] whose min_contig_lengths[i]
+    it meets and that passes contig_filter (a FilterUtil.ContigFilter).
+    Ranked predicates need the length array first, which for a compressed
+    file costs a length-only scan.  Returns (original_contig_count,
+    [filtered_contig_count, ...]).
+    """
+    ranked_keep = None
+    if contig_filter is not None and contig_filter.needs_lengths():
+        ranked_keep = contig_filter.select_ranked(scan_contig_lengths(fasta_path, num_threads))
+    original_contig_count = 0
+    filtered_contig_counts = [0 for out_path in out_paths]
+    out_handles = []
+    try:
+        for out_path in out_paths:
+            out_handles.append(open_fasta_output(out_path, compress_output))
+        with open_fasta (fasta_path, num_threads) as fasta_handle:
+            for seq_len, raw_record in iter_block_records(fasta_handle, keep_raw=True):
+                if seq_len == 0:
+                    continue
+                original_contig_count += 1
+                if ranked_keep is not None and not ranked_keep[original_contig_count-1]:
+                    continue
+                if contig_filter is not None and not contig_filter.keep(seq_len, raw_record[raw_record.find(b'\n')+1:]):
+                    continue
+                for out_i,min_contig_length in enumerate(min_contig_lengths):
+                    if seq_len >= min_contig_length:
+                        filtered_contig_counts[out_i] += 1
+                        out_handles[out_i].write(raw_record)
+    finally:
+        for out_handle in out_handles:
+            out_handle.close()
+    return (original_contig_count, filtered_contig_counts)
+
+
+def iter_record_spans (fasta_mm, beg=0, end=None, count_lens=True):
+    """
+    Yield (rec_start, seq_start, rec_end, seq_len) for each record in a mmap
+
+    rec_start is the offset of the '>', seq_start the offset just past the
+    header line, and rec_end the offset of the next record's '>' (or end).
+    seq_len counts non-whitespace bytes in [seq_start, rec_end), or is None
+    if not count_lens (for callers that read the bytes anyway).  Only records
+    starting in [beg, end) are visited, so beg and end should be record
+    boundaries such as those from split_fasta_ranges().
+    """
+    if end is None:
+        end = len(fasta_mm)
+    if fasta_mm[beg:beg+1] == b'>' and (beg == 0 or fasta_mm[beg-1:beg] == b'\n'):
+        rec_start = beg
+    else:
+        rec_start = fasta_mm.find(b'\n>', beg, end)
+        if rec_start >= 0:
+            rec_start += 1
+    while rec_start >= 0:
+        nl = fasta_mm.find(b'\n', rec_start, end)
+        if nl < 0:
+            yield (rec_start, end, end, 0)
+            break
+        seq_start = nl + 1
+        next_start = fasta_mm.find(b'\n>', nl, end)
+        rec_end = next_start + 1 if next_start >= 0 else end
+        seq_len = None
+        if count_lens:
+            seq_len = count_seq_bytes(fasta_mm, seq_start, rec_end)
+        yield (rec_start, seq_start, rec_end, seq_len)
+        rec_start = next_start + 1 if next_start >= 0 else -1
+
+
+def count_seq_bytes (buf, beg, end):
+    """
+    Count non-whitespace bytes in buf[beg:end], a block at a time
+    """
+    seq_len = 0
+    for block_beg in range(beg, end, scan_block_size):
+        block_end = min(block_beg + scan_block_size, end)
+        seq_len += len(buf[block_beg:block_end].translate(None, WHITESPACE))
+    return seq_len
+
+
+def count_byte_values (buf, beg=0, end=None):
+    """
+    Return int64 counts of each of the 256 byte values in buf[beg:end]
+
+    The bytes are viewed in place (no copy out of a mmap) and counted with
+    np.bincount a cache-sized block at a time.  Long spans are viewed as
+    uint16 byte pairs, halving the elements counted, and the 65536 pair
+    counts are folded back into byte counts.
+    """
+    if end is None:
+        end = len(buf)
+    if end - beg < pair_count_min_size:
+        byte_counts = np.zeros(256, dtype=np.int64)
+        for block_beg in range(beg, end, bincount_block_size):
+            block_end = min(block_beg + bincount_block_size, end)
+            byte_counts += np.bincount(np.frombuffer(buf, dtype=np.uint8, count=block_end - block_beg, offset=block_beg),
+                                       minlength=256)
+        return byte_counts
+    pairs_end = end - ((end - beg) % 2)
+    pair_counts = np.zeros(1 << 16, dtype=np.int64)
+    for block_beg in range(beg, pairs_end, bincount_block_size):
+        block_end = min(block_beg + bincount_block_size, pairs_end)
+        pair_counts += np.bincount(np.frombuffer(buf, dtype=np.uint16, count=(block_end - block_beg) // 2, offset=block_beg),
+                                   minlength=1 << 16)
+    pair_counts = pair_counts.reshape(256, 256)
+    byte_counts = pair_counts.sum(axis=0) + pair_counts.sum(axis=1)
+    if pairs_end < end:
+        byte_counts[buf[pairs_end]] += 1
+    return byte_counts
+
+
+def copy_spans (in_fd, fasta_mm, out_handle, spans):
+    """
+    Copy byte ranges of the input straight to out_handle
+
+    Adjacent spans are coalesced into one copy.  os.copy_file_range() is used
+    where the platform supports it so the data never passes through Python;
+    otherwise the spans are written as large slices of the mmap.
+    """
+    out_handle.flush()
+    out_fd = out_handle.fileno()
+    use_copy_file_range = hasattr(os, 'copy_file_range')
+    for beg, end in coalesce_spans(spans):
+        while beg < end:
+            if use_copy_file_range:
+                try:
+                    copied = os.copy_file_range(in_fd, out_fd, end - beg, beg)
+                except OSError:
+                    use_copy_file_range = False
+                    continue
+                if copied == 0:
+                    use_copy_file_range = False
+                    continue
+            else:
+                copied = os.write(out_fd, fasta_mm[beg:min(end, beg + write_buf_size)])
+            beg += copied
+
+
+def coalesce_spans (spans):
+    """
+    Merge (beg, end) spans that touch, preserving order
+    """
+    merged_beg = merged_end = None
+    for beg, end in spans:
+        if merged_end is not None and beg == merged_end:
+            merged_end = end
+            continue
+        if merged_end is not None:
+            yield (merged_beg, merged_end)
+        merged_beg, merged_end = beg, end
+    if merged_end is not None:
+        yield (merged_beg, merged_end)
+
+
+def scan_contig_lengths_range (fasta_path, beg, end):
+    """
+    Return the non-zero lengths of the records starting in [beg, end), in file order
+    """
+    with open (fasta_path, 'rb') as fasta_handle:
+        if os.fstat(fasta_handle.fileno()).st_size == 0:
+            return []
+        fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return [seq_len for rec_start, seq_start, rec_end, seq_len in iter_record_spans(fasta_mm, beg, end)
+                    if seq_len > 0]
+        finally:
+            fasta_mm.close()
+
+
+def accumulate_contig_lengths_range (fasta_path, beg, end):
+    """
+    Return a LengthAccumulator of the non-zero lengths of the records starting in [beg, end)
+    """
+    return LengthAccumulator(array('q', scan_contig_lengths_range(fasta_path, beg, end)))
+
+
+def sketch_contig_lengths_range (fasta_path, beg, end, rel_err, len_buckets):
+    """
+    Return a LengthSketch of the non-zero lengths of the records starting in [beg, end), without composition
+    """
+    return LengthSketch(rel_err, len_buckets).add_lengths(array('q', scan_contig_lengths_range(fasta_path, beg, end)))
+
+
+def contig_composition_range (fasta_path, beg, end):
+    """
+    Return a ContigComposition of the non-empty records starting in [beg, end), in file order
+    """
+    return nonempty_composition(concat_compositions(list(iter_composition_batches_range(fasta_path, beg, end))))
+
+
+def contig_composition_stream (fasta_path, num_threads=1):
+    """
+    Return a ContigComposition of the non-empty records of a (compressed) FASTA stream, in file order
+    """
+    return nonempty_composition(concat_compositions(list(iter_composition_batches_stream(fasta_path, num_threads))))
+
+
+def contig_sketch_range (fasta_path, beg, end, rel_err, len_buckets):
+    """
+    Return a LengthSketch of the records starting in [beg, end), folding in one batch at a time
+    """
+    sketch = LengthSketch(rel_err, len_buckets)
+    for composition in iter_composition_batches_range(fasta_path, beg, end):
+        sketch.add(composition)
+    return sketch
+
+
+def contig_sketch_stream (fasta_path, rel_err, len_buckets, num_threads=1):
+    """
+    Return a LengthSketch of the records of a (compressed) FASTA stream, folding in one batch at a time
+    """
+    sketch = LengthSketch(rel_err, len_buckets)
+    for composition in iter_composition_batches_stream(fasta_path, num_threads):
+        sketch.add(composition)
+    return sketch
+
+
+def iter_composition_batches_range (fasta_path, beg, end):
+    """
+    Yield ContigCompositions of the records starting in [beg, end), in file order
+
+    Short records are counted in batches of up to composition_batch_size
+    bytes straight from the mmap and long ones one at a time with
+    count_byte_values().  Empty records may be included.
+    """
+    with open (fasta_path, 'rb') as fasta_handle:
+        if os.fstat(fasta_handle.fileno()).st_size == 0:
+            return
+        fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            batch_begs = []
+            batch_ends = []
+            for rec_start, seq_start, rec_end, seq_len in iter_record_spans(fasta_mm, beg, end, count_lens=False):
+                if rec_end - seq_start < short_record_size:
+                    if rec_end > seq_start:
+                        batch_begs.append(seq_start)
+                        batch_ends.append(rec_end)
+                        if rec_end - batch_begs[0] >= composition_batch_size:
+                            yield batch_composition(fasta_mm, batch_begs, batch_ends)
+                            batch_begs = []
+                            batch_ends = []
+                    continue
+                if len(batch_begs) > 0:
+                    yield batch_composition(fasta_mm, batch_begs, batch_ends)
+                    batch_begs = []
+                    batch_ends = []
+                yield record_composition(count_byte_values(fasta_mm, seq_start, rec_end))
+            yield batch_composition(fasta_mm, batch_begs, batch_ends)
+        finally:
+            fasta_mm.close()
+
+
+def iter_composition_batches_stream (fasta_path, num_threads=1):
+    """
+    Yield ContigCompositions of the records of a (compressed) FASTA stream, batched as iter_composition_batches_range()
+    """
+    batch_seqs = []
+    batch_size = 0
+    for seq_len, seq_bytes in iter_streamed_seqs(fasta_path, num_threads):
+        if len(seq_bytes) >= short_record_size:
+            yield joined_batch_composition(batch_seqs)
+            batch_seqs = []
+            batch_size = 0
+            yield record_composition(count_byte_values(seq_bytes))
+            continue
+        batch_seqs.append(seq_bytes)
+        batch_size += len(seq_bytes)
+        if batch_size >= composition_batch_size:
+            yield joined_batch_composition(batch_seqs)
+            batch_seqs = []
+            batch_size = 0
+    yield joined_batch_composition(batch_seqs)
+
+
+def batch_composition (fasta_mm, batch_begs, batch_ends):
+    """
+    Return the ContigComposition of short record spans of a mmap, read as one uint8 view
+    """
+    if len(batch_begs) == 0:
+        return ContigComposition()
+    batch_beg = batch_begs[0]
+    batch_bytes = np.frombuffer(fasta_mm, dtype=np.uint8, count=batch_ends[-1] - batch_beg, offset=batch_beg)
+    composition = composition_from_spans(batch_bytes,
+                                         np.asarray(batch_begs, dtype=np.int64) - batch_beg,
+                                         np.asarray(batch_ends, dtype=np.int64) - batch_beg)
+    del batch_bytes  # release the view so the mmap can be closed
+    return composition
+
+
+def joined_batch_composition (batch_seqs):
+    """
+    Return the ContigComposition of a list of short record sequences
+    """
+    batch_seqs = [seq_bytes for seq_bytes in batch_seqs if len(seq_bytes) > 0]
+    if len(batch_seqs) == 0:
+        return ContigComposition()
+    batch_ends = np.cumsum([len(seq_bytes) for seq_bytes in batch_seqs], dtype=np.int64)
+    return composition_from_spans(np.frombuffer(b''.join(batch_seqs), dtype=np.uint8),
+                                  batch_ends - np.array([len(seq_bytes) for seq_bytes in batch_seqs], dtype=np.int64),
+                                  batch_ends)
+
+
+def record_composition (byte_counts):
+    return ContigComposition(*[[val] for val in composition_from_byte_counts(byte_counts)])
+
+
+def nonempty_composition (composition):
+    """
+    Drop records with no sequence (e.g. only whitespace after the header)
+    """
+    nonempty = composition.lens > 0
+    if bool(np.all(nonempty)):
+        return composition
+    return ContigComposition(*[getattr(composition, column)[nonempty] for column in ContigComposition.columns])
+
+
+def split_fasta_ranges (fasta_path, num_ranges):
+    """
+    Split fasta_path into at most num_ranges byte ranges that begin on records
+
+    Each boundary is moved forward to the next '>' at the start of a line, so
+    every record lies wholly inside one range.  Returns [(beg, end), ...]
+    covering the whole file in order.
+    """
+    file_size = os.path.getsize(fasta_path)
+    if file_size == 0:
+        return []
+    if num_ranges <= 1:
+        return [(0, file_size)]
+    boundaries = [0]
+    with open (fasta_path, 'rb') as fasta_handle:
+        fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for range_i in range(1, num_ranges):
+                target = max(boundaries[-1] + 1, (file_size * range_i) // num_ranges)
+                if target >= file_size:
+                    break
+                header_pos = fasta_mm.find(b'\n>', target - 1)
+                if header_pos < 0:
+                    break
+                boundaries.append(header_pos + 1)
+        finally:
+            fasta_mm.close()
+    boundaries.append(file_size)
+    return [(boundaries[i], boundaries[i+1]) for i in range(len(boundaries)-1)
+            if boundaries[i+1] > boundaries[i]]
+
+
+def plan_fasta_ranges (fasta_paths, num_workers):
+    """
+    Split a list of files into [(file_i, beg, end), ...] tasks for a worker pool
+
+    Files larger than split_min_size are cut into record-aligned ranges so a
+    single very large assembly can use every worker; smaller files are one
+    task each.  Tasks are listed in file order, then byte order.
+    """
+    file_sizes = [os.path.getsize(fasta_path) for fasta_path in fasta_paths]
+    range_size = max(split_min_size, sum(file_sizes) // max(1, num_workers * ranges_per_worker))
+    tasks = []
+    for file_i,fasta_path in enumerate(fasta_paths):
+        num_ranges = 1
+        if num_workers > 1:
+            num_ranges = max(1, min(num_workers * ranges_per_worker, file_sizes[file_i] // range_size))
+        for beg, end in split_fasta_ranges(fasta_path, num_ranges):
+            tasks.append((file_i, beg, end))
+    return tasks
+
+
+class FastaIndex:
+    """
+    Per-record index of a FASTA file, compatible with samtools .fai files
+
+    Columns are kept as parallel arrays (name, length, offset, line_bases,
+    line_bytes) in file order; offset is the byte offset of the first base.
+    regular is False if any record has uneven line wrapping, in which case the
+    index is still valid for lengths and record ranges but is not written as a
+    .fai sidecar, since samtools would reject it.
+    """
+
+    def __init__ (self):
+        self.names      = []
+        self.lengths    = array('Q')
+        self.offsets    = array('Q')
+        self.line_bases = array('Q')
+        self.line_bytes = array('Q')
+        self.regular    = True
+
+    def __len__ (self):
+        return len(self.names)
+
+    def append (self, name, length, offset, line_bases, line_bytes):
+        self.names.append(name)
+        self.lengths.append(length)
+        self.offsets.append(offset)
+        self.line_bases.append(line_bases)
+        self.line_bytes.append(line_bytes)
+
+    def extend (self, other):
+        self.names.extend(other.names)
+        self.lengths.extend(other.lengths)
+        self.offsets.extend(other.offsets)
+        self.line_bases.extend(other.line_bases)
+        self.line_bytes.extend(other.line_bytes)
+        self.regular = self.regular and other.regular
+
+    def contig_lengths (self):
+        """
+        Return the non-zero contig lengths, in file order
+        """
+        return [seq_len for seq_len in self.lengths if seq_len > 0]
+
+    def slice (self, rec_beg, rec_end):
+        """
+        Return a FastaIndex of records rec_beg to rec_end-1
+        """
+        fasta_index = FastaIndex()
+        fasta_index.names      = self.names[rec_beg:rec_end]
+        fasta_index.lengths    = self.lengths[rec_beg:rec_end]
+        fasta_index.offsets    = self.offsets[rec_beg:rec_end]
+        fasta_index.line_bases = self.line_bases[rec_beg:rec_end]
+        fasta_index.line_bytes = self.line_bytes[rec_beg:rec_end]
+        fasta_index.regular    = self.regular
+        return fasta_index
+
+    def record_spans (self, fasta_mm, end=None):
+        """
+        Return (rec_start, rec_end) byte ranges of every record, header included
+
+        The last record ends at end, or at the end of the file.
+        """
+        if end is None:
+            end = len(fasta_mm)
+        rec_starts = [fasta_mm.rfind(b'\n>', 0, offset) + 1 for offset in self.offsets]
+        rec_ends = rec_starts[1:] + [end]
+        return list(zip(rec_starts, rec_ends))
+
+    def write (self, fai_path):
+        with open (fai_path, 'w') as fai_handle:
+            for rec_i,name in enumerate(self.names):
+                fai_handle.write("\t".join([name,
+                                            str(self.lengths[rec_i]),
+                                            str(self.offsets[rec_i]),
+                                            str(self.line_bases[rec_i]),
+                                            str(self.line_bytes[rec_i])])+"\n")
+
+    @classmethod
+    def read (cls, fai_path):
+        fasta_index = cls()
+        with open (fai_path, 'r') as fai_handle:
+            for fai_line in fai_handle:
+                fields = fai_line.rstrip("\n").split("\t")
+                if len(fields) < 5:
+                    raise ValueError ("Bad FASTA index line in "+fai_path+": '"+fai_line.rstrip()+"'")
+                fasta_index.append(fields[0], int(fields[1]), int(fields[2]), int(fields[3]), int(fields[4]))
+        return fasta_index
+
+
+def index_fasta_range (fasta_path, beg, end):
+    """
+    Build a FastaIndex for the records starting in [beg, end) of fasta_path
+    """
+    fasta_index = FastaIndex()
+    with open (fasta_path, 'rb') as fasta_handle:
+        if os.fstat(fasta_handle.fileno()).st_size == 0:
+            return fasta_index
+        fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for rec_start, seq_start, rec_end, seq_len in iter_record_spans(fasta_mm, beg, end):
+                header = fasta_mm[rec_start+1:seq_start].split(None, 1)
+                name = header[0].decode('utf-8', 'replace') if header else ''
+                first_nl = fasta_mm.find(b'\n', seq_start, rec_end)
+                if seq_len == 0:
+                    (line_bases, line_bytes) = (0, 0)
+                elif first_nl < 0:
+                    (line_bases, line_bytes) = (seq_len, rec_end - seq_start)
+                else:
+                    line_bytes = first_nl + 1 - seq_start
+                    line_bases = len(fasta_mm[seq_start:first_nl+1].translate(None, WHITESPACE))
+                    if fasta_index.regular:
+                        fasta_index.regular = has_regular_lines(fasta_mm, seq_start, rec_end, line_bytes)
+                fasta_index.append(name, seq_len, seq_start, line_bases, line_bytes)
+        finally:
+            fasta_mm.close()
+    return fasta_index
+
+
+def has_regular_lines (buf, beg, end, line_bytes):
+    """
+    True if every line in buf[beg:end] but the last is exactly line_bytes long
+
+    Checks that a newline sits at every multiple of line_bytes and that there
+    are no other newlines, using strided slices rather than per-line Python.
+    """
+    num_full_lines = (end - beg) // line_bytes
+    if buf[beg+line_bytes-1:end:line_bytes].count(b'\n') != num_full_lines:
+        return False
+    num_newlines = 0
+    for block_beg in range(beg, end, scan_block_size):
+        num_newlines += buf[block_beg:min(block_beg + scan_block_size, end)].count(b'\n')
+    expected_newlines = num_full_lines
+    if (end - beg) % line_bytes != 0 and buf[end-1:end] == b'\n':
+        expected_newlines += 1
+    return num_newlines == expected_newlines
+
+
+def fasta_index_path (fasta_path):
+    return fasta_path+'.fai'
+
+
+def fresh_fasta_index_path (fasta_path):
+    """
+    Return the path of the .fai sidecar of fasta_path, or None if missing or stale
+    """
+    fai_path = fasta_index_path(fasta_path)
+    if not os.path.exists(fai_path) or os.path.getmtime(fai_path) < os.path.getmtime(fasta_path):
+        return None
+    return fai_path
+
+
+def load_fasta_index (fasta_path):
+    """
+    Return the FastaIndex from the .fai sidecar of fasta_path, or None if missing or stale
+    """
+    fai_path = fresh_fasta_index_path(fasta_path)
+    if fai_path is None:
+        return None
+    return FastaIndex.read(fai_path)
+
+
+def accumulate_fai_lengths (fai_path):
+    """
+    Return a LengthAccumulator of the non-zero lengths in the length column of a .fai file
+
+    Only the length column is parsed, so record names are never held.
+    """
+    accumulator = LengthAccumulator()
+    for chunk in iter_length_chunks(iter_fai_lengths(fai_path)):
+        accumulator.add(chunk)
+    return accumulator
+
+
+def sketch_fai_lengths (fai_path, rel_err, len_buckets):
+    """
+    Return a LengthSketch of the non-zero lengths in the length column of a .fai file
+    """
+    sketch = LengthSketch(rel_err, len_buckets)
+    for chunk in iter_length_chunks(iter_fai_lengths(fai_path)):
+        sketch.add_lengths(chunk)
+    return sketch
+
+
+def iter_fai_lengths (fai_path):
+    """
+    Yield the length column of a .fai file, in file order
+    """
+    with open (fai_path, 'rb') as fai_handle:
+        for fai_line in fai_handle:
+            fields = fai_line.split(b'\t', 2)
+            if len(fields) < 3:
+                raise ValueError ("Bad FASTA index line in "+fai_path+": '"+fai_line.decode('utf-8', 'replace').rstrip()+"'")
+            yield int(fields[1])
+
+
+def build_fasta_indexes_parallel (fasta_paths, num_workers):
+    """
+    Return a FastaIndex for each of fasta_paths, reusing fresh .fai sidecars
+
+    Files without a usable sidecar are indexed in record-aligned ranges in a
+    process pool, and a samtools-compatible .fai is written next to each one
+    with regular line wrapping so later steps (and methods) can reuse it.
+    """
+    indexes = [load_fasta_index(fasta_path) for fasta_path in fasta_paths]
+    todo = [file_i for file_i,fasta_index in enumerate(indexes) if fasta_index is None]
+    if len(todo) == 0:
+        return indexes
+    todo_paths = [fasta_paths[file_i] for file_i in todo]
+    tasks = plan_fasta_ranges(todo_paths, num_workers)
+    range_indexes = run_parallel(index_fasta_range,
+                                 [(todo_paths[todo_i], beg, end) for todo_i, beg, end in tasks],
+                                 num_workers)
+    for file_i in todo:
+        indexes[file_i] = FastaIndex()
+    for task_i,(todo_i, beg, end) in enumerate(tasks):
+        indexes[todo[todo_i]].extend(range_indexes[task_i])
+    for file_i in todo:
+        if indexes[file_i].regular:
+            indexes[file_i].write(fasta_index_path(fasta_paths[file_i]))
+    return indexes
+
+
+def build_fasta_index (fasta_path):
+    """
+    Return the FastaIndex for fasta_path, building and writing its .fai if needed
+    """
+    return build_fasta_indexes_parallel([fasta_path], 1)[0]
+
+
+def filter_fasta_by_length (fasta_path, out_paths, min_contig_lengths, fasta_index=None, compress_output=False, contig_filter=None,
+                            ranked_keep=None, span_end=None):
+    """
+    Copy the records of fasta_path with at least min_contig_lengths[i] bases to out_paths[i]
+
+    Record ranges come from the FASTA index, and kept records are copied byte
+    for byte, so sequences are never decoded and their line wrapping is
+    preserved.  A single uncompressed output is copied with copy_spans(); with
+    several thresholds each record is read once and routed to every output it
+    qualifies for.  Records must also pass contig_filter (a
+    FilterUtil.ContigFilter), whose ranked predicates are resolved from the
+    index lengths and whose composition predicates read only the sequence
+    bytes of each record.  To filter one range of the file, pass the slice
+    of its index, the byte offset span_end where the range ends, and the
+    ranked_keep flags of those records, selected over the whole file.
+    Returns (original_contig_count, [filtered_contig_count, ...]), not
+    counting empty records.
+    """
+    if fasta_index is None:
+        fasta_index = build_fasta_index(fasta_path)
+    original_contig_count = 0
+    filtered_contig_counts = [0 for out_path in out_paths]
+    out_handles = []
+    with open (fasta_path, 'rb') as fasta_handle:
+        try:
+            for out_path in out_paths:
+                out_handles.append(open_fasta_output(out_path, compress_output))
+            if os.fstat(fasta_handle.fileno()).st_size == 0:
+                return (0, filtered_contig_counts)
+            fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                # route each record to the outputs whose threshold it meets
+                if ranked_keep is None and contig_filter is not None:
+                    ranked_keep = contig_filter.select_ranked(fasta_index.lengths)
+                routed_spans = []
+                for rec_i,rec_span in enumerate(fasta_index.record_spans(fasta_mm, span_end)):
+                    seq_len = fasta_index.lengths[rec_i]
+                    if seq_len == 0:
+                        continue
+                    original_contig_count += 1
+                    if ranked_keep is not None and not ranked_keep[rec_i]:
+                        continue
+                    if contig_filter is not None:
+                        seq_bytes = None
+                        if contig_filter.needs_composition():
+                            seq_bytes = fasta_mm[fasta_index.offsets[rec_i]:rec_span[1]]
+                        if not contig_filter.keep(seq_len, seq_bytes):
+                            continue
+                    out_is = tuple(out_i for out_i,min_contig_length in enumerate(min_contig_lengths)
+                                   if seq_len >= min_contig_length)
+                    for out_i in out_is:
+                        filtered_contig_counts[out_i] += 1
+                    if len(out_is) > 0:
+                        routed_spans.append((out_is, rec_span))
+                if len(out_handles) == 1 and not compress_output:
+                    copy_spans(fasta_handle.fileno(), fasta_mm, out_handles[0],
+                               [rec_span for out_is, rec_span in routed_spans])
+                else:
+                    route_spans(fasta_mm, out_handles, routed_spans)
+            finally:
+                fasta_mm.close()
+        finally:
+            for out_handle in out_handles:
+                out_handle.close()
+    return (original_contig_count, filtered_contig_counts)
+
+
+def route_spans (fasta_mm, out_handles, routed_spans):
+    """
+    Write each (out_is, (beg, end)) span of the mmap to out_handles[out_i] for out_i in out_is
+
+    Neighbouring spans bound for the same outputs are merged, and each merged
+    range is read from the map once, a block at a time, however many outputs
+    receive it.
+    """
+    merged_out_is = merged_beg = merged_end = None
+    for out_is, (beg, end) in routed_spans + [(None, (None, None))]:
+        if merged_end is not None and out_is == merged_out_is and beg == merged_end:
+            merged_end = end
+            continue
+        if merged_end is not None:
+            for block_beg in range(merged_beg, merged_end, write_buf_size):
+                block = fasta_mm[block_beg:min(merged_end, block_beg + write_buf_size)]
+                for out_i in merged_out_is:
+                    out_handles[out_i].write(block)
+        (merged_out_is, merged_beg, merged_end) = (out_is, beg, end)
+
+
+def preview_filter_by_length (fasta_path, min_contig_lengths, fasta_index=None, contig_filter=None, num_threads=1):
+    """
+    Count what filter_fasta_by_length() would keep for each of min_contig_lengths, writing nothing
+
+    Plain files are counted from their FASTA index and compressed files from
+    a length-only scan; sequence bytes are only read if contig_filter has
+    composition predicates.  Returns (original_contig_count,
+    original_base_count, [filtered_contig_count, ...], [filtered_base_count, ...]),
+    not counting empty records.
+    """
+    needs_composition = contig_filter is not None and contig_filter.needs_composition()
+    if fasta_compression(fasta_path) is None:
+        if fasta_index is None:
+            fasta_index = build_fasta_index(fasta_path)
+        lengths = fasta_index.contig_lengths()
+        records = iter_indexed_seqs(fasta_path, fasta_index, needs_composition)
+    elif needs_composition:
+        lengths = None
+        records = iter_streamed_seqs(fasta_path, num_threads)
+    else:
+        lengths = scan_contig_lengths(fasta_path, num_threads)
+        records = ((seq_len, None) for seq_len in lengths)
+    ranked_keep = None
+    if contig_filter is not None and contig_filter.needs_lengths():
+        if lengths is None:
+            lengths = scan_contig_lengths(fasta_path, num_threads)
+        ranked_keep = contig_filter.select_ranked(lengths)
+
+    original_contig_count = 0
+    original_base_count = 0
+    filtered_contig_counts = [0 for min_contig_length in min_contig_lengths]
+    filtered_base_counts = [0 for min_contig_length in min_contig_lengths]
+    for contig_i,(seq_len, seq_bytes) in enumerate(records):
+        original_contig_count += 1
+        original_base_count += seq_len
+        if ranked_keep is not None and not ranked_keep[contig_i]:
+            continue
+        if contig_filter is not None and not contig_filter.keep(seq_len, seq_bytes):
+            continue
+        for thresh_i,min_contig_length in enumerate(min_contig_lengths):
+            if seq_len >= min_contig_length:
+                filtered_contig_counts[thresh_i] += 1
+                filtered_base_counts[thresh_i] += seq_len
+    return (original_contig_count, original_base_count, filtered_contig_counts, filtered_base_counts)
+
+
+def iter_indexed_seqs (fasta_path, fasta_index, with_seq=False):
+    """
+    Yield (seq_len, seq_bytes or None) for each non-empty record of an indexed plain FASTA
+    """
+    if not with_seq:
+        for seq_len in fasta_index.lengths:
+            if seq_len > 0:
+                yield (seq_len, None)
+        return
+    with open (fasta_path, 'rb') as fasta_handle:
+        if os.fstat(fasta_handle.fileno()).st_size == 0:
+            return
+        fasta_mm = mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for rec_i,rec_span in enumerate(fasta_index.record_spans(fasta_mm)):
+                seq_len = fasta_index.lengths[rec_i]
+                if seq_len > 0:
+                    yield (seq_len, fasta_mm[fasta_index.offsets[rec_i]:rec_span[1]])
+        finally:
+            fasta_mm.close()
+
+
+def iter_streamed_seqs (fasta_path, num_threads=1):
+    """
+    Yield (seq_len, seq_bytes) for each non-empty record of a (compressed) FASTA stream
+    """
+    with open_fasta (fasta_path, num_threads) as fasta_handle:
+        for seq_len, raw_record in iter_block_records(fasta_handle, keep_raw=True):
+            if seq_len > 0:
+                yield (seq_len, raw_record[raw_record.find(b'\n')+1:])
+
+
+def split_by_compression (fasta_paths):
+    """
+    Return (plain_file_is, compressed_file_is) for a list of FASTA paths
+    """
+    plain_file_is = []
+    compressed_file_is = []
+    for file_i,fasta_path in enumerate(fasta_paths):
+        if fasta_compression(fasta_path) is None:
+            plain_file_is.append(file_i)
+        else:
+            compressed_file_is.append(file_i)
+    return (plain_file_is, compressed_file_is)
+
+
+def reduce_fasta_parallel (fasta_paths, num_workers, range_func, stream_func, merge_func, task_args=(), file_tasks=None):
+    """
+    Run range_func or stream_func over every file in a process pool, and merge the results per file
+
+    Plain files are cut into record-aligned ranges (see plan_fasta_ranges()),
+    each read by range_func(fasta_path, beg, end, *task_args).  Compressed
+    files are streamed one per worker by stream_func(fasta_path, *task_args,
+    num_threads), sharing num_workers threads between them.  file_tasks
+    optionally maps a file index to a (func, args) task that replaces its
+    scan.  Each file's results, in byte order, are passed to
+    merge_func(results, *task_args), and one merged result is returned per
+    file, in the order of fasta_paths.
+    """
+    if file_tasks is None:
+        file_tasks = dict()
+    (plain_file_is, compressed_file_is) = split_by_compression(fasta_paths)
+    plain_file_is = [file_i for file_i in plain_file_is if file_i not in file_tasks]
+    compressed_file_is = [file_i for file_i in compressed_file_is if file_i not in file_tasks]
+    task_file_is = []
+    task_funcs = []
+    for file_i in sorted(file_tasks.keys()):
+        task_file_is.append(file_i)
+        task_funcs.append(file_tasks[file_i])
+    plain_paths = [fasta_paths[file_i] for file_i in plain_file_is]
+    for plain_i, beg, end in plan_fasta_ranges(plain_paths, num_workers):
+        task_file_is.append(plain_file_is[plain_i])
+        task_funcs.append((range_func, (plain_paths[plain_i], beg, end) + tuple(task_args)))
+    num_threads = max(1, num_workers // max(1, len(compressed_file_is)))
+    for file_i in compressed_file_is:
+        task_file_is.append(file_i)
+        task_funcs.append((stream_func, (fasta_paths[file_i],) + tuple(task_args) + (num_threads,)))
+    task_results = run_parallel(call_task, task_funcs, num_workers)
+    file_results = [[] for fasta_path in fasta_paths]
+    for task_i,file_i in enumerate(task_file_is):
+        file_results[file_i].append(task_results[task_i])
+        task_results[task_i] = None
+    return [merge_func(results, *task_args) for results in file_results]
+
+
+def contig_length_stats_parallel (fasta_paths, num_workers):
+    """
+    Return one LengthAccumulator of non-zero contig lengths per file, using a process pool
+
+    Plain files with a fresh .fai sidecar (e.g. from an earlier filter run)
+    are read from its length column without touching the sequence.  Other
+    plain files are scanned in record-aligned ranges and the per-range
+    accumulators are merged, in any order, into one per file; no index is
+    built for them, since that would hold every record name.  Compressed
+    files are streamed (see reduce_fasta_parallel()).  Workers only send
+    back compact distinct-length counts, never a list of every length.
+    """
+    file_tasks = dict()
+    for file_i,fasta_path in enumerate(fasta_paths):
+        if fasta_compression(fasta_path) is None:
+            fai_path = fresh_fasta_index_path(fasta_path)
+            if fai_path is not None:
+                file_tasks[file_i] = (accumulate_fai_lengths, (fai_path,))
+    return reduce_fasta_parallel(fasta_paths, num_workers, accumulate_contig_lengths_range, accumulate_contig_lengths,
+                                 merge_accumulators, file_tasks=file_tasks)
+
+
+def contig_length_sketch_parallel (fasta_paths, num_workers, rel_err, len_buckets):
+    """
+    Return one LengthSketch(rel_err, len_buckets) of non-zero contig lengths per file, using a process pool
+
+    Work is split as in contig_length_stats_parallel(), fresh .fai sidecars
+    included, but each task folds its lengths into a fixed-size sketch, so
+    the sketches are merged without any per-contig or per-length values.
+    The sketches have no composition.
+    """
+    file_tasks = dict()
+    for file_i,fasta_path in enumerate(fasta_paths):
+        if fasta_compression(fasta_path) is None:
+            fai_path = fresh_fasta_index_path(fasta_path)
+            if fai_path is not None:
+                file_tasks[file_i] = (sketch_fai_lengths, (fai_path, rel_err, len_buckets))
+    return reduce_fasta_parallel(fasta_paths, num_workers, sketch_contig_lengths_range, sketch_contig_lengths,
+                                 merge_sketches, (rel_err, len_buckets), file_tasks)
+
+
+def contig_composition_parallel (fasta_paths, num_workers):
+    """
+    Return one ContigComposition of non-empty contigs per file, in file order, using a process pool
+
+    Work is split as in reduce_fasta_parallel(); every sequence byte is read
+    once, so lengths come from the same pass.
+    """
+    return reduce_fasta_parallel(fasta_paths, num_workers, contig_composition_range, contig_composition_stream,
+                                 concat_compositions)
+
+
+def contig_sketch_parallel (fasta_paths, num_workers, rel_err, len_buckets):
+    """
+    Return one LengthSketch(rel_err, len_buckets) per file, using a process pool
+
+    Work is split as in contig_composition_parallel(), but each task folds
+    its batches into a fixed-size sketch as it reads, so neither workers nor
+    the parent hold per-contig values.
+    """
+    return reduce_fasta_parallel(fasta_paths, num_workers, contig_sketch_range, contig_sketch_stream,
+                                 merge_sketches, (rel_err, len_buckets))
+
+
+def filter_fasta_by_length_parallel (fasta_paths, out_paths, min_contig_lengths, num_workers, compress_output=False, contig_filter=None):
+    """
+    Filter each of fasta_paths into out_paths[file_i][i] by min_contig_lengths[i], using a process pool
+
+    Plain files are filtered from their FASTA indexes, built (or reused) in
+    parallel across and within files.  Large plain files are filtered in the
+    record-aligned ranges of plan_fasta_ranges(), each task getting the slice
+    of the index for its records: the first range writes out_paths directly,
+    the others write .part files that are appended to them in file order
+    once all tasks are done (gzip parts are whole gzip members, so their
+    concatenation is valid gzip).  Ranked predicates (top N, cumulative %)
+    are selected over the whole file first.  Compressed files cannot be
+    split and are streamed one task per file.  Every input is read once
+    however many thresholds are given, and contig_filter (a
+    FilterUtil.ContigFilter, or None) is applied in the same pass.  Returns
+    a list of (original_contig_count, [filtered_contig_count, ...]) per
+    file, in the order of fasta_paths.
+    """
+    (plain_file_is, compressed_file_is) = split_by_compression(fasta_paths)
+    plain_paths = [fasta_paths[file_i] for file_i in plain_file_is]
+    indexes = build_fasta_indexes_parallel(plain_paths, num_workers)
+    num_threads = max(1, num_workers // max(1, len(compressed_file_is)))
+    filter_tasks = []
+    task_file_is = []
+    file_part_paths = [[] for fasta_path in fasta_paths]
+    ranked_keeps = [None for plain_path in plain_paths]
+    if contig_filter is not None:
+        ranked_keeps = [contig_filter.select_ranked(fasta_index.lengths) for fasta_index in indexes]
+    for plain_i, beg, end in plan_fasta_ranges(plain_paths, num_workers):
+        file_i = plain_file_is[plain_i]
+        fasta_index = indexes[plain_i]
+        rec_beg = bisect_right(fasta_index.offsets, beg)
+        rec_end = bisect_right(fasta_index.offsets, end)
+        range_ranked_keep = None
+        if ranked_keeps[plain_i] is not None:
+            range_ranked_keep = ranked_keeps[plain_i][rec_beg:rec_end]
+        range_out_paths = out_paths[file_i]
+        if file_i in task_file_is:
+            range_out_paths = [out_path+'.part'+str(len(file_part_paths[file_i])) for out_path in out_paths[file_i]]
+            file_part_paths[file_i].append(range_out_paths)
+        task_file_is.append(file_i)
+        filter_tasks.append((filter_fasta_by_length,
+                             (fasta_paths[file_i], range_out_paths, min_contig_lengths, fasta_index.slice(rec_beg, rec_end),
+                              compress_output, contig_filter, range_ranked_keep, end)))
+    # empty files have no ranges, but still get their (empty) outputs and counts
+    for plain_i,file_i in enumerate(plain_file_is):
+        if file_i not in task_file_is:
+            task_file_is.append(file_i)
+            filter_tasks.append((filter_fasta_by_length,
+                                 (fasta_paths[file_i], out_paths[file_i], min_contig_lengths, indexes[plain_i],
+                                  compress_output, contig_filter)))
+    for file_i in compressed_file_is:
+        task_file_is.append(file_i)
+        filter_tasks.append((filter_fasta_stream,
+                             (fasta_paths[file_i], out_paths[file_i], min_contig_lengths, compress_output, num_threads,
+                              contig_filter)))
+    task_counts = run_parallel(call_task, filter_tasks, num_workers)
+    counts = [None for fasta_path in fasta_paths]
+    for task_i,file_i in enumerate(task_file_is):
+        (original_contig_count, filtered_contig_counts) = task_counts[task_i]
+        if counts[file_i] is not None:
+            original_contig_count += counts[file_i][0]
+            filtered_contig_counts = [prev_count + count for prev_count, count in zip(counts[file_i][1], filtered_contig_counts)]
+        counts[file_i] = (original_contig_count, filtered_contig_counts)
+    for file_i,part_paths in enumerate(file_part_paths):
+        for out_i,out_path in enumerate(out_paths[file_i]):
+            append_fasta_parts(out_path, [range_out_paths[out_i] for range_out_paths in part_paths])
+    return counts
+
+
+def append_fasta_parts (out_path, part_paths):
+    """
+    Append the files part_paths to out_path in order with copy_spans(), then remove them
+    """
+    if len(part_paths) == 0:
+        return
+    with open (out_path, 'r+b') as out_handle:
+        out_handle.seek(0, os.SEEK_END)  # copy_file_range() will not write to an O_APPEND file
+        for part_path in part_paths:
+            with open (part_path, 'rb') as part_handle:
+                part_size = os.fstat(part_handle.fileno()).st_size
+                if part_size > 0:
+                    part_mm = mmap.mmap(part_handle.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        copy_spans(part_handle.fileno(), part_mm, out_handle, [(0, part_size)])
+                    finally:
+                        part_mm.close()
+            os.remove(part_path)
+
+
+def preview_filter_by_length_parallel (fasta_paths, min_contig_lengths, num_workers, contig_filter=None):
+    """
+    Run preview_filter_by_length() on each of fasta_paths in a process pool, keeping their order
+    """
+    (plain_file_is, compressed_file_is) = split_by_compression(fasta_paths)
+    indexes = build_fasta_indexes_parallel([fasta_paths[file_i] for file_i in plain_file_is], num_workers)
+    num_threads = max(1, num_workers // max(1, len(compressed_file_is)))
+    preview_args = [None for fasta_path in fasta_paths]
+    for plain_i,file_i in enumerate(plain_file_is):
+        preview_args[file_i] = (fasta_paths[file_i], min_contig_lengths, indexes[plain_i], contig_filter)
+    for file_i in compressed_file_is:
+        preview_args[file_i] = (fasta_paths[file_i], min_contig_lengths, None, contig_filter, num_threads)
+    return run_parallel(preview_filter_by_length, preview_args, num_workers)
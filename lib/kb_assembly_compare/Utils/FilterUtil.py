@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+FilterUtil: per-contig predicates applied alongside min_contig_length
+"""
+import numpy as np
+
+from kb_assembly_compare.Utils.StatsUtil import AssemblyStats
+
+
+def count_gc_acgt_n (seq_bytes):
+    """
+    Return (gc_count, acgt_count, n_count) of a sequence slice; line breaks may be included
+
+    GC is counted as a share of the A, C, G and T bases, as in
+    StatsUtil.ContigComposition.gc_percs(), so IUPAC ambiguity codes count
+    towards neither.
+    """
+    gc_count = (seq_bytes.count(b'G') + seq_bytes.count(b'C') +
+                seq_bytes.count(b'g') + seq_bytes.count(b'c'))
+    at_count = (seq_bytes.count(b'A') + seq_bytes.count(b'T') +
+                seq_bytes.count(b'a') + seq_bytes.count(b't'))
+    n_count = seq_bytes.count(b'N') + seq_bytes.count(b'n')
+    return (gc_count, gc_count + at_count, n_count)
+
+
+class ContigFilter:
+    """
+    Predicates every kept contig must pass, on top of its output's min_contig_length
+
+    max_contig_length: keep contigs no longer than this
+    min_gc_perc, max_gc_perc: keep contigs whose GC% (of ACGT bases) is in range
+    max_n_perc: keep contigs with at most this percent of N bases
+    top_n_longest: keep only the N longest contigs of the assembly
+    cumulative_perc: keep the longest contigs until they hold this percent
+        of the assembly's bases (e.g. 90 keeps the N90 contigs)
+
+    The two ranked predicates are resolved from the contig length array
+    (see select_ranked()) so they need no extra read of the sequence.
+    Composition is only counted when a GC or N predicate is set.
+    """
+    def __init__ (self,
+                  max_contig_length=None,
+                  min_gc_perc=None,
+                  max_gc_perc=None,
+                  max_n_perc=None,
+                  top_n_longest=None,
+                  cumulative_perc=None):
+        self.max_contig_length = max_contig_length
+        self.min_gc_perc = min_gc_perc
+        self.max_gc_perc = max_gc_perc
+        self.max_n_perc = max_n_perc
+        self.top_n_longest = top_n_longest
+        self.cumulative_perc = cumulative_perc
+
+    @classmethod
+    def from_params (cls, params):
+        """
+        Build from the optional method params, or return None if none are set
+        """
+        int_params = ['max_contig_length', 'top_n_longest']
+        float_params = ['min_gc_perc', 'max_gc_perc', 'max_n_perc', 'cumulative_perc']
+        kwargs = dict()
+        for arg in int_params + float_params:
+            if arg not in params or params[arg] == None or params[arg] == '':
+                continue
+            try:
+                if arg in int_params:
+                    kwargs[arg] = int(params[arg])
+                else:
+                    kwargs[arg] = float(params[arg])
+            except (TypeError, ValueError):
+                raise ValueError ("Bad value for param '"+arg+"': '"+str(params[arg])+"'")
+            if kwargs[arg] < 0:
+                raise ValueError ("Param '"+arg+"' must not be negative")
+            if arg not in int_params and kwargs[arg] > 100:
+                raise ValueError ("Param '"+arg+"' is a percent and must not exceed 100")
+        if 'min_gc_perc' in kwargs and 'max_gc_perc' in kwargs and kwargs['min_gc_perc'] > kwargs['max_gc_perc']:
+            raise ValueError ("Param 'min_gc_perc' must not exceed 'max_gc_perc'")
+        if len(kwargs) == 0:
+            return None
+        return cls(**kwargs)
+
+    def describe (self):
+        """
+        Return a list of human readable predicate descriptions for reports
+        """
+        desc = []
+        if self.max_contig_length is not None:
+            desc.append("contig length <= "+str(self.max_contig_length)+"bp")
+        if self.min_gc_perc is not None:
+            desc.append("GC% >= "+str(self.min_gc_perc))
+        if self.max_gc_perc is not None:
+            desc.append("GC% <= "+str(self.max_gc_perc))
+        if self.max_n_perc is not None:
+            desc.append("N% <= "+str(self.max_n_perc))
+        if self.top_n_longest is not None:
+            desc.append("among the "+str(self.top_n_longest)+" longest contigs")
+        if self.cumulative_perc is not None:
+            desc.append("among the longest contigs holding "+str(self.cumulative_perc)+"% of bases")
+        return desc
+
+    def needs_composition (self):
+        return (self.min_gc_perc is not None
+                or self.max_gc_perc is not None
+                or self.max_n_perc is not None)
+
+    def needs_lengths (self):
+        return self.top_n_longest is not None or self.cumulative_perc is not None
+
+    def select_ranked (self, lengths):
+        """
+        Return a bytearray flagging which of lengths pass the ranked predicates
+
+        Contigs are ranked longest first, ties kept in file order.  For the
+        cumulative cutoff the contig that crosses the target is kept, as in
+        the Nx definition.  Returns None when no ranked predicate is set.
+        """
+        if not self.needs_lengths():
+            return None
+        order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+        num_keep = len(order)
+        if self.top_n_longest is not None:
+            num_keep = min(num_keep, self.top_n_longest)
+        if self.cumulative_perc is not None:
+            target_len = sum(lengths) * self.cumulative_perc / 100.0
+            cumulative_len = 0
+            for rank_i,rec_i in enumerate(order[:num_keep]):
+                if cumulative_len >= target_len:
+                    num_keep = rank_i
+                    break
+                cumulative_len += lengths[rec_i]
+        ranked_keep = bytearray(len(lengths))
+        for rec_i in order[:num_keep]:
+            ranked_keep[rec_i] = 1
+        return ranked_keep
+
+    def keep (self, seq_len, seq_bytes=None):
+        """
+        Apply the per-contig predicates; seq_bytes is needed if needs_composition()
+        """
+        if self.max_contig_length is not None and seq_len > self.max_contig_length:
+            return False
+        if not self.needs_composition():
+            return True
+        (gc_count, acgt_count, n_count) = count_gc_acgt_n(seq_bytes)
+        if self.max_n_perc is not None and 100.0 * n_count > self.max_n_perc * seq_len:
+            return False
+        if self.min_gc_perc is not None or self.max_gc_perc is not None:
+            if acgt_count == 0:
+                return False
+            gc_perc = 100.0 * gc_count / acgt_count
+            if self.min_gc_perc is not None and gc_perc < self.min_gc_perc:
+                return False
+            if self.max_gc_perc is not None and gc_perc > self.max_gc_perc:
+                return False
+        return True
+
+
+def preview_sorted_lengths (sorted_lens, min_contig_lengths, contig_filter=None, counts=None):
+    """
+    Count what the filter would keep for each of min_contig_lengths from lengths alone
+
+    sorted_lens holds an assembly's non-zero contig lengths longest first
+    (e.g. from the stats cache), or, with counts, its distinct lengths
+    longest first and the number of contigs of each (e.g. a reversed
+    LengthAccumulator.length_counts()).  Only length predicates can be
+    answered this way, so contig_filter must not need composition.  The
+    ranked predicates keep a prefix of the sorted lengths (ties do not
+    change the counts) and max_contig_length drops the head of that prefix,
+    so each threshold keeps the contigs between two ranks, found by
+    searchsorted and summed from the cumulative lengths.  Returns the same
+    tuple as FastaUtil.preview_filter_by_length().
+    """
+    if contig_filter is not None and contig_filter.needs_composition():
+        raise ValueError ("Composition predicates need sequence: "+", ".join(contig_filter.describe()))
+    stats = AssemblyStats(None, sorted_lens, [], [], presorted=True, counts=counts)
+
+    window_beg = 0
+    window_end = stats.num_contigs
+    if contig_filter is not None:
+        if contig_filter.top_n_longest is not None:
+            window_end = min(window_end, contig_filter.top_n_longest)
+        if contig_filter.cumulative_perc is not None:
+            num_keep = 0
+            if contig_filter.cumulative_perc > 0:
+                num_keep = int(stats.nx_curve([contig_filter.cumulative_perc])[1][0])
+            window_end = min(window_end, num_keep)
+        if contig_filter.max_contig_length is not None:
+            window_beg = int(stats.count_at_least([contig_filter.max_contig_length + 1])[0])
+    window_end = max(window_beg, window_end)
+    num_kept = np.clip(stats.count_at_least(min_contig_lengths), window_beg, window_end)
+    kept_bases = stats.prefix_lens(num_kept) - stats.prefix_lens([window_beg])[0]
+    return (stats.num_contigs,
+            stats.total_len,
+            [int(count) for count in num_kept - window_beg],
+            [int(bases) for bases in kept_bases])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+ParallelUtil: process pool helpers for per-assembly work
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def get_num_workers (config_val=None):
+    """
+    Resolve the worker pool size from a deploy.cfg value
+
+    An unset, empty or non-positive value means use every available CPU.
+    """
+    try:
+        num_workers = int(config_val)
+    except (TypeError, ValueError):
+        num_workers = 0
+    if num_workers <= 0:
+        if hasattr(os, 'sched_getaffinity'):
+            num_workers = len(os.sched_getaffinity(0))
+        else:
+            num_workers = os.cpu_count() or 1
+    return num_workers
+
+
+def run_parallel (func, arg_tuples, num_workers):
+    """
+    Return [func(*args) for args in arg_tuples], computed in a process pool
+
+    Results come back in the order of arg_tuples no matter which worker
+    finishes first.  func must be a module-level function so it can be
+    pickled.  Runs inline when there is only one task or one worker.
+    """
+    arg_tuples = list(arg_tuples)
+    num_workers = min(num_workers, len(arg_tuples))
+    if num_workers <= 1:
+        return [func(*args) for args in arg_tuples]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(func, *zip(*arg_tuples)))
+
+
+def call_task (func, args):
+    """
+    Call func(*args); lets run_parallel() mix different functions in one pool
+    """
+    return func(*args)
+
+
+def peak_memory_mb ():
+    """
+    Return (self_mb, children_mb): peak resident set size of this process and of its largest reaped child
+
+    Pool workers count once run_parallel() has shut the pool down.  The
+    children figure is the single largest child, not a sum, so the two add
+    up to an upper bound on concurrent use only with one worker.  Returns
+    (None, None) where the resource module is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return (None, None)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    self_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return (self_mb, children_mb)
+
+
+def format_peak_memory ():
+    """
+    Return peak_memory_mb() as a log string
+    """
+    (self_mb, children_mb) = peak_memory_mb()
+    if self_mb is None:
+        return 'unavailable'
+    return 'self %.1f MB, largest worker %.1f MB' % (self_mb, children_mb)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+PlotUtil: headless figure rendering for contig_distribution_compare()
+
+Only imported by the methods that draw, so server workers, async jobs and
+methods that never plot do not pay for loading matplotlib.  Figures are
+built with the object-oriented API on an Agg canvas rather than through
+pyplot, so rendering needs no X display (no xvfb), skips backend discovery,
+and no global figure manager keeps finished figures alive: each one is
+rendered, saved, cleared and dropped before the next, and peak memory stays
+that of the largest single figure however many assemblies are plotted.
+
+Each figure is an independent render task: a render_*() function and a
+spec dict holding the figure's data, labels, size and output paths.  Tasks
+share no state, so a report's figures can be drawn in a process pool with
+render_figures() and only their file paths come back.
+"""
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from kb_assembly_compare.Utils.ParallelUtil import call_task, run_parallel
+
+DEFAULT_DPI = 200
+
+
+def new_figure (width, height):
+    """
+    Return an empty width x height inch Figure on its own Agg canvas
+
+    The figure is not registered with pyplot, so it is freed as soon as the
+    render function that made it returns.
+    """
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure (fig, png_path, pdf_path, dpi):
+    """
+    Write fig as a PNG at dpi and as a PDF, then clear it to release its artists and data
+    """
+    fig.savefig (png_path, dpi=dpi)
+    fig.savefig (pdf_path, format='pdf')
+    fig.clear()
+
+
+def render_figures (render_tasks, num_workers):
+    """
+    Return [(png_path, pdf_path)] for a list of (render_func, spec) tasks, rendered in a process pool
+
+    Paths come back in task order, whichever worker finishes first.
+    """
+    return run_parallel(call_task, [(render_func, (spec,)) for render_func, spec in render_tasks], num_workers)
+
+
+def render_key_plot (spec):
+    """
+    Draw the colour key: one line and label per assembly, in plotting order
+
+    spec: names, title, png_path, pdf_path, and optionally dpi
+    """
+    names = spec['names']
+    total_ass = len(names)
+    #spacing = 1.0 / float(total_ass+3)
+    spacing = 1.0
+    img_in_width  = 6.0
+    img_in_height = 0.5 * (total_ass)
+    x_text_margin = 0.01
+    y_text_margin = 0.01
+    title_fontsize = 12
+    #text_color = "#606060"
+    text_color = "#303030"
+    text_fontsize = 10
+    fig = new_figure (img_in_width, img_in_height)
+    ax = fig.add_subplot (1, 1, 1)
+    # Let's turn off visibility of all tic labels and boxes here
+    for ax in fig.axes:
+        ax.xaxis.set_visible(False)  # remove axis labels and tics
+        ax.yaxis.set_visible(False)
+        for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
+            t.set_visible(False)
+
+    # build x and y coord lists
+    x0 = 1
+    x1 = 2
+    x_indent = 0.1
+    x_coords = [x0, x1]
+    ax.set_xlim(x0-x_indent, x1+x_indent)
+    ax.set_ylim(0, (total_ass+1)*spacing)
+    for ass_i,ass_name in enumerate(names):
+        y_pos = (total_ass - ass_i) * spacing
+        y_coords = [y_pos, y_pos]
+        ax.plot(x_coords, y_coords, lw=2)
+        ax.text (x0+x_text_margin, y_pos+y_text_margin, ass_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=text_fontsize, zorder=1)
+    ax.text (0.5*(x0+x1), 0+y_text_margin, spec['title'], verticalalignment="bottom", horizontalalignment="center", color=text_color, fontsize=title_fontsize, zorder=2)
+
+    save_figure (fig, spec['png_path'], spec['pdf_path'], spec.get('dpi', DEFAULT_DPI))
+    return (spec['png_path'], spec['pdf_path'])
+
+
+def render_lines_plot (spec):
+    """
+    Draw one line per assembly on shared axes (cumulative length, sorted lengths, Nx curve)
+
+    spec: lines [(x_coords, y_coords)], title, xlabel, ylabel, width, height,
+          png_path, pdf_path, and optionally xlim, drawstyle ('steps-pre' etc.) and dpi
+    """
+    fig = new_figure (spec['width'], spec['height'])
+    ax = fig.add_subplot (1, 1, 1)
+    ax.grid(True)
+    ax.set_title (spec['title'])
+    ax.set_xlabel (spec['xlabel'])
+    ax.set_ylabel (spec['ylabel'])
+    if spec.get('xlim') is not None:
+        ax.set_xlim (*spec['xlim'])
+    fig.tight_layout()
+
+    for x_coords, y_coords in spec['lines']:
+        ax.plot(x_coords, y_coords, lw=2, drawstyle=spec.get('drawstyle', 'default'))
+
+    save_figure (fig, spec['png_path'], spec['pdf_path'], spec.get('dpi', DEFAULT_DPI))
+    return (spec['png_path'], spec['pdf_path'])
+
+
+def render_composition_plot (spec):
+    """
+    Draw side by side panels of per-assembly contig counts per composition % bin
+
+    spec: panels [(xlabel, [counts per assembly])], bin_edges, width, height,
+          png_path, pdf_path, and optionally dpi
+    """
+    bin_edges = spec['bin_edges']
+    panels = spec['panels']
+    fig = new_figure (spec['width'], spec['height'])
+    for panel_i,(panel_label, panel_counts) in enumerate(panels):
+        ax = fig.add_subplot (1, len(panels), panel_i+1)
+        ax.grid(True)
+        ax.set_xlabel (panel_label)
+        if panel_i == 0:
+            ax.set_ylabel ('# contigs')
+        ax.set_xlim (0, 100)
+        for perc_counts in panel_counts:
+            ax.step(bin_edges, np.append(perc_counts, perc_counts[-1]), where='post', lw=2)
+    fig.tight_layout()
+
+    save_figure (fig, spec['png_path'], spec['pdf_path'], spec.get('dpi', DEFAULT_DPI))
+    return (spec['png_path'], spec['pdf_path'])
+
+
+def render_length_histogram (spec):
+    """
+    Draw one assembly's binned contig length counts as bars over the shared bins
+
+    spec: counts, bin_edges (in plot units), log_scale, xlim, ylim, xlabel,
+          width, png_path, pdf_path, and optionally height, color and dpi
+    """
+    fig = new_figure (spec['width'], spec.get('height', 3.0))
+    ax = fig.add_subplot (1, 1, 1)
+    ax.grid(True)
+    if spec['log_scale']:
+        ax.set_xscale ('log')
+    ax.set_xlim (spec['xlim'])
+    ax.set_ylim (spec['ylim'])
+    ax.set_xlabel (spec['xlabel'])
+    ax.set_ylabel ('# contigs')
+    fig.tight_layout()
+
+    # counts are already binned, so draw them as bars spanning each bin
+    bin_edges = spec['bin_edges']
+    ax.bar(bin_edges[:-1], spec['counts'], width=np.diff(bin_edges), align='edge', color=spec.get('color', 'slateblue'))
+
+    save_figure (fig, spec['png_path'], spec['pdf_path'], spec.get('dpi', DEFAULT_DPI))
+    return (spec['png_path'], spec['pdf_path'])
+
+
+# render function of each chart kind of a report's (chart kind, spec) tasks
+RENDER_FUNCS = {'key':         render_key_plot,
+                'lines':       render_lines_plot,
+                'composition': render_composition_plot,
+                'histogram':   render_length_histogram}
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+ReportUtil: data-driven interactive report for contig_distribution_compare()
+
+The report figures are described as (chart kind, spec) tasks.  PlotUtil
+renders them to PNG and PDF on the server; here the same specs become one
+JSON payload of the plotted values, which a bundled canvas script
+(report_charts.js) draws in the browser.  The page needs no server-side
+rendering, no matplotlib and no network access, and its size is set by the
+count arrays rather than by images.
+"""
+import json
+import os
+from html import escape
+
+import numpy as np
+
+REPORT_CHARTS_JS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_charts.js')
+
+# chart kinds (as in PlotUtil.RENDER_FUNCS) and the spec keys that are plotted values rather than files
+CHART_SPEC_KEYS = {'key':         ['names', 'title'],
+                   'lines':       ['lines', 'title', 'xlabel', 'ylabel', 'xlim', 'drawstyle'],
+                   'composition': ['panels', 'bin_edges'],
+                   'histogram':   ['counts', 'bin_edges', 'log_scale', 'xlim', 'ylim', 'xlabel', 'color']}
+CHART_TYPES = {'key': 'key', 'lines': 'lines', 'composition': 'panels', 'histogram': 'bars'}
+
+FLOAT_DECIMALS = 6  # 1 bp in the Mbp-scaled curves
+
+
+def chart_id (png_file):
+    """
+    Return the id a figure is known by in the page and payload: its file name without folder or extension
+    """
+    return os.path.splitext(os.path.basename(png_file))[0]
+
+
+def json_values (val):
+    """
+    Return val with NumPy arrays and scalars as lists and plain numbers, floats rounded to FLOAT_DECIMALS
+    """
+    if isinstance(val, np.ndarray):
+        if np.issubdtype(val.dtype, np.floating):
+            return np.round(val, FLOAT_DECIMALS).tolist()
+        return val.tolist()
+    if isinstance(val, (list, tuple)):
+        return [json_values(v) for v in val]
+    if isinstance(val, np.integer):
+        return int(val)
+    if isinstance(val, (float, np.floating)):
+        return round(float(val), FLOAT_DECIMALS)
+    return val
+
+
+def chart_payload (chart_kind, spec):
+    """
+    Return the JSON-ready plotted values and labels of one (chart kind, spec) task
+    """
+    if chart_kind not in CHART_SPEC_KEYS:
+        raise ValueError ("Unknown chart kind: '"+str(chart_kind)+"'")
+    chart = {'type': CHART_TYPES[chart_kind]}
+    for spec_key in CHART_SPEC_KEYS[chart_kind]:
+        if spec.get(spec_key) is not None:
+            chart[spec_key] = json_values(spec[spec_key])
+    # figure size in inches, for the aspect ratio of the drawn canvas
+    if chart_kind == 'key':
+        chart['width'] = 6.0
+        chart['height'] = 0.5 * len(spec['names'])
+    else:
+        chart['width'] = float(spec['width'])
+        chart['height'] = float(spec.get('height', 3.0))
+    return chart
+
+
+def report_payload (chart_tasks, assembly_names):
+    """
+    Return {'assemblies': names, 'charts': {chart id: chart}} for a list of (chart kind, spec) tasks
+    """
+    charts = dict()
+    for chart_kind, spec in chart_tasks:
+        charts[chart_id(spec['png_path'])] = chart_payload(chart_kind, spec)
+    return {'assemblies': list(assembly_names), 'charts': charts}
+
+
+def write_report_data (report_data_path, payload):
+    """
+    Write payload as compact JSON and return the JSON string
+    """
+    payload_json = json.dumps(payload, separators=(',', ':'))
+    with open(report_data_path, 'w') as report_data_handle:
+        report_data_handle.write(payload_json)
+    return payload_json
+
+
+def chart_html (png_file, width=None, height=None):
+    """
+    Return the placeholder element report_charts.js draws the figure png_file into
+
+    Give width or height in pixels; the other follows the figure's aspect ratio.
+    """
+    size_attrs = ''
+    if width is not None:
+        size_attrs += ' data-width="'+str(int(width))+'"'
+    if height is not None:
+        size_attrs += ' data-height="'+str(int(height))+'"'
+    return '<div class="kbchart" data-chart="'+escape(chart_id(png_file), quote=True)+'"'+size_attrs+'></div>'
+
+
+def report_style_html ():
+    """
+    Return the <style> element for the chart tooltip
+    """
+    return ('<style>\n' +
+            '.kbchart_tip { position: absolute; display: none; pointer-events: none; padding: 4px 6px;' +
+            ' background: #ffffff; border: 1px solid #cccccc; font: 11px sans-serif; color: #303030; }\n' +
+            '</style>')
+
+
+def report_script_html (payload_json):
+    """
+    Return the page's <script> elements: the payload as inline JSON, then the bundled chart script
+    """
+    with open(REPORT_CHARTS_JS_PATH, 'r') as js_handle:
+        charts_js = js_handle.read()
+    # '</' would end the script element early; '<\/' is the same JSON string
+    payload_json = payload_json.replace('</', '<\\/')
+    return ('<script type="application/json" id="report_data">'+payload_json+'</script>\n' +
+            '<script>\n'+charts_js+'</script>')
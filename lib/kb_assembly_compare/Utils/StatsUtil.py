@@ -0,0 +1,1090 @@
+# -*- coding: utf-8 -*-
+"""
+StatsUtil: vectorized contig length statistics for contig_distribution_compare()
+
+Each assembly's contig lengths are held as one integer array sorted longest
+first, such as a stats cache column used in place.  Nx/Lx and length bucket
+summaries come from one np.cumsum and np.searchsorted over that array, so no
+step loops over contigs in Python.
+
+LengthAccumulator counts distinct lengths chunk by chunk and merges across
+parallel scans; AssemblyStats reads the same statistics from its counts.
+
+LengthSketch is the approximate, fixed-memory alternative for assemblies
+too large to hold one value per contig: lengths fall into logarithmic bins
+of bounded relative width, while totals, the longest contig and the length
+bucket summaries are still counted exactly.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_PERCS       = [50, 75, 90]
+DEFAULT_LEN_BUCKETS = [1000000, 100000, 10000, 1000, 500, 1]
+NX_CURVE_PERCS      = list(range(1, 101))
+
+DEFAULT_APPROX_ERROR_PERC = 1.0  # relative error bound of LengthSketch, in %
+MAX_APPROX_ERROR_PERC     = 50.0
+
+# length histograms: a window spanning at least this many fold gets log-spaced bins
+HIST_LOG_MIN_RATIO = 100
+
+# per-contig columns are widened to int64 or float64 this many contigs at a time
+COLUMN_BLOCK_SIZE = 1 << 20
+
+# cumulative and sorted length curves: vertices drawn per assembly (0 draws every contig)
+DEFAULT_PLOT_MAX_VERTICES = 4000
+
+# per-contig composition distributions: ContigComposition methods and bins over 0..100%
+COMPOSITION_PERC_METHODS = ['gc_percs', 'ambig_percs', 'softmask_percs']
+PERC_HISTOGRAM_BINS      = 100
+
+HUGE_VAL = 100000000000000000
+
+
+class AssemblyStats:
+    """
+    Contig length statistics of one assembly
+
+    lens:              contig lengths, sorted longest first
+    counts:            contigs of each of lens, or None if lens has one entry per contig
+    cumulative_lens:   int64 running sum of lens (times counts)
+    cumulative_counts: int64 running sum of counts, or None
+    num_contigs, total_len, max_len
+    percs:             percentiles x for which N and L are given
+    N, L:              {perc: Nx}, {perc: Lx} (0 for an empty assembly)
+    len_buckets:       length thresholds, longest first
+    bucket_counts:     {bucket: number of contigs >= bucket}
+    bucket_lens:       {bucket: sum of lengths of contigs >= bucket}
+    composition:       ContigComposition in the order of lens, or None
+
+    If composition is given its lengths are used and lens may be None.  If
+    presorted, lens (or composition) are already longest first, e.g. stats
+    cache memmaps, and are kept as they are rather than sorted into int64
+    copies.  If counts is given, lens are distinct lengths longest first
+    (see from_accumulator()), and every statistic is read from the steps of
+    equal length without expanding them to one value per contig.
+    """
+    approximate = False
+
+    def __init__ (self, name, lens, percs=DEFAULT_PERCS, len_buckets=DEFAULT_LEN_BUCKETS, composition=None,
+                  presorted=False, counts=None):
+        self.name = name
+        if composition is not None:
+            if not presorted:
+                composition = composition.sorted_by_length()
+            lens = composition.lens
+        self.composition = composition
+        if presorted or counts is not None:
+            self.lens = count_column(lens)
+        else:
+            self.lens = sort_lens(lens)
+        self.counts = None
+        self.cumulative_counts = None
+        if counts is None:
+            self.cumulative_lens = cumsum_int64(self.lens)
+            self.num_contigs = int(self.lens.size)
+        else:
+            self.counts = np.asarray(counts, dtype=np.int64)
+            self.cumulative_counts = np.cumsum(self.counts)
+            self.cumulative_lens = np.cumsum(self.lens.astype(np.int64) * self.counts)
+            self.num_contigs = int(self.cumulative_counts[-1]) if self.counts.size > 0 else 0
+        self.total_len = int(self.cumulative_lens[-1]) if self.num_contigs > 0 else 0
+        self.max_len = int(self.lens[0]) if self.num_contigs > 0 else 0
+
+        self.percs = list(percs)
+        self.N = dict()
+        self.L = dict()
+        (N_vals, L_vals) = self.nx_curve(self.percs)
+        for perc_i,perc in enumerate(self.percs):
+            self.N[perc] = int(N_vals[perc_i])
+            self.L[perc] = int(L_vals[perc_i])
+
+        self.len_buckets = list(len_buckets)
+        self.bucket_counts = dict()
+        self.bucket_lens = dict()
+        (counts, bucket_sums) = bucket_stats(self.lens, self.cumulative_lens, self.len_buckets,
+                                             self.cumulative_counts)
+        for bucket_i,bucket in enumerate(self.len_buckets):
+            self.bucket_counts[bucket] = int(counts[bucket_i])
+            self.bucket_lens[bucket] = int(bucket_sums[bucket_i])
+
+    @classmethod
+    def from_accumulator (cls, name, accumulator, percs=DEFAULT_PERCS, len_buckets=DEFAULT_LEN_BUCKETS):
+        """
+        Return the AssemblyStats of a LengthAccumulator, read from its distinct lengths and counts
+        """
+        (values, counts) = accumulator.length_counts()
+        return cls(name, values[::-1], percs, len_buckets, counts=counts[::-1])
+
+    def nx_curve (self, percs=NX_CURVE_PERCS):
+        """
+        Return (N, L) int64 arrays for every one of percs (N1..N100 by default)
+        """
+        return nx_lx(self.lens, self.cumulative_lens, percs, self.cumulative_counts)
+
+    def count_at_least (self, thresholds):
+        """
+        Return the int64 number of contigs at or above each of thresholds
+        """
+        return step_contig_counts(count_at_least(self.lens, thresholds), self.cumulative_counts)
+
+    def prefix_lens (self, num_contigs):
+        """
+        Return the int64 summed length of the num_contigs longest contigs, for each of num_contigs
+        """
+        return prefix_lens(self.lens, self.cumulative_lens, num_contigs, self.cumulative_counts)
+
+    def length_steps (self):
+        """
+        Return (lens, cumulative counts, cumulative lens), longest first, for the length plots
+        """
+        if self.cumulative_counts is not None:
+            return (self.lens, self.cumulative_counts, self.cumulative_lens)
+        return (self.lens, np.arange(1, self.num_contigs+1), self.cumulative_lens)
+
+    def window_values (self, min_len, max_len):
+        """
+        Return (lens in [min_len, max_len) ascending, counts or None) as input to HistogramPlan.count()
+
+        The window is a searchsorted slice of the sorted lengths, not a copy.
+        """
+        (num_from_min, num_from_max) = count_at_least(self.lens, [min_len, max_len])
+        window = slice(self.lens.size-num_from_min, self.lens.size-num_from_max)
+        if self.counts is not None:
+            return (self.lens[::-1][window], self.counts[::-1][window])
+        return (self.lens[::-1][window], None)
+
+
+class ApproxAssemblyStats:
+    """
+    Contig length statistics of one assembly from a LengthSketch
+
+    Has the attributes of AssemblyStats except the per-contig arrays.
+    Counts, totals, max_len and the length buckets are exact.  Each N is
+    within rel_err of the true value, and each L is estimated within its
+    sketch bin.  composition is the sketch itself.
+    """
+    approximate = True
+
+    def __init__ (self, name, sketch, percs=DEFAULT_PERCS):
+        self.name = name
+        self.composition = sketch
+        self.rel_err = sketch.rel_err
+        self.num_contigs = sketch.num_contigs
+        self.total_len = sketch.total_len
+        self.max_len = sketch.max_len
+
+        self.percs = list(percs)
+        self.N = dict()
+        self.L = dict()
+        (N_vals, L_vals) = sketch.nx_lx(self.percs)
+        for perc_i,perc in enumerate(self.percs):
+            self.N[perc] = int(N_vals[perc_i])
+            self.L[perc] = int(L_vals[perc_i])
+
+        self.len_buckets = list(sketch.len_buckets)
+        self.bucket_counts = dict()
+        self.bucket_lens = dict()
+        for bucket_i,bucket in enumerate(self.len_buckets):
+            self.bucket_counts[bucket] = int(sketch.bucket_counts[bucket_i])
+            self.bucket_lens[bucket] = int(sketch.bucket_lens[bucket_i])
+
+    def nx_curve (self, percs=NX_CURVE_PERCS):
+        return self.composition.nx_lx(percs)
+
+    def length_steps (self):
+        """
+        Return (bin lengths, cumulative counts, cumulative lens), longest first
+
+        Each step is one sketch bin, drawn at its representative length,
+        except that the first is drawn at max_len, which is known exactly.
+        """
+        (bin_lens, bin_counts, bin_sums) = self.composition.length_bins()
+        if bin_lens.size > 0:
+            bin_lens[0] = self.max_len
+        return (bin_lens, np.cumsum(bin_counts), np.cumsum(bin_sums))
+
+    def window_values (self, min_len, max_len):
+        """
+        Return (sketch bin lengths in [min_len, max_len), their contig counts) for HistogramPlan.count()
+        """
+        (bin_lens, bin_counts, bin_sums) = self.composition.length_bins()
+        in_window = (bin_lens >= min_len) & (bin_lens < max_len)
+        return (bin_lens[in_window], bin_counts[in_window])
+
+
+class LengthSketch:
+    """
+    Fixed-memory, mergeable summary of contig lengths and composition
+
+    rel_err:     relative error bound of the length bins (e.g. 0.01)
+    len_buckets: length thresholds counted exactly, longest first
+
+    Contig lengths are counted in logarithmic bins (bin i holds lengths in
+    (gamma^(i-1), gamma^i], gamma = (1+rel_err)/(1-rel_err)), as in the
+    DDSketch quantile sketch, together with the exact sum of lengths in each
+    bin.  Every length in a bin is within rel_err of the bin's representative
+    length, so Nx read from the bins is too, and the bins cover all lengths
+    below 2^64 with a few thousand counters whatever the number of contigs.
+    Contig count, total and longest length, length bucket counts and sums,
+    base composition totals and the 100-bin per-contig composition
+    histograms are exact.  merge() adds counters, so per-range sketches of
+    the same rel_err and len_buckets reduce in any order.
+    """
+    max_log2_len = 64
+
+    def __init__ (self, rel_err=DEFAULT_APPROX_ERROR_PERC/100.0, len_buckets=DEFAULT_LEN_BUCKETS):
+        if not (0.0 < rel_err < MAX_APPROX_ERROR_PERC/100.0):
+            raise ValueError ("approximation error must be > 0% and < "+str(MAX_APPROX_ERROR_PERC)+"%: "+
+                              str(rel_err*100.0)+"%")
+        self.rel_err = float(rel_err)
+        self.log_gamma = math.log((1.0 + self.rel_err) / (1.0 - self.rel_err))
+        self.num_bins = int(math.ceil(self.max_log2_len * math.log(2.0) / self.log_gamma)) + 1
+        self.bin_counts = np.zeros(self.num_bins, dtype=np.int64)
+        self.bin_sums = np.zeros(self.num_bins, dtype=np.int64)
+
+        self.len_buckets = list(len_buckets)
+        self.bucket_counts = np.zeros(len(self.len_buckets), dtype=np.int64)
+        self.bucket_lens = np.zeros(len(self.len_buckets), dtype=np.int64)
+        self.num_contigs = 0
+        self.total_len = 0
+        self.max_len = 0
+
+        self.gc_count = 0
+        self.ambig_count = 0
+        self.softmask_count = 0
+        self.ambig_contig_count = 0
+        self.perc_counts = dict()
+        for perc_method in COMPOSITION_PERC_METHODS:
+            self.perc_counts[perc_method] = np.zeros(PERC_HISTOGRAM_BINS, dtype=np.int64)
+
+    def bin_index (self, lens):
+        """
+        Return the sketch bin of each of lens (>= 1)
+        """
+        bin_i = np.ceil(np.log(np.asarray(lens, dtype=np.float64)) / self.log_gamma).astype(np.int64)
+        return np.clip(bin_i, 0, self.num_bins - 1)
+
+    def bin_values (self, bin_i):
+        """
+        Return the representative length of each bin: within rel_err of every length in it
+        """
+        bin_i = np.asarray(bin_i, dtype=np.float64)
+        bin_lens = 2.0 * np.exp(bin_i * self.log_gamma) / (1.0 + math.exp(self.log_gamma))
+        return np.maximum(1, np.rint(bin_lens)).astype(np.int64)
+
+    def add (self, composition):
+        """
+        Fold in the contigs of a ContigComposition chunk; returns self
+        """
+        if bool(np.any(composition.lens <= 0)):
+            nonempty = composition.lens > 0
+            composition = ContigComposition(*[getattr(composition, column)[nonempty]
+                                              for column in ContigComposition.columns])
+        if len(composition) == 0:
+            return self
+        self.add_lengths(composition.lens)
+
+        self.gc_count += int(composition.gc_counts.sum())
+        self.ambig_count += int(composition.ambig_counts.sum())
+        self.softmask_count += int(composition.softmask_counts.sum())
+        self.ambig_contig_count += int(np.count_nonzero(composition.ambig_counts))
+        for perc_method in COMPOSITION_PERC_METHODS:
+            self.perc_counts[perc_method] += composition.perc_histogram(perc_method)
+        return self
+
+    def add_lengths (self, lens):
+        """
+        Fold in contig lengths (>= 1); returns self
+
+        Only the length counters change, so a sketch built this way alone
+        has no composition.
+        """
+        lens = np.asarray(lens)
+        if lens.size == 0:
+            return self
+        bin_i = self.bin_index(lens)
+        self.bin_counts += np.bincount(bin_i, minlength=self.num_bins)
+        self.bin_sums += np.bincount(bin_i, weights=lens, minlength=self.num_bins).astype(np.int64)
+
+        # contigs at or above each bucket: count lens by how many buckets they reach, then sum down
+        ascending_buckets = np.asarray(self.len_buckets[::-1], dtype=np.int64)
+        num_reached = np.searchsorted(ascending_buckets, lens, side='right')
+        reached_counts = np.bincount(num_reached, minlength=ascending_buckets.size+1)
+        reached_sums = np.bincount(num_reached, weights=lens, minlength=ascending_buckets.size+1)
+        reached_sums = reached_sums.astype(np.int64)
+        self.bucket_counts += np.cumsum(reached_counts[::-1])[::-1][1:][::-1]
+        self.bucket_lens += np.cumsum(reached_sums[::-1])[::-1][1:][::-1]
+
+        self.num_contigs += int(lens.size)
+        self.total_len += int(lens.sum(dtype=np.int64))
+        self.max_len = max(self.max_len, int(lens.max()))
+        return self
+
+    def merge (self, other):
+        """
+        Fold the counters of other (same rel_err and len_buckets) into self; returns self
+        """
+        if other.rel_err != self.rel_err or other.len_buckets != self.len_buckets:
+            raise ValueError ("cannot merge length sketches with different error bounds or length buckets")
+        self.bin_counts += other.bin_counts
+        self.bin_sums += other.bin_sums
+        self.bucket_counts += other.bucket_counts
+        self.bucket_lens += other.bucket_lens
+        self.num_contigs += other.num_contigs
+        self.total_len += other.total_len
+        self.max_len = max(self.max_len, other.max_len)
+        self.gc_count += other.gc_count
+        self.ambig_count += other.ambig_count
+        self.softmask_count += other.softmask_count
+        self.ambig_contig_count += other.ambig_contig_count
+        for perc_method in COMPOSITION_PERC_METHODS:
+            self.perc_counts[perc_method] += other.perc_counts[perc_method]
+        return self
+
+    def length_bins (self):
+        """
+        Return (representative length, contig count, length sum) of the non-empty bins, longest first
+
+        No representative is above max_len: the longest bin's is capped at it,
+        which only brings it closer to every length in that bin.
+        """
+        bin_i = np.nonzero(self.bin_counts)[0][::-1]
+        bin_lens = np.minimum(self.bin_values(bin_i), self.max_len)
+        return (bin_lens, self.bin_counts[bin_i], self.bin_sums[bin_i])
+
+    def nx_lx (self, percs):
+        """
+        Return approximate (N, L) arrays for each of percs
+
+        The bin reaching each target is found from the exact cumulative
+        length sums; N is its representative length and L adds the contigs
+        of that bin needed at its mean length.
+        """
+        (bin_lens, bin_counts, bin_sums) = self.length_bins()
+        if bin_lens.size == 0:
+            return (np.zeros(len(percs), dtype=np.int64), np.zeros(len(percs), dtype=np.int64))
+        cumulative_sums = np.cumsum(bin_sums)
+        cumulative_counts = np.cumsum(bin_counts)
+        targets = np.asarray(percs, dtype=np.float64) / 100.0 * float(cumulative_sums[-1])
+        idx = np.minimum(np.searchsorted(cumulative_sums, targets, side='left'), bin_lens.size - 1)
+        prev_sums = cumulative_sums[idx] - bin_sums[idx]
+        mean_lens = bin_sums[idx] / bin_counts[idx].astype(np.float64)
+        num_needed = np.ceil((targets - prev_sums) / mean_lens)
+        num_needed = np.clip(num_needed, 1, bin_counts[idx]).astype(np.int64)
+        return (bin_lens[idx], cumulative_counts[idx] - bin_counts[idx] + num_needed)
+
+    def summary (self):
+        """
+        Return the ContigComposition.summary() of every contig added
+        """
+        acgt_len = self.total_len - self.ambig_count
+        gc_perc = 100.0 * self.gc_count / acgt_len if acgt_len > 0 else None
+        softmask_perc = 100.0 * self.softmask_count / self.total_len if self.total_len > 0 else None
+        return (gc_perc, self.ambig_count, softmask_perc, self.ambig_contig_count)
+
+    def perc_histogram (self, perc_method):
+        return self.perc_counts[perc_method]
+
+
+def sketch_from_columns (composition_columns, rel_err, len_buckets, chunk_size=1 << 20):
+    """
+    Return a LengthSketch of ContigComposition.columns arrays, chunk_size contigs at a time
+
+    The columns may be stats cache memmaps; only one chunk of each is read at once.
+
+    Given the length column alone, the sketch has lengths but no composition.
+    """
+    sketch = LengthSketch(rel_err, len_buckets)
+    num_contigs = len(composition_columns[0])
+    for chunk_beg in range(0, num_contigs, chunk_size):
+        if len(composition_columns) == 1:
+            sketch.add_lengths(composition_columns[0][chunk_beg:chunk_beg+chunk_size])
+        else:
+            chunk_columns = [column[chunk_beg:chunk_beg+chunk_size] for column in composition_columns]
+            sketch.add(ContigComposition(*chunk_columns))
+    return sketch
+
+
+def merge_sketches (sketches, rel_err, len_buckets):
+    """
+    Return a new LengthSketch(rel_err, len_buckets) holding the counters of all of sketches
+    """
+    merged = LengthSketch(rel_err, len_buckets)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+class LengthAccumulator:
+    """
+    Mergeable summary of a multiset of contig lengths
+
+    Lengths are kept as their distinct values (ascending) with a count for
+    each, so memory follows the number of distinct lengths rather than the
+    number of contigs.  add() buffers incoming chunks and folds them in once
+    compact_size lengths have piled up.  merge() is associative and
+    commutative, since any grouping of the same lengths compacts to the same
+    (values, counts), so chunked or sharded scans can be reduced in any
+    order.
+    """
+    compact_size = 1 << 20
+
+    def __init__ (self, lens=None):
+        self.values = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+        if lens is not None:
+            self.add(lens)
+
+    def __getstate__ (self):
+        self.compact()  # only the compact arrays cross process boundaries
+        return self.__dict__
+
+    def add (self, lens):
+        """
+        Add a chunk of lengths (any int sequence or array); returns self
+        """
+        lens = np.asarray(lens, dtype=np.int64).ravel()
+        if lens.size == 0:
+            return self
+        self.pending.append(lens)
+        self.pending_size += lens.size
+        if self.pending_size >= self.compact_size:
+            self.compact()
+        return self
+
+    def merge (self, other):
+        """
+        Fold the lengths counted by other into self; returns self
+        """
+        self.compact()
+        other.compact()
+        (self.values, self.counts) = merge_length_counts(self.values, self.counts, other.values, other.counts)
+        return self
+
+    def compact (self):
+        if self.pending_size == 0:
+            return
+        (values, counts) = np.unique(np.concatenate(self.pending), return_counts=True)
+        (self.values, self.counts) = merge_length_counts(self.values, self.counts,
+                                                         values, counts.astype(np.int64))
+        self.pending = []
+        self.pending_size = 0
+
+    def length_counts (self):
+        """
+        Return (distinct lengths ascending, count of each) as int64 arrays
+        """
+        self.compact()
+        return (self.values, self.counts)
+
+    def num_contigs (self):
+        self.compact()
+        return int(self.counts.sum())
+
+    def total_len (self):
+        self.compact()
+        return int((self.values * self.counts).sum())
+
+    def max_len (self):
+        self.compact()
+        return int(self.values[-1]) if self.values.size > 0 else 0
+
+    def sorted_lens (self):
+        """
+        Return every length as an int64 array sorted longest first
+        """
+        self.compact()
+        return np.repeat(self.values[::-1], self.counts[::-1])
+
+
+def merge_length_counts (values_a, counts_a, values_b, counts_b):
+    """
+    Return the (values, counts) union of two ascending distinct-value count arrays
+    """
+    values = np.concatenate((values_a, values_b))
+    counts = np.concatenate((counts_a, counts_b))
+    if values.size == 0:
+        return (values.astype(np.int64), counts.astype(np.int64))
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    counts = counts[order]
+    (merged_values, first_i) = np.unique(values, return_index=True)
+    return (merged_values.astype(np.int64), np.add.reduceat(counts, first_i).astype(np.int64))
+
+
+def merge_accumulators (accumulators):
+    """
+    Return a new LengthAccumulator holding the lengths of all of accumulators
+    """
+    merged = LengthAccumulator()
+    for accumulator in accumulators:
+        merged.merge(accumulator)
+    return merged
+
+
+class ContigComposition:
+    """
+    Per-contig base composition as parallel integer columns in one contig order
+
+    Integer columns keep their dtype (e.g. the stats cache's uint32
+    memmaps); anything else is read as int64.
+
+    lens:            bases in each contig (whitespace not counted)
+    gc_counts:       G and C bases (either case)
+    ambig_counts:    bases other than A, C, G and T (N and IUPAC ambiguity codes)
+    softmask_counts: lowercase (softmasked) bases
+    """
+    columns = ['lens', 'gc_counts', 'ambig_counts', 'softmask_counts']
+
+    def __init__ (self, lens=(), gc_counts=(), ambig_counts=(), softmask_counts=()):
+        self.lens = count_column(lens)
+        self.gc_counts = count_column(gc_counts)
+        self.ambig_counts = count_column(ambig_counts)
+        self.softmask_counts = count_column(softmask_counts)
+
+    def __len__ (self):
+        return int(self.lens.size)
+
+    def attrs (self):
+        """
+        Return {column: array} of the non-length columns, e.g. for the stats cache
+        """
+        return dict([(column, getattr(self, column)) for column in self.columns[1:]])
+
+    def sorted_by_length (self):
+        """
+        Return a copy with contigs ordered longest first, ties in the current order
+        """
+        # stable ascending sort of the reversed lens, reversed again
+        #   (not a sort of the negated lens, which would wrap for unsigned lens)
+        order = self.lens.size - 1 - np.argsort(self.lens[::-1], kind='stable')[::-1]
+        return ContigComposition(*[getattr(self, column)[order] for column in self.columns])
+
+    def gc_percs (self):
+        """
+        Return each contig's GC% of its ACGT bases (NaN if it has none)
+        """
+        return safe_percs(self.gc_counts, self.lens - self.ambig_counts)
+
+    def ambig_percs (self):
+        return safe_percs(self.ambig_counts, self.lens)
+
+    def softmask_percs (self):
+        return safe_percs(self.softmask_counts, self.lens)
+
+    def block (self, beg, end):
+        """
+        Return contigs [beg, end) as a ContigComposition of views of the columns
+        """
+        return ContigComposition(*[getattr(self, column)[beg:end] for column in self.columns])
+
+    def perc_histogram (self, perc_method, block_size=COLUMN_BLOCK_SIZE):
+        """
+        Return the PERC_HISTOGRAM_BINS counts of one of COMPOSITION_PERC_METHODS over contigs
+
+        Percentages are computed block_size contigs at a time, so the float
+        temporaries do not grow with the assembly.
+        """
+        counts = np.zeros(PERC_HISTOGRAM_BINS, dtype=np.int64)
+        for block_beg in range(0, len(self), block_size):
+            block = self.block(block_beg, block_beg + block_size)
+            counts += perc_histogram(getattr(block, perc_method)(), PERC_HISTOGRAM_BINS)
+        return counts
+
+    def summary (self):
+        """
+        Return (GC% of all ACGT bases or None, non-ACGT bases, softmasked % of all bases or None,
+        contigs with any non-ACGT base)
+        """
+        total_len = int(self.lens.sum())
+        acgt_len = total_len - int(self.ambig_counts.sum())
+        gc_perc = 100.0 * int(self.gc_counts.sum()) / acgt_len if acgt_len > 0 else None
+        softmask_perc = 100.0 * int(self.softmask_counts.sum()) / total_len if total_len > 0 else None
+        return (gc_perc, int(self.ambig_counts.sum()), softmask_perc, int(np.count_nonzero(self.ambig_counts)))
+
+
+def composition_from_byte_counts (byte_counts):
+    """
+    Return (seq_len, gc_count, ambig_count, softmask_count) from a 256-entry byte value histogram
+    """
+    composition = np.dot(BYTE_CLASS_MATRIX, byte_counts)
+    return (int(composition[0]), int(composition[1]), int(composition[0] - composition[2]), int(composition[3]))
+
+
+def composition_from_spans (seq_bytes, span_begs, span_ends):
+    """
+    Return a ContigComposition of the spans [beg, end) of a uint8 array, in order
+
+    For many short records at once: every byte is looked up in a 256-entry
+    table that packs its four class flags into 16-bit fields of one uint64,
+    and each span is then summed with a single np.add.reduceat.  Spans must
+    be ascending, non-overlapping, non-empty and shorter than 65536 bytes.
+    """
+    num_spans = len(span_begs)
+    if num_spans == 0:
+        return ContigComposition()
+    span_bounds = np.empty(2*num_spans - 1, dtype=np.int64)
+    span_bounds[0::2] = span_begs
+    span_bounds[1::2] = span_ends[:-1]
+    packed = np.add.reduceat(BYTE_CLASS_PACKED[seq_bytes[:span_ends[-1]]], span_bounds)[0::2]
+    fields = [((packed >> np.uint64(16*field_i)) & np.uint64(0xffff)).astype(np.int64) for field_i in range(4)]
+    return ContigComposition(fields[0], fields[1], fields[0] - fields[2], fields[3])
+
+
+def build_byte_class_matrix ():
+    """
+    Return the 4 x 256 indicator matrix of sequence, GC, ACGT and lowercase byte values
+    """
+    byte_class_matrix = np.zeros((4, 256), dtype=np.int64)
+    byte_class_matrix[0, :] = 1
+    for byte_val in b' \t\r\n\x0b\x0c':
+        byte_class_matrix[0, byte_val] = 0
+    for byte_val in b'GCgc':
+        byte_class_matrix[1, byte_val] = 1
+    for byte_val in b'ACGTacgt':
+        byte_class_matrix[2, byte_val] = 1
+    for byte_val in range(ord('a'), ord('z')+1):
+        byte_class_matrix[3, byte_val] = 1
+    return byte_class_matrix
+
+BYTE_CLASS_MATRIX = build_byte_class_matrix()
+BYTE_CLASS_PACKED = np.zeros(256, dtype=np.uint64)
+for class_i in range(4):
+    BYTE_CLASS_PACKED |= BYTE_CLASS_MATRIX[class_i].astype(np.uint64) << np.uint64(16*class_i)
+
+
+def count_column (vals):
+    """
+    Return vals as an integer array, as is if it already has an integer dtype, else as int64
+    """
+    vals = np.asarray(vals)
+    if vals.dtype.kind not in 'iu':
+        vals = vals.astype(np.int64)
+    return vals
+
+
+def concat_compositions (compositions):
+    """
+    Return one ContigComposition of all contigs of compositions, in order
+    """
+    if len(compositions) == 0:
+        return ContigComposition()
+    return ContigComposition(*[np.concatenate([getattr(composition, column) for composition in compositions])
+                               for column in ContigComposition.columns])
+
+
+def safe_percs (numerators, denominators):
+    """
+    Return 100 * numerators / denominators as float64, NaN where the denominator is 0
+    """
+    percs = np.full(np.shape(numerators), np.nan)
+    has_denominator = denominators > 0
+    percs[has_denominator] = 100.0 * numerators[has_denominator] / denominators[has_denominator]
+    return percs
+
+
+def perc_histogram (percs, num_bins=PERC_HISTOGRAM_BINS):
+    """
+    Return int64 counts of percs in num_bins equal bins over [0, 100]; NaN is skipped
+
+    100% falls in the last bin.
+    """
+    percs = np.asarray(percs, dtype=np.float64)
+    percs = percs[~np.isnan(percs)]
+    bin_is = np.minimum((percs * num_bins / 100.0).astype(np.int64), num_bins - 1)
+    return np.bincount(bin_is, minlength=num_bins).astype(np.int64)
+
+
+def parse_percs (percs_param):
+    """
+    Return the requested percentiles sorted and deduplicated, or DEFAULT_PERCS if none
+
+    Whole numbers are kept as ints so they print as N50 rather than N50.0.
+    """
+    if percs_param is None or percs_param == '' or percs_param == []:
+        return list(DEFAULT_PERCS)
+    if not isinstance(percs_param, list):
+        percs_param = [percs_param]
+    percs = set()
+    for perc in percs_param:
+        try:
+            perc = float(perc)
+        except (TypeError, ValueError):
+            raise ValueError ("Bad percentile: '"+str(perc)+"'.  Must be a number in (0, 100]")
+        if perc <= 0 or perc > 100:
+            raise ValueError ("Bad percentile: '"+str(perc)+"'.  Must be a number in (0, 100]")
+        if perc == int(perc):
+            perc = int(perc)
+        percs.add(perc)
+    return sorted(percs)
+
+
+def parse_len_buckets (len_buckets_param):
+    """
+    Return the requested length thresholds longest first, or DEFAULT_LEN_BUCKETS if none
+    """
+    if len_buckets_param is None or len_buckets_param == '' or len_buckets_param == []:
+        return list(DEFAULT_LEN_BUCKETS)
+    if not isinstance(len_buckets_param, list):
+        len_buckets_param = [len_buckets_param]
+    len_buckets = set()
+    for bucket in len_buckets_param:
+        try:
+            bucket = int(bucket)
+        except (TypeError, ValueError):
+            raise ValueError ("Bad length bucket: '"+str(bucket)+"'.  Must be a positive integer")
+        if bucket < 1:
+            raise ValueError ("Bad length bucket: '"+str(bucket)+"'.  Must be a positive integer")
+        len_buckets.add(bucket)
+    return sorted(len_buckets, reverse=True)
+
+
+def parse_approx_error_perc (error_perc_param):
+    """
+    Return the LengthSketch relative error for an error bound in %, or the DEFAULT_APPROX_ERROR_PERC one
+    """
+    if error_perc_param is None or error_perc_param == '':
+        return DEFAULT_APPROX_ERROR_PERC / 100.0
+    try:
+        error_perc = float(error_perc_param)
+    except (TypeError, ValueError):
+        error_perc = -1.0
+    if not (0.0 < error_perc < MAX_APPROX_ERROR_PERC):
+        raise ValueError ("Bad approximation error: '"+str(error_perc_param)+"'.  Must be a % > 0 and < "+
+                          str(MAX_APPROX_ERROR_PERC))
+    return error_perc / 100.0
+
+
+def sort_lens (lens):
+    """
+    Return lens as a new int64 array sorted longest first
+
+    Arrays already in that order are only copied.
+    """
+    lens = np.asarray(lens, dtype=np.int64)
+    if lens.size > 1 and bool(np.all(lens[:-1] >= lens[1:])):
+        return lens.copy()
+    sorted_lens = np.sort(lens)
+    return sorted_lens[::-1].copy()
+
+
+def nx_lx (sorted_lens, cumulative_lens, percs, cumulative_counts=None):
+    """
+    Return (N, L) arrays for each of percs from descending lens and their cumsum
+
+    Lx is the smallest number of contigs whose summed length reaches x% of
+    the total, and Nx the length of the last of them; all percentiles come
+    from one searchsorted into the cumulative sums.  With cumulative_counts,
+    sorted_lens are distinct lengths and L drops the contigs of the reaching
+    length that the target does not need.
+    """
+    if sorted_lens.size == 0:
+        return (np.zeros(len(percs), dtype=np.int64), np.zeros(len(percs), dtype=np.int64))
+    targets = np.asarray(percs, dtype=np.float64) / 100.0 * float(cumulative_lens[-1])
+    # whole sums reach a target exactly when they reach its ceiling, which keeps the search in int64
+    targets = np.ceil(targets).astype(np.int64)
+    idx = np.searchsorted(cumulative_lens, targets, side='left')
+    idx = np.minimum(idx, sorted_lens.size - 1)
+    N_vals = sorted_lens[idx].astype(np.int64)
+    if cumulative_counts is None:
+        return (N_vals, idx + 1)
+    num_spare = np.maximum(cumulative_lens[idx] - targets, 0) // np.maximum(N_vals, 1)
+    return (N_vals, cumulative_counts[idx] - num_spare)
+
+
+def bucket_stats (sorted_lens, cumulative_lens, len_buckets, cumulative_counts=None):
+    """
+    Return (counts, length sums) of contigs >= each of len_buckets
+
+    One searchsorted (see count_at_least()) gives the number of contigs at
+    or above every threshold; their length sums are then a lookup into the
+    cumulative sums.  Cost is O(b log n) for b buckets, so adding buckets is
+    nearly free.  With cumulative_counts, sorted_lens are distinct lengths.
+    """
+    num_steps = count_at_least(sorted_lens, len_buckets)
+    bucket_sums = np.zeros(num_steps.size, dtype=np.int64)
+    bucket_sums[num_steps > 0] = cumulative_lens[num_steps[num_steps > 0] - 1]
+    return (step_contig_counts(num_steps, cumulative_counts), bucket_sums)
+
+
+def step_contig_counts (num_steps, cumulative_counts=None):
+    """
+    Return the int64 number of contigs in the first num_steps distinct lengths of cumulative_counts
+
+    Without cumulative_counts every step is one contig.
+    """
+    num_steps = np.asarray(num_steps, dtype=np.int64)
+    if cumulative_counts is None:
+        return num_steps
+    counts = np.zeros(num_steps.size, dtype=np.int64)
+    counts[num_steps > 0] = cumulative_counts[num_steps[num_steps > 0] - 1]
+    return counts
+
+
+def prefix_lens (sorted_lens, cumulative_lens, num_contigs, cumulative_counts=None):
+    """
+    Return the int64 summed length of the num_contigs longest contigs, for each of num_contigs
+
+    With cumulative_counts, sorted_lens are distinct lengths: the step
+    holding the last contig is found by searchsorted, and its contigs past
+    that one are taken off its cumulative sum.
+    """
+    num_contigs = np.asarray(num_contigs, dtype=np.int64)
+    sums = np.zeros(num_contigs.size, dtype=np.int64)
+    nonzero = num_contigs > 0
+    if cumulative_counts is None:
+        sums[nonzero] = cumulative_lens[num_contigs[nonzero] - 1]
+        return sums
+    idx = np.searchsorted(cumulative_counts, num_contigs[nonzero], side='left')
+    num_past = cumulative_counts[idx] - num_contigs[nonzero]
+    sums[nonzero] = cumulative_lens[idx] - num_past * sorted_lens[idx].astype(np.int64)
+    return sums
+
+
+def count_at_least (sorted_lens, thresholds):
+    """
+    Return the int64 number of descending sorted_lens at or above each of thresholds
+
+    The thresholds are clipped to the range of sorted_lens' dtype and cast
+    to it, so np.searchsorted() reads the array in place (e.g. a uint32
+    memmap) instead of a widened copy.
+    """
+    max_val = min(int(np.iinfo(sorted_lens.dtype).max), int(np.iinfo(np.int64).max))
+    thresholds = [int(threshold) for threshold in thresholds]
+    clipped = np.array([min(max(threshold, 0), max_val) for threshold in thresholds], dtype=sorted_lens.dtype)
+    counts = sorted_lens.size - np.searchsorted(sorted_lens[::-1], clipped, side='left').astype(np.int64)
+    counts[np.array([threshold > max_val for threshold in thresholds], dtype=bool)] = 0
+    return counts
+
+
+def cumsum_int64 (vals, block_size=COLUMN_BLOCK_SIZE):
+    """
+    Return the running sum of vals as int64
+
+    Narrower integer input (e.g. a uint32 memmap) is widened a block at a
+    time, since np.cumsum(dtype=np.int64) would first cast all of it.
+    """
+    if vals.dtype == np.int64:
+        return np.cumsum(vals)
+    cumulative = np.empty(vals.size, dtype=np.int64)
+    carry = 0
+    for block_beg in range(0, vals.size, block_size):
+        block_end = min(vals.size, block_beg + block_size)
+        np.cumsum(vals[block_beg:block_end], dtype=np.int64, out=cumulative[block_beg:block_end])
+        cumulative[block_beg:block_end] += carry
+        carry = int(cumulative[block_end-1])
+    return cumulative
+
+
+class HistogramPlan:
+    """
+    One set of contig length bins shared by every assembly in a report
+
+    min_len, max_len: the window of lengths counted, [min_len, max_len)
+    edges:            ascending bin edges; bin i is [edges[i], edges[i+1])
+    log_scale:        whether the edges are log-spaced
+
+    Built once from the global length range by plan_histogram_bins(), so
+    counts of different assemblies are directly comparable.
+    """
+    def __init__ (self, min_len, max_len, edges, log_scale=False):
+        self.min_len = min_len
+        self.max_len = max_len
+        self.edges = np.asarray(edges, dtype=np.int64)
+        self.log_scale = log_scale
+        self.num_bins = int(self.edges.size) - 1
+
+    def count (self, window_values):
+        """
+        Return a (groups, num_bins) int64 matrix of counts for a list of (values, weights or None)
+
+        Every group's values are concatenated and binned in one np.digitize
+        pass; a group index then folds the bins into one row per group with
+        a single np.bincount, so the cost does not grow with the number of
+        groups beyond their values.  Values outside the window are skipped.
+        """
+        num_groups = len(window_values)
+        if num_groups == 0 or self.num_bins <= 0:
+            return np.zeros((num_groups, max(0, self.num_bins)), dtype=np.int64)
+        values = np.concatenate([np.asarray(vals, dtype=np.int64) for vals, weights in window_values])
+        group_sizes = [len(vals) for vals, weights in window_values]
+        groups = np.repeat(np.arange(num_groups, dtype=np.int64), group_sizes)
+        weights = None
+        if any([weights is not None for vals, weights in window_values]):
+            weights = np.concatenate([np.ones(len(vals), dtype=np.int64) if weights is None
+                                      else np.asarray(weights, dtype=np.int64)
+                                      for vals, weights in window_values])
+        bin_i = np.digitize(values, self.edges) - 1
+        in_plan = (values >= self.min_len) & (values < self.max_len) & (bin_i >= 0) & (bin_i < self.num_bins)
+        flat_bins = groups[in_plan] * self.num_bins + bin_i[in_plan]
+        if weights is not None:
+            weights = weights[in_plan]
+        counts = np.bincount(flat_bins, weights=weights, minlength=num_groups * self.num_bins)
+        return np.rint(counts).astype(np.int64).reshape(num_groups, self.num_bins)
+
+
+def plan_histogram_bins (min_len, max_len, binwidth, num_log_bins, log_min_ratio=HIST_LOG_MIN_RATIO):
+    """
+    Return a HistogramPlan for lengths in [min_len, max_len)
+
+    Windows from min_len >= 1 that span at least log_min_ratio fold get
+    num_log_bins log-spaced bins; others get bins of binwidth aligned at 0,
+    up to the bin holding max_len - 1.
+    """
+    if min_len >= 1 and max_len > min_len and float(max_len) / min_len >= log_min_ratio:
+        edges = np.unique(np.rint(np.geomspace(min_len, max_len, num_log_bins + 1)).astype(np.int64))
+        return HistogramPlan(min_len, max_len, edges, log_scale=True)
+    binwidth = max(1, int(binwidth))
+    num_bins = max(0, max_len - 1) // binwidth + 1
+    return HistogramPlan(min_len, max_len, binwidth * np.arange(num_bins + 1, dtype=np.int64))
+
+
+def nx_step_indices (cumulative_lens, percs):
+    """
+    Return the index of the contig at which the cumulative length reaches each of percs
+
+    These are the Nx/Lx breakpoints of the cumulative and sorted length
+    curves (index Lx - 1), as found by nx_lx().
+    """
+    if len(cumulative_lens) == 0:
+        return np.zeros(0, dtype=np.int64)
+    targets = np.asarray(percs, dtype=np.float64) / 100.0 * float(cumulative_lens[-1])
+    idx = np.searchsorted(cumulative_lens, np.ceil(targets).astype(np.int64), side='left')
+    return np.minimum(idx, len(cumulative_lens) - 1).astype(np.int64)
+
+
+def lttb_indices (x_coords, y_coords, max_vertices, keep_indices=None):
+    """
+    Return ascending indices of about max_vertices points that preserve the shape of the curve (x, y)
+
+    Largest-triangle-three-buckets: the curve is cut into max_vertices - 2
+    buckets and from each the point forming the largest triangle with the
+    previous pick and the next bucket's mean is kept.  x and y are scaled to
+    their ranges so both axes weigh equally, and buckets are of equal length
+    along the scaled curve rather than of equal point counts, so steep
+    stretches drawn by few contigs (the long contig end of the length
+    curves) get as many vertices as their drawn length needs.  The endpoints
+    and keep_indices are always kept exactly; the curve is split at them and
+    each piece gets a share of max_vertices by its length.  Curves of at most
+    max_vertices points, or max_vertices <= 0, are returned whole.
+    """
+    num_points = len(x_coords)
+    if max_vertices is None or max_vertices <= 0 or num_points <= max(max_vertices, 2):
+        return np.arange(num_points, dtype=np.int64)
+    x_coords = np.asarray(x_coords, dtype=np.float64)
+    y_coords = np.asarray(y_coords, dtype=np.float64)
+    x_scaled = (x_coords - x_coords.min()) / max(float(np.ptp(x_coords)), 1e-300)
+    y_scaled = (y_coords - y_coords.min()) / max(float(np.ptp(y_coords)), 1e-300)
+    # distance along the scaled curve to each point (plus a little per point, so flat runs still advance)
+    steps = np.abs(np.diff(x_scaled)) + np.abs(np.diff(y_scaled)) + 1.0 / num_points
+    curve_pos = np.concatenate(([0.0], np.cumsum(steps)))
+
+    anchors = [0, num_points - 1]
+    if keep_indices is not None:
+        anchors += [int(i) for i in keep_indices if 0 <= int(i) < num_points]
+    anchors = sorted(set(anchors))
+    picked = [np.asarray(anchors, dtype=np.int64)]
+    for piece_beg, piece_end in zip(anchors[:-1], anchors[1:]):
+        piece_len = (curve_pos[piece_end] - curve_pos[piece_beg]) / curve_pos[-1]
+        piece_vertices = max(2, int(round(max_vertices * piece_len)))
+        if piece_end - piece_beg + 1 <= piece_vertices:
+            picked.append(np.arange(piece_beg, piece_end + 1, dtype=np.int64))
+            continue
+        # interior points piece_beg+1 .. piece_end-1 into up to piece_vertices - 2 buckets
+        #   of equal curve length
+        bucket_pos = np.linspace(curve_pos[piece_beg + 1], curve_pos[piece_end], piece_vertices - 1)
+        bucket_edges = np.searchsorted(curve_pos, bucket_pos[:-1], side='left')
+        bucket_edges = np.unique(np.clip(bucket_edges, piece_beg + 1, piece_end - 1))
+        bucket_edges = np.append(bucket_edges, piece_end)
+        prev_i = piece_beg
+        for bucket_i in range(len(bucket_edges) - 1):
+            bucket_beg = bucket_edges[bucket_i]
+            bucket_end = bucket_edges[bucket_i + 1]
+            if bucket_i + 2 < len(bucket_edges):
+                next_x = x_scaled[bucket_end:bucket_edges[bucket_i + 2]].mean()
+                next_y = y_scaled[bucket_end:bucket_edges[bucket_i + 2]].mean()
+            else:
+                next_x = x_scaled[piece_end]
+                next_y = y_scaled[piece_end]
+            prev_x = x_scaled[prev_i]
+            prev_y = y_scaled[prev_i]
+            areas = np.abs((prev_x - next_x) * (y_scaled[bucket_beg:bucket_end] - prev_y) -
+                           (prev_x - x_scaled[bucket_beg:bucket_end]) * (next_y - prev_y))
+            prev_i = bucket_beg + int(np.argmax(areas))
+            picked.append(np.array([prev_i], dtype=np.int64))
+    return np.unique(np.concatenate(picked))
+
+
+def downsample_curve (x_coords, y_coords, max_vertices, keep_indices=None):
+    """
+    Return (x, y) reduced to about max_vertices vertices by lttb_indices(), keeping keep_indices
+    """
+    keep = lttb_indices(x_coords, y_coords, max_vertices, keep_indices)
+    if len(keep) == len(x_coords):
+        return (x_coords, y_coords)
+    return (np.asarray(x_coords)[keep], np.asarray(y_coords)[keep])
+
+
+def best_worst_vals (assembly_stats):
+    """
+    Return (best_val, worst_val) dicts across assemblies for colouring the report table
+
+    Longer contigs, higher N, more contigs and bases above each bucket are
+    better; lower L is better.
+    """
+    percs = assembly_stats[0].percs if len(assembly_stats) > 0 else DEFAULT_PERCS
+    len_buckets = assembly_stats[0].len_buckets if len(assembly_stats) > 0 else DEFAULT_LEN_BUCKETS
+    best_val = { 'len': 0,
+                 'N': {},
+                 'L': {},
+                 'summary_stats': {},
+                 'cumulative_len_stats': {}
+                 }
+    worst_val = { 'len': HUGE_VAL,
+                  'N': {},
+                  'L': {},
+                  'summary_stats': {},
+                  'cumulative_len_stats': {}
+                  }
+    for perc in percs:
+        best_val['N'][perc] = max([stats.N[perc] for stats in assembly_stats] + [0])
+        worst_val['N'][perc] = min([stats.N[perc] for stats in assembly_stats] + [HUGE_VAL])
+        best_val['L'][perc] = min([stats.L[perc] for stats in assembly_stats] + [HUGE_VAL])
+        worst_val['L'][perc] = max([stats.L[perc] for stats in assembly_stats] + [0])
+    for bucket in len_buckets:
+        bucket_counts = [stats.bucket_counts[bucket] for stats in assembly_stats]
+        bucket_lens = [stats.bucket_lens[bucket] for stats in assembly_stats]
+        best_val['summary_stats'][bucket] = max(bucket_counts + [0])
+        worst_val['summary_stats'][bucket] = min(bucket_counts + [HUGE_VAL])
+        best_val['cumulative_len_stats'][bucket] = max(bucket_lens + [0])
+        worst_val['cumulative_len_stats'][bucket] = min(bucket_lens + [HUGE_VAL])
+    best_val['len'] = max([stats.max_len for stats in assembly_stats] + [0])
+    worst_val['len'] = min([stats.max_len for stats in assembly_stats] + [HUGE_VAL])
+    return (best_val, worst_val)
+
+
+def write_nx_curve_table (table_path, assembly_stats, percs=NX_CURVE_PERCS):
+    """
+    Write a TSV of Nx and Lx for each of percs (rows) and assemblies (column pairs)
+    """
+    N_by_ass = []
+    L_by_ass = []
+    for stats in assembly_stats:
+        (N_vals, L_vals) = stats.nx_curve(percs)
+        N_by_ass.append(N_vals)
+        L_by_ass.append(L_vals)
+    with open (table_path, 'w') as table_handle:
+        header = ['x']
+        for stats in assembly_stats:
+            header += ['N('+stats.name+')', 'L('+stats.name+')']
+        table_handle.write("\t".join(header)+"\n")
+        for perc_i,perc in enumerate(percs):
+            row = [str(perc)]
+            for ass_i in range(len(assembly_stats)):
+                row += [str(N_by_ass[ass_i][perc_i]), str(L_by_ass[ass_i][perc_i])]
+            table_handle.write("\t".join(row)+"\n")
+    return (N_by_ass, L_by_ass)
@@ -0,0 +1,333 @@
+/*
+ * report_charts.js: draws the contig_distribution_compare() interactive report
+ *
+ * Bundled into the report page by Utils/ReportUtil.py, with the computed
+ * distributions as JSON in <script id="report_data">.  Every
+ * <div class="kbchart" data-chart="ID"> becomes a canvas drawing
+ * charts[ID]; hovering shows the values under the pointer.  No libraries,
+ * no network access.
+ */
+(function () {
+    'use strict';
+
+    // matplotlib's default colour cycle, so assemblies match the static report
+    var COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                  '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+    var BAR_COLOR = 'slateblue';
+    var GRID_COLOR = '#b0b0b0';
+    var TEXT_COLOR = '#303030';
+    var FONT = '11px sans-serif';
+    var MARGIN = {left: 58, right: 14, top: 26, bottom: 38};
+
+    function color (i) {
+        return COLORS[i % COLORS.length];
+    }
+
+    function esc (text) {
+        return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    }
+
+    function fmt (v) {
+        if (v === 0) { return '0'; }
+        var a = Math.abs(v);
+        if (a >= 1e5 || a < 1e-3) { return v.toExponential(2); }
+        return String(Math.round(v * 1000) / 1000);
+    }
+
+    // about n round-numbered ticks over [lo, hi]
+    function linearTicks (lo, hi, n) {
+        if (!(hi > lo)) { return [lo]; }
+        var step = Math.pow(10, Math.floor(Math.log((hi - lo) / n) / Math.LN10));
+        var err = (hi - lo) / n / step;
+        if (err >= 7.5) { step *= 10; } else if (err >= 3.5) { step *= 5; } else if (err >= 1.5) { step *= 2; }
+        var ticks = [];
+        for (var t = Math.ceil(lo / step) * step; t <= hi + step * 1e-9; t += step) {
+            ticks.push(Math.round(t / step) * step);
+        }
+        return ticks;
+    }
+
+    function logTicks (lo, hi) {
+        var ticks = [];
+        for (var e = Math.ceil(Math.log(lo) / Math.LN10 - 1e-9); Math.pow(10, e) <= hi * (1 + 1e-9); e++) {
+            ticks.push(Math.pow(10, e));
+        }
+        return ticks.length > 1 ? ticks : [lo, hi];
+    }
+
+    function extent (arrays, pad) {
+        var lo = Infinity, hi = -Infinity;
+        arrays.forEach(function (a) {
+            for (var i = 0; i < a.length; i++) {
+                if (a[i] < lo) { lo = a[i]; }
+                if (a[i] > hi) { hi = a[i]; }
+            }
+        });
+        if (lo === Infinity) { return [0, 1]; }
+        if (hi === lo) { hi = lo + 1; }
+        var margin = pad ? (hi - lo) * 0.05 : 0;
+        return [lo - margin, hi + margin];
+    }
+
+    // index of the last x <= v in ascending xs (or 0)
+    function bisect (xs, v) {
+        var lo = 0, hi = xs.length - 1;
+        if (hi < 0 || v < xs[0]) { return 0; }
+        while (lo < hi) {
+            var mid = (lo + hi + 1) >> 1;
+            if (xs[mid] <= v) { lo = mid; } else { hi = mid - 1; }
+        }
+        return lo;
+    }
+
+    // an x-y plotting area with pixel <-> data transforms, axes and grid
+    function Frame (ctx, box, xlim, ylim, xlog) {
+        this.ctx = ctx;
+        this.box = box;
+        this.xlim = xlim;
+        this.ylim = ylim;
+        this.xlog = xlog;
+    }
+    Frame.prototype.px = function (x) {
+        var b = this.box, lo = this.xlim[0], hi = this.xlim[1];
+        if (this.xlog) {
+            x = Math.log(Math.max(x, lo)); lo = Math.log(lo); hi = Math.log(hi);
+        }
+        return b.x + (x - lo) / (hi - lo) * b.w;
+    };
+    Frame.prototype.py = function (y) {
+        var b = this.box;
+        return b.y + b.h - (y - this.ylim[0]) / (this.ylim[1] - this.ylim[0]) * b.h;
+    };
+    Frame.prototype.dataX = function (px) {
+        var b = this.box, f = (px - b.x) / b.w, lo = this.xlim[0], hi = this.xlim[1];
+        if (this.xlog) { return Math.exp(Math.log(lo) + f * (Math.log(hi) - Math.log(lo))); }
+        return lo + f * (hi - lo);
+    };
+    Frame.prototype.contains = function (px, py) {
+        var b = this.box;
+        return px >= b.x && px <= b.x + b.w && py >= b.y && py <= b.y + b.h;
+    };
+    Frame.prototype.drawAxes = function (xlabel, ylabel) {
+        var ctx = this.ctx, b = this.box, self = this;
+        ctx.save();
+        ctx.font = FONT;
+        ctx.fillStyle = TEXT_COLOR;
+        ctx.strokeStyle = GRID_COLOR;
+        ctx.lineWidth = 0.5;
+        var xticks = this.xlog ? logTicks(this.xlim[0], this.xlim[1]) : linearTicks(this.xlim[0], this.xlim[1], 6);
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'top';
+        xticks.forEach(function (t) {
+            var x = self.px(t);
+            ctx.beginPath(); ctx.moveTo(x, b.y); ctx.lineTo(x, b.y + b.h); ctx.stroke();
+            ctx.fillText(fmt(t), x, b.y + b.h + 3);
+        });
+        ctx.textAlign = 'right';
+        ctx.textBaseline = 'middle';
+        linearTicks(this.ylim[0], this.ylim[1], 5).forEach(function (t) {
+            var y = self.py(t);
+            ctx.beginPath(); ctx.moveTo(b.x, y); ctx.lineTo(b.x + b.w, y); ctx.stroke();
+            ctx.fillText(fmt(t), b.x - 4, y);
+        });
+        ctx.strokeStyle = '#000000';
+        ctx.lineWidth = 1;
+        ctx.strokeRect(b.x, b.y, b.w, b.h);
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'bottom';
+        if (xlabel) { ctx.fillText(xlabel, b.x + b.w / 2, b.y + b.h + MARGIN.bottom - 2); }
+        if (ylabel) {
+            ctx.translate(b.x - MARGIN.left + 12, b.y + b.h / 2);
+            ctx.rotate(-Math.PI / 2);
+            ctx.textBaseline = 'middle';
+            ctx.fillText(ylabel, 0, 0);
+        }
+        ctx.restore();
+    };
+    Frame.prototype.clip = function () {
+        var b = this.box;
+        this.ctx.save();
+        this.ctx.beginPath();
+        this.ctx.rect(b.x, b.y, b.w, b.h);
+        this.ctx.clip();
+    };
+    Frame.prototype.drawLine = function (xs, ys, strokeColor, steps) {
+        var ctx = this.ctx;
+        this.clip();
+        ctx.strokeStyle = strokeColor;
+        ctx.lineWidth = 2;
+        ctx.lineJoin = 'round';
+        ctx.beginPath();
+        for (var i = 0; i < xs.length; i++) {
+            var x = this.px(xs[i]), y = this.py(ys[i]);
+            if (i === 0) {
+                ctx.moveTo(x, y);
+            } else if (steps === 'steps-pre') {
+                ctx.lineTo(this.px(xs[i - 1]), y); ctx.lineTo(x, y);
+            } else if (steps === 'steps-post') {
+                ctx.lineTo(x, this.py(ys[i - 1])); ctx.lineTo(x, y);
+            } else {
+                ctx.lineTo(x, y);
+            }
+        }
+        ctx.stroke();
+        ctx.restore();
+    };
+
+    function drawTitle (ctx, text, width) {
+        if (!text) { return; }
+        ctx.save();
+        ctx.font = '13px sans-serif';
+        ctx.fillStyle = TEXT_COLOR;
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'top';
+        ctx.fillText(text, width / 2, 6);
+        ctx.restore();
+    }
+
+    function plotBox (height, left, right) {
+        return {x: left + MARGIN.left, y: MARGIN.top,
+                w: right - left - MARGIN.left - MARGIN.right, h: height - MARGIN.top - MARGIN.bottom};
+    }
+
+    // each chart type: draw(ctx, chart, w, h) returns hover(px, py) giving tooltip html, or null
+    var DRAW = {};
+
+    DRAW.key = function (ctx, chart, w, h) {
+        var n = chart.names.length, row = h / (n + 1);
+        ctx.font = '13px sans-serif';
+        ctx.textBaseline = 'bottom';
+        chart.names.forEach(function (name, i) {
+            var y = (i + 0.75) * row;
+            ctx.strokeStyle = color(i);
+            ctx.lineWidth = 2;
+            ctx.beginPath(); ctx.moveTo(w * 0.05, y); ctx.lineTo(w * 0.95, y); ctx.stroke();
+            ctx.fillStyle = TEXT_COLOR;
+            ctx.textAlign = 'left';
+            ctx.fillText(name, w * 0.06, y - 2);
+        });
+        ctx.textAlign = 'center';
+        ctx.fillText(chart.title || '', w / 2, h - 2);
+        return null;
+    };
+
+    DRAW.lines = function (ctx, chart, w, h, names) {
+        var xlim = chart.xlim || extent(chart.lines.map(function (l) { return l[0]; }), false);
+        var ylim = extent(chart.lines.map(function (l) { return l[1]; }), true);
+        var frame = new Frame(ctx, plotBox(h, 0, w), xlim, ylim, false);
+        drawTitle(ctx, chart.title, w);
+        frame.drawAxes(chart.xlabel, chart.ylabel);
+        chart.lines.forEach(function (l, i) { frame.drawLine(l[0], l[1], color(i), chart.drawstyle); });
+        return function (px, py) {
+            if (!frame.contains(px, py)) { return null; }
+            var x = frame.dataX(px), rows = [esc(chart.xlabel) + ': ' + fmt(x)];
+            chart.lines.forEach(function (l, i) {
+                if (!l[0].length) { return; }
+                var j = bisect(l[0], x);
+                if (chart.drawstyle === 'steps-pre' && l[0][j] < x && j + 1 < l[0].length) { j += 1; }
+                rows.push('<span style="color:' + color(i) + '">&#9632;</span> ' + esc(names[i]) + ': ' + fmt(l[1][j]));
+            });
+            return rows.join('<br>');
+        };
+    };
+
+    DRAW.panels = function (ctx, chart, w, h, names) {
+        var n = chart.panels.length, edges = chart.bin_edges, frames = [];
+        chart.panels.forEach(function (panel, p) {
+            var ylim = extent(panel[1], true);
+            ylim[0] = Math.min(ylim[0], 0);
+            var frame = new Frame(ctx, plotBox(h, p * w / n, (p + 1) * w / n), [edges[0], edges[edges.length - 1]], ylim, false);
+            frame.drawAxes(panel[0], p === 0 ? '# contigs' : '');
+            panel[1].forEach(function (counts, i) {
+                frame.drawLine(edges, counts.concat([counts[counts.length - 1]]), color(i), 'steps-post');
+            });
+            frames.push(frame);
+        });
+        return function (px, py) {
+            for (var p = 0; p < n; p++) {
+                if (!frames[p].contains(px, py)) { continue; }
+                var b = Math.min(bisect(edges, frames[p].dataX(px)), edges.length - 2);
+                var rows = [esc(chart.panels[p][0]) + ': ' + fmt(edges[b]) + ' - ' + fmt(edges[b + 1])];
+                chart.panels[p][1].forEach(function (counts, i) {
+                    rows.push('<span style="color:' + color(i) + '">&#9632;</span> ' + esc(names[i]) + ': ' + counts[b]);
+                });
+                return rows.join('<br>');
+            }
+            return null;
+        };
+    };
+
+    DRAW.bars = function (ctx, chart, w, h) {
+        var edges = chart.bin_edges, counts = chart.counts;
+        var frame = new Frame(ctx, plotBox(h, 0, w), chart.xlim, chart.ylim, chart.log_scale);
+        frame.drawAxes(chart.xlabel, '# contigs');
+        frame.clip();
+        ctx.fillStyle = chart.color || BAR_COLOR;
+        for (var i = 0; i < counts.length; i++) {
+            if (!counts[i]) { continue; }
+            var x0 = frame.px(edges[i]), x1 = frame.px(edges[i + 1]), y = frame.py(counts[i]);
+            ctx.fillRect(x0, y, Math.max(x1 - x0, 0.5), frame.py(0) - y);
+        }
+        ctx.restore();
+        return function (px, py) {
+            if (!frame.contains(px, py)) { return null; }
+            var x = frame.dataX(px);
+            if (x < edges[0] || x >= edges[edges.length - 1]) { return null; }
+            var b = Math.min(bisect(edges, x), counts.length - 1);
+            return fmt(edges[b]) + ' - ' + fmt(edges[b + 1]) + ': ' + counts[b] + ' contigs';
+        };
+    };
+
+    function showTip (tip, html, ev) {
+        if (!html) { tip.style.display = 'none'; return; }
+        tip.innerHTML = html;
+        tip.style.display = 'block';
+        tip.style.left = (ev.pageX + 12) + 'px';
+        tip.style.top = (ev.pageY + 12) + 'px';
+    }
+
+    function drawChart (div, chart, names, tip) {
+        var w = parseInt(div.getAttribute('data-width'), 10);
+        var h = parseInt(div.getAttribute('data-height'), 10);
+        var aspect = chart.width / chart.height;
+        if (!w) { w = Math.round(h * aspect); }
+        if (!h) { h = Math.round(w / aspect); }
+        var ratio = window.devicePixelRatio || 1;
+        var canvas = document.createElement('canvas');
+        canvas.width = w * ratio;
+        canvas.height = h * ratio;
+        canvas.style.width = w + 'px';
+        canvas.style.height = h + 'px';
+        div.appendChild(canvas);
+        var ctx = canvas.getContext('2d');
+        ctx.scale(ratio, ratio);
+        ctx.fillStyle = '#ffffff';
+        ctx.fillRect(0, 0, w, h);
+        var hover = DRAW[chart.type](ctx, chart, w, h, names);
+        if (hover) {
+            canvas.addEventListener('mousemove', function (ev) {
+                var r = canvas.getBoundingClientRect();
+                showTip(tip, hover(ev.clientX - r.left, ev.clientY - r.top), ev);
+            });
+            canvas.addEventListener('mouseleave', function () { tip.style.display = 'none'; });
+        }
+    }
+
+    function init () {
+        var data = JSON.parse(document.getElementById('report_data').textContent);
+        var tip = document.createElement('div');
+        tip.className = 'kbchart_tip';
+        document.body.appendChild(tip);
+        var divs = document.querySelectorAll('div.kbchart');
+        for (var i = 0; i < divs.length; i++) {
+            var chart = data.charts[divs[i].getAttribute('data-chart')];
+            if (chart) { drawChart(divs[i], chart, data.assemblies, tip); }
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
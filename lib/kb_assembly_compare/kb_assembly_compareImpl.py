@@ -8,14 +8,41 @@ import uuid
 from datetime import datetime
 from pprint import pprint, pformat
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.DataFileUtilClient import DataFileUtil as DFUClient
 from installed_clients.KBaseReportClient import KBaseReport
-from installed_clients.SetAPIServiceClient import SetAPI
-from installed_clients.WorkspaceClient import Workspace as workspaceService
+from kb_assembly_compare.Utils.CacheUtil import length_dtype, StatsCache
+from kb_assembly_compare.Utils.FastaUtil import (can_stream_fasta,
+                                                 contig_composition_parallel,
+                                                 contig_length_sketch_parallel,
+                                                 contig_length_stats_parallel,
+                                                 contig_sketch_parallel,
+                                                 filter_fasta_by_length_parallel,
+                                                 preview_filter_by_length_parallel)
+from kb_assembly_compare.Utils.FilterUtil import ContigFilter, preview_sorted_lengths
+from kb_assembly_compare.Utils.ParallelUtil import format_peak_memory, get_num_workers
+from kb_assembly_compare.Utils.ReportUtil import (chart_html,
+                                                  report_payload,
+                                                  report_script_html,
+                                                  report_style_html,
+                                                  write_report_data)
+from kb_assembly_compare.Utils.StatsUtil import (ApproxAssemblyStats,
+                                                 AssemblyStats,
+                                                 best_worst_vals,
+                                                 ContigComposition,
+                                                 DEFAULT_PERCS,
+                                                 DEFAULT_PLOT_MAX_VERTICES,
+                                                 downsample_curve,
+                                                 NX_CURVE_PERCS,
+                                                 nx_step_indices,
+                                                 parse_approx_error_perc,
+                                                 parse_len_buckets,
+                                                 parse_percs,
+                                                 plan_histogram_bins,
+                                                 sketch_from_columns,
+                                                 write_nx_curve_table)
 
 [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I,
  SIZE_I, META_I] = list(range(11))  # object_info tuple
@@ -50,6 +77,11 @@ class kb_assembly_compare:
     serviceWizardURL = None
     callbackURL      = None
     scratch          = None
+    num_workers      = 1
+    compress_filter_output = False
+    stats_cache_dir        = None
+    stats_cache_max_bytes  = 0
+    plot_max_vertices      = DEFAULT_PLOT_MAX_VERTICES
 
     # wrapped program(s)
     MUMMER_bin = '/usr/local/bin/mummer'
@@ -63,6 +95,11 @@ class kb_assembly_compare:
         print('['+timestamp+'] '+message)
         sys.stdout.flush()
 
+    # stats cache entries are keyed by the resolved UPA and checksum of the assembly object
+    def stats_cache_key(self, obj_info):
+        upa = str(obj_info[WSID_I])+'/'+str(obj_info[OBJID_I])+'/'+str(obj_info[VERSION_I])
+        return StatsCache.entry_key(upa, obj_info[CHSUM_I])
+
     #END_CLASS_HEADER
 
     # config contains contents of config file in a hash or None if it couldn't
@@ -75,6 +112,11 @@ class kb_assembly_compare:
         self.serviceWizardURL = config['srv-wiz-url']
         self.callbackURL = os.environ['SDK_CALLBACK_URL']
         self.scratch = os.path.abspath(config['scratch'])
+        self.num_workers = get_num_workers(config.get('num-workers'))
+        self.compress_filter_output = str(config.get('compress-filter-output', 'false')).lower() in ['1', 'true', 'yes']
+        self.stats_cache_dir = os.path.join(self.scratch, config.get('stats-cache-dir') or 'stats_cache')
+        self.stats_cache_max_bytes = int(float(config.get('stats-cache-max-mb', 2048)) * 1024 * 1024)
+        self.plot_max_vertices = int(config.get('plot-max-vertices') or DEFAULT_PLOT_MAX_VERTICES)
 
         pprint(config)
 
@@ -97,11 +139,23 @@ class kb_assembly_compare:
            should just be used for workspace ** "name" is a string identifier
            of a workspace or object.  This is received from Narrative.),
            parameter "input_assembly_refs" of type "data_obj_ref", parameter
-           "min_contig_length" of Long, parameter "output_name" of type
-           "data_obj_name"
+           "min_contig_length" of list of Long, parameter "output_name" of
+           type "data_obj_name", parameter "max_contig_length" of Long,
+           parameter "min_gc_perc" of Double, parameter "max_gc_perc" of
+           Double, parameter "max_n_perc" of Double, parameter
+           "top_n_longest" of Long, parameter "cumulative_perc" of Double,
+           parameter "preview" of type "bool"
         :returns: instance of type "Filter_Contigs_by_Length_Output" ->
            structure: parameter "report_name" of type "data_obj_name",
-           parameter "report_ref" of type "data_obj_ref"
+           parameter "report_ref" of type "data_obj_ref", parameter "preview"
+           of list of type "Filter_Preview_Row" -> structure: parameter
+           "assembly_ref" of type "data_obj_ref", parameter "assembly_name"
+           of type "data_obj_name", parameter "min_contig_length" of Long,
+           parameter "original_contig_count" of Long, parameter
+           "original_base_count" of Long, parameter "kept_contig_count" of
+           Long, parameter "kept_base_count" of Long, parameter
+           "removed_contig_count" of Long, parameter "removed_base_count" of
+           Long
         """
         # ctx is the context object
         # return variables are: returnVal
@@ -124,12 +178,14 @@ class kb_assembly_compare:
         # API Clients
         #SERVICE_VER = 'dev'  # DEBUG
         SERVICE_VER = 'release'
-        # wsClient
+        # wsClient (the large generated clients are imported on first use, not at service start)
+        from installed_clients.WorkspaceClient import Workspace as workspaceService
         try:
             wsClient = workspaceService(self.workspaceURL, token=token)
         except Exception as e:
             raise ValueError('Unable to instantiate wsClient with workspaceURL: '+ self.workspaceURL +' ERROR: ' + str(e))
         # setAPI_Client
+        from installed_clients.SetAPIServiceClient import SetAPI
         try:
             #setAPI_Client = SetAPI (url=self.callbackURL, token=ctx['token'])  # for SDK local.  local doesn't work for SetAPI
             setAPI_Client = SetAPI (url=self.serviceWizardURL, token=ctx['token'])  # for dynamic service
@@ -156,6 +212,26 @@ class kb_assembly_compare:
             if arg not in params or params[arg] == None or params[arg] == '':
                 raise ValueError ("Must define required param: '"+arg+"'")
 
+        # min_contig_length may be a single threshold or a list of them
+        if isinstance(params['min_contig_length'], list):
+            min_contig_lengths = params['min_contig_length']
+        else:
+            min_contig_lengths = [params['min_contig_length']]
+        try:
+            min_contig_lengths = sorted(set([int(min_contig_length) for min_contig_length in min_contig_lengths]))
+        except (TypeError, ValueError):
+            raise ValueError ("Bad min_contig_length: '"+str(params['min_contig_length'])+"'.  Must be an integer or list of integers")
+        if len(min_contig_lengths) == 0:
+            raise ValueError ("Must define required param: 'min_contig_length'")
+
+        # optional predicates applied in the same pass (None if none are set)
+        contig_filter = ContigFilter.from_params(params)
+
+        # preview only counts what each threshold would keep, without writing or saving anything
+        preview = False
+        if 'preview' in params and params['preview'] != None and params['preview'] != '' and int(params['preview']) == 1:
+            preview = True
+
         # load provenance
         provenance = [{}]
         if 'provenance' in ctx:
@@ -182,6 +258,7 @@ class kb_assembly_compare:
             accepted_input_types = [set_obj_type] + assembly_obj_types
             assembly_refs = []
             assembly_names = []
+            assembly_infos = []  # resolved UPA and checksum key the contig length store
             assembly_refs_seen = dict()
 
             for i,input_ref in enumerate(params['input_assembly_refs']):
@@ -210,6 +287,7 @@ class kb_assembly_compare:
                         assembly_refs_seen[input_ref] = True
                         assembly_refs.append(input_ref)
                         assembly_names.append(input_obj_name)
+                        assembly_infos.append(input_obj_info)
                 elif input_obj_type != set_obj_type:
                     raise ValueError ("bad obj type for input_ref: "+input_ref)
                 else:  # add assembly set members
@@ -233,6 +311,7 @@ class kb_assembly_compare:
                                 this_input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
                                 this_input_obj_name = this_input_obj_info[NAME_I]
                                 assembly_names.append(this_input_obj_name)
+                                assembly_infos.append(this_input_obj_info)
                             except Exception as e:
                                 raise ValueError('Unable to get object from workspace: (' + this_assembly_ref +')' + str(e))
 
@@ -247,62 +326,109 @@ class kb_assembly_compare:
             #    os.makedirs(assembly_outdir)
             score_assembly_file_paths = []
 
+            # a preview of length-only predicates is answered from stored sorted contig lengths where available
+            preview_from_lens = preview and (contig_filter is None or not contig_filter.needs_composition())
+            stats_cache = None
+            if preview_from_lens:
+                stats_cache = StatsCache(self.stats_cache_dir, self.stats_cache_max_bytes)
+            stats_cache_keys = []
+            sorted_lens = []
+            sorted_counts = []  # contigs of each of sorted_lens, for lengths scored as distinct-length counts
+            score_ass_indices = []  # assemblies to download, in the order of score_assembly_file_paths
+
             for ass_i,input_ref in enumerate(assembly_refs):
                 self.log (console, "\tAssembly: "+assembly_names[ass_i]+" ("+assembly_refs[ass_i]+")")  # DEBUG
+                stats_cache_keys.append(None)
+                sorted_lens.append(None)
+                sorted_counts.append(None)
+                if preview_from_lens:
+                    stats_cache_keys[ass_i] = self.stats_cache_key(assembly_infos[ass_i])
+                    sorted_lens[ass_i] = stats_cache.get(stats_cache_keys[ass_i])
+                if sorted_lens[ass_i] is not None:
+                    self.log (console, "\t\tcontig lengths found in stats cache.  Skipping download")  # DEBUG
+                    continue
+                score_ass_indices.append(ass_i)
                 contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
                 sys.stdout.flush()
-                contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                if can_stream_fasta(contig_file):
+                    contig_file_path = contig_file  # plain, gzip and BGZF are read directly
+                else:
+                    contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
                 score_assembly_file_paths.append(contig_file_path)
                 #clean_ass_ref = assembly_ref.replace('/','_')
                 #assembly_outfile_path = os.join(assembly_outdir, clean_assembly_ref+".fna")
                 #shutil.move(contig_file_path, assembly_outfile_path)
 
 
-        #### STEP 3: Get contig attributes and create filtered output files
+        #### STEP 3 (preview): count kept and removed contigs and bases from lengths only
         ##
-        if len(invalid_msgs) == 0:
-            filtered_contig_file_paths = []
-            original_contig_count = []
-            filtered_contig_count = []
+        if len(invalid_msgs) == 0 and preview:
+            self.log (console, "Previewing "+str(len(assembly_refs))+" assemblies by "+str(len(min_contig_lengths))+" thresholds with up to "+str(self.num_workers)+" workers")
+            if preview_from_lens:
+                # store the sorted lengths of downloaded assemblies, then count every assembly from its lengths
+                #   (downloaded ones from their distinct lengths and counts, never one value per contig in memory)
+                scored_lens = contig_length_stats_parallel(score_assembly_file_paths, self.num_workers)
+                for score_i,ass_i in enumerate(score_ass_indices):
+                    (length_values, length_counts) = scored_lens[score_i].length_counts()
+                    sorted_lens[ass_i] = length_values[::-1]
+                    sorted_counts[ass_i] = length_counts[::-1]
+                    scored_lens[score_i] = None
+                    if not stats_cache.put(stats_cache_keys[ass_i], sorted_lens[ass_i], counts=sorted_counts[ass_i]):
+                        self.log (console, "Unable to add "+assembly_names[ass_i]+" to stats cache")  # DEBUG
+                preview_counts = [preview_sorted_lengths(sorted_lens[ass_i], min_contig_lengths, contig_filter, sorted_counts[ass_i])
+                                  for ass_i in range(len(assembly_refs))]
+            else:
+                preview_counts = preview_filter_by_length_parallel(score_assembly_file_paths,
+                                                                   min_contig_lengths,
+                                                                   self.num_workers,
+                                                                   contig_filter)
+            preview_rows = []
+            for ass_i,(this_original_count, this_original_bases, this_filtered_counts, this_filtered_bases) in enumerate(preview_counts):
+                for thresh_i,min_contig_length in enumerate(min_contig_lengths):
+                    preview_rows.append({'assembly_ref': assembly_refs[ass_i],
+                                         'assembly_name': assembly_names[ass_i],
+                                         'min_contig_length': min_contig_length,
+                                         'original_contig_count': this_original_count,
+                                         'original_base_count': this_original_bases,
+                                         'kept_contig_count': this_filtered_counts[thresh_i],
+                                         'kept_base_count': this_filtered_bases[thresh_i],
+                                         'removed_contig_count': this_original_count - this_filtered_counts[thresh_i],
+                                         'removed_base_count': this_original_bases - this_filtered_bases[thresh_i]
+                                     })
 
-            # score fasta lens in contig files
-            read_buf_size  = 65536
-            write_buf_size = 65536
 
-            lens = []
+        #### STEP 3: Get contig attributes and create filtered output files
+        ##
+        if len(invalid_msgs) == 0 and not preview:
+            filtered_contig_file_paths = []  # [ass_i][thresh_i]
+            original_contig_count = []       # [ass_i]
+            filtered_contig_count = []       # [ass_i][thresh_i]
+
+            # score fasta lens in contig files and filter (in parallel across and within assemblies)
+            #   each contig file is read once, and each contig is written to every output whose threshold it meets
             for ass_i,assembly_file_path in enumerate(score_assembly_file_paths):
                 ass_name = assembly_names[ass_i]
                 self.log (console, "Reading contig lengths in assembly: "+ass_name)  # DEBUG
 
-                original_contig_count.append(0)
-                filtered_contig_count.append(0)
-                filtered_file_path = assembly_file_path+".min_contig_length="+str(params['min_contig_length'])+"bp"
-                filtered_contig_file_paths.append(filtered_file_path)
-                with open (assembly_file_path, 'r', read_buf_size) as ass_handle, \
-                     open (filtered_file_path, 'w', write_buf_size) as filt_handle:
-                    seq_buf = ''
-                    last_header = ''
-                    for fasta_line in ass_handle:
-                        if fasta_line.startswith('>'):
-                            if seq_buf != '':
-                                original_contig_count[ass_i] += 1
-                                seq_len = len(seq_buf)
-                                if seq_len >= int(params['min_contig_length']):
-                                    filtered_contig_count[ass_i] += 1
-                                    filt_handle.write(last_header)  # last_header already has newline
-                                    filt_handle.write(seq_buf+"\n")
-                                seq_buf = ''
-                                last_header = fasta_line
-                        else:
-                            seq_buf += ''.join(fasta_line.split())
-                    if seq_buf != '':
-                        original_contig_count[ass_i] += 1
-                        seq_len = len(seq_buf)
-                        if seq_len >= int(params['min_contig_length']):
-                            filtered_contig_count[ass_i] += 1
-                            filt_handle.write(last_header)  # last_header already has newline
-                            filt_handle.write(seq_buf+"\n")
-                        seq_buf = ''
+                this_filtered_file_paths = []
+                for min_contig_length in min_contig_lengths:
+                    filtered_file_path = assembly_file_path+".min_contig_length="+str(min_contig_length)+"bp"
+                    if self.compress_filter_output:
+                        filtered_file_path += ".fa.gz"
+                    this_filtered_file_paths.append(filtered_file_path)
+                filtered_contig_file_paths.append(this_filtered_file_paths)
+
+            self.log (console, "Filtering "+str(len(score_assembly_file_paths))+" assemblies by "+str(len(min_contig_lengths))+" thresholds with up to "+str(self.num_workers)+" workers")
+            if contig_filter is not None:
+                self.log (console, "Also requiring: "+", ".join(contig_filter.describe()))
+            for (this_original_count, this_filtered_counts) in filter_fasta_by_length_parallel(score_assembly_file_paths,
+                                                                                               filtered_contig_file_paths,
+                                                                                               min_contig_lengths,
+                                                                                               self.num_workers,
+                                                                                               self.compress_filter_output,
+                                                                                               contig_filter):
+                original_contig_count.append(this_original_count)
+                filtered_contig_count.append(this_filtered_counts)
 
                 # DEBUG
                 #with open (filtered_file_path, 'r', read_buf_size) as ass_handle:
@@ -310,69 +436,86 @@ class kb_assembly_compare:
                 #        print ("FILTERED LINE: '"+fasta_line+"'")
 
 
-        #### STEP 4: save the filtered assemblies
+        #### STEP 4: save the filtered assemblies (and one AssemblySet per threshold)
         ##
-        if len(invalid_msgs) == 0:
+        if len(invalid_msgs) == 0 and not preview:
             non_zero_output_seen = False
-            filtered_contig_refs  = []
-            filtered_contig_names = []
+            filtered_contig_refs  = []  # [thresh_i][ass_i]
+            filtered_contig_names = []  # [thresh_i][ass_i]
+            output_assemblySet_refs  = []  # [thresh_i]
+            output_assemblySet_names = []  # [thresh_i]
             #assemblyUtil = AssemblyUtil(self.callbackURL)
-            for ass_i,filtered_contig_file in enumerate(filtered_contig_file_paths):
-                if filtered_contig_count[ass_i] == 0:
-                    self.log (console, "SKIPPING totally filtered assembled contigs from "+assembly_names[ass_i])
-                    filtered_contig_refs.append(None)
-                    filtered_contig_names.append(None)
-                else:
-                    non_zero_output_seen = True
-                    if len(assembly_refs) == 1:
+            for thresh_i,min_contig_length in enumerate(min_contig_lengths):
+                thresh_suffix = ".min_contig_length"+str(min_contig_length)+"bp"
+                thresh_non_zero_output_seen = False
+                filtered_contig_refs.append([])
+                filtered_contig_names.append([])
+                for ass_i,assembly_filtered_file_paths in enumerate(filtered_contig_file_paths):
+                    filtered_contig_file = assembly_filtered_file_paths[thresh_i]
+                    if len(assembly_refs) > 1:
+                        output_obj_name = assembly_names[ass_i]+thresh_suffix
+                    elif len(min_contig_lengths) > 1:
+                        output_obj_name = params['output_name']+thresh_suffix
+                    else:
                         output_obj_name = params['output_name']
+                    filtered_contig_names[thresh_i].append(output_obj_name)
+
+                    if filtered_contig_count[ass_i][thresh_i] == 0:
+                        self.log (console, "SKIPPING totally filtered assembled contigs from "+assembly_names[ass_i]+" at min_contig_length >= "+str(min_contig_length)+"bp")
+                        filtered_contig_refs[thresh_i].append(None)
                     else:
-                        output_obj_name = assembly_names[ass_i]+".min_contig_length"+str(params['min_contig_length'])+"bp"
-                    output_data_ref = auClient.save_assembly_from_fasta({
-                        'file': {'path': filtered_contig_file},
-                        'workspace_name': params['workspace_name'],
-                        'assembly_name': output_obj_name
-                    })
-                    filtered_contig_refs.append(output_data_ref)
-                    filtered_contig_names.append(output_obj_name)
-            # save AssemblySet
-            if len(assembly_refs) > 1 and non_zero_output_seen:
-                items = []
-                for ass_i,filtered_contig_file in enumerate(filtered_contig_file_paths):
-                    if filtered_contig_count[ass_i] == 0:
-                        continue
-                    self.log (console, "adding filtered assembly: "+filtered_contig_names[ass_i])
-                    items.append({'ref': filtered_contig_refs[ass_i],
-                                  'label': filtered_contig_names[ass_i],
-                                  #'data_attachment': ,
-                                  #'info'
-                              })
-
-                # load the method provenance from the context object                 
-                self.log(console,"SETTING PROVENANCE")  # DEBUG
-                provenance = [{}]
-                if 'provenance' in ctx:
-                    provenance = ctx['provenance']
-                # add additional info to provenance here, in this case the input data object reference                                                           
-                provenance[0]['input_ws_objects'] = []
-                for assRef in params['input_assembly_refs']:
-                    provenance[0]['input_ws_objects'].append(assRef)
-                provenance[0]['service'] = 'kb_assembly_compare'
-                provenance[0]['method'] = 'run_filter_contigs_by_length'
+                        non_zero_output_seen = True
+                        thresh_non_zero_output_seen = True
+                        output_data_ref = auClient.save_assembly_from_fasta({
+                            'file': {'path': filtered_contig_file},
+                            'workspace_name': params['workspace_name'],
+                            'assembly_name': output_obj_name
+                        })
+                        filtered_contig_refs[thresh_i].append(output_data_ref)
 
                 # save AssemblySet
-                self.log(console,"SAVING ASSEMBLY_SET")  # DEBUG
-                output_assemblySet_obj = { 'description': params['output_name']+" filtered by min_contig_length >= "+str(params['min_contig_length'])+"bp",
-                                           'items': items
-                                       }
-                output_assemblySet_name = params['output_name']
-                try:
-                    output_assemblySet_ref = setAPI_Client.save_assembly_set_v1 ({'workspace_name': params['workspace_name'],
-                                                                                  'output_object_name': output_assemblySet_name,
-                                                                                  'data': output_assemblySet_obj
-                                                                              })['set_ref']
-                except Exception as e:
-                    raise ValueError('SetAPI FAILURE: Unable to save assembly set object to workspace: (' + params['workspace_name']+")\n" + str(e))
+                output_assemblySet_refs.append(None)
+                if len(min_contig_lengths) > 1:
+                    output_assemblySet_names.append(params['output_name']+thresh_suffix)
+                else:
+                    output_assemblySet_names.append(params['output_name'])
+                if len(assembly_refs) > 1 and thresh_non_zero_output_seen:
+                    items = []
+                    for ass_i in range(len(assembly_refs)):
+                        if filtered_contig_count[ass_i][thresh_i] == 0:
+                            continue
+                        self.log (console, "adding filtered assembly: "+filtered_contig_names[thresh_i][ass_i])
+                        items.append({'ref': filtered_contig_refs[thresh_i][ass_i],
+                                      'label': filtered_contig_names[thresh_i][ass_i],
+                                      #'data_attachment': ,
+                                      #'info'
+                                  })
+
+                    # load the method provenance from the context object
+                    self.log(console,"SETTING PROVENANCE")  # DEBUG
+                    provenance = [{}]
+                    if 'provenance' in ctx:
+                        provenance = ctx['provenance']
+                    # add additional info to provenance here, in this case the input data object reference
+                    provenance[0]['input_ws_objects'] = []
+                    for assRef in params['input_assembly_refs']:
+                        provenance[0]['input_ws_objects'].append(assRef)
+                    provenance[0]['service'] = 'kb_assembly_compare'
+                    provenance[0]['method'] = 'run_filter_contigs_by_length'
+
+                    # save AssemblySet
+                    self.log(console,"SAVING ASSEMBLY_SET")  # DEBUG
+                    output_assemblySet_obj = { 'description': params['output_name']+" filtered by min_contig_length >= "+str(min_contig_length)+"bp",
+                                               'items': items
+                                           }
+                    output_assemblySet_name = output_assemblySet_names[thresh_i]
+                    try:
+                        output_assemblySet_refs[thresh_i] = setAPI_Client.save_assembly_set_v1 ({'workspace_name': params['workspace_name'],
+                                                                                                 'output_object_name': output_assemblySet_name,
+                                                                                                 'data': output_assemblySet_obj
+                                                                                             })['set_ref']
+                    except Exception as e:
+                        raise ValueError('SetAPI FAILURE: Unable to save assembly set object to workspace: (' + params['workspace_name']+")\n" + str(e))
 
 
         #### STEP 5: generate and save the report
@@ -380,26 +523,46 @@ class kb_assembly_compare:
         if len(invalid_msgs) > 0:
             report_text += "\n".join(invalid_msgs)
             objects_created = None
+        elif preview:
+            # preview report text (nothing is created)
+            report_text += "PREVIEW ONLY: no filtered Assemblies or AssemblySets were saved\n\n"
+            if contig_filter is not None:
+                report_text += 'Kept contigs also required: '+", ".join(contig_filter.describe())+"\n\n"
+            report_text += "\t".join(['ASSEMBLY', 'MIN_CONTIG_LENGTH', 'KEPT_CONTIGS', 'REMOVED_CONTIGS', 'KEPT_BASES', 'REMOVED_BASES'])+"\n"
+            for row in preview_rows:
+                report_text += "\t".join([row['assembly_name'],
+                                          str(row['min_contig_length'])+'bp',
+                                          str(row['kept_contig_count'])+' / '+str(row['original_contig_count']),
+                                          str(row['removed_contig_count']),
+                                          str(row['kept_base_count'])+' / '+str(row['original_base_count']),
+                                          str(row['removed_base_count'])])+"\n"
+            objects_created = None
         else:
             # report text
-            if len(assembly_refs) > 1 and non_zero_output_seen:
-                report_text += 'AssemblySet saved to: ' + params['workspace_name'] + '/' + params['output_name'] + "\n\n"
-            for ass_i,filtered_contig_file in enumerate(filtered_contig_file_paths):
-                report_text += 'ORIGINAL Contig count: '+str(original_contig_count[ass_i])+"\t"+'in Assembly '+assembly_names[ass_i]+"\n"
-                report_text += 'FILTERED Contig count: '+str(filtered_contig_count[ass_i])+"\t"+'in Assembly '+filtered_contig_names[ass_i]+"\n\n"
-                if filtered_contig_count[ass_i] == 0:
-                    report_text += "  (no output object created for "+filtered_contig_names[ass_i]+")"+"\n"
+            if contig_filter is not None:
+                report_text += 'Kept contigs also required: '+", ".join(contig_filter.describe())+"\n\n"
+            for thresh_i,min_contig_length in enumerate(min_contig_lengths):
+                if len(min_contig_lengths) > 1:
+                    report_text += 'MIN_CONTIG_LENGTH: '+str(min_contig_length)+"bp\n"
+                if output_assemblySet_refs[thresh_i] != None:
+                    report_text += 'AssemblySet saved to: ' + params['workspace_name'] + '/' + output_assemblySet_names[thresh_i] + "\n\n"
+                for ass_i in range(len(assembly_refs)):
+                    report_text += 'ORIGINAL Contig count: '+str(original_contig_count[ass_i])+"\t"+'in Assembly '+assembly_names[ass_i]+"\n"
+                    report_text += 'FILTERED Contig count: '+str(filtered_contig_count[ass_i][thresh_i])+"\t"+'in Assembly '+filtered_contig_names[thresh_i][ass_i]+"\n\n"
+                    if filtered_contig_count[ass_i][thresh_i] == 0:
+                        report_text += "  (no output object created for "+filtered_contig_names[thresh_i][ass_i]+")"+"\n"
 
             # created objects
             objects_created = None
             if non_zero_output_seen:
                 objects_created = []
-                if len(assembly_refs) > 1:
-                    objects_created.append({'ref': output_assemblySet_ref, 'description': params['output_name']+" filtered min_contig_length >= "+str(params['min_contig_length'])+"bp"})
-                for ass_i,filtered_contig_ref in enumerate(filtered_contig_refs):
-                    if filtered_contig_count[ass_i] == 0:
-                        continue
-                    objects_created.append({'ref': filtered_contig_refs[ass_i], 'description': filtered_contig_names[ass_i]+" filtered min_contig_length >= "+str(params['min_contig_length'])+"bp"})
+                for thresh_i,min_contig_length in enumerate(min_contig_lengths):
+                    if output_assemblySet_refs[thresh_i] != None:
+                        objects_created.append({'ref': output_assemblySet_refs[thresh_i], 'description': params['output_name']+" filtered min_contig_length >= "+str(min_contig_length)+"bp"})
+                    for ass_i,filtered_contig_ref in enumerate(filtered_contig_refs[thresh_i]):
+                        if filtered_contig_count[ass_i][thresh_i] == 0:
+                            continue
+                        objects_created.append({'ref': filtered_contig_ref, 'description': filtered_contig_names[thresh_i][ass_i]+" filtered min_contig_length >= "+str(min_contig_length)+"bp"})
 
         # Save report
         print('Saving report')
@@ -413,6 +576,8 @@ class kb_assembly_compare:
 
         # STEP 6: contruct the output to send back
         returnVal = {'report_name': report_info['name'], 'report_ref': report_info['ref']}
+        if len(invalid_msgs) == 0 and preview:
+            returnVal['preview'] = preview_rows
 
         #END run_filter_contigs_by_length
 
@@ -435,7 +600,12 @@ class kb_assembly_compare:
            "id" is a numerical identifier of the workspace or object, and
            should just be used for workspace ** "name" is a string identifier
            of a workspace or object.  This is received from Narrative.),
-           parameter "input_assembly_refs" of type "data_obj_ref"
+           parameter "input_assembly_refs" of type "data_obj_ref", parameter
+           "percentiles" of list of Double, parameter "full_nx_curve" of
+           type "bool", parameter "len_buckets" of list of Long, parameter
+           "approximate" of type "bool", parameter "approximate_error_perc"
+           of Double, parameter "interactive_report" of type "bool",
+           parameter "composition_stats" of type "bool"
         :returns: instance of type "Contig_Distribution_Compare_Output" ->
            structure: parameter "report_name" of type "data_obj_name",
            parameter "report_ref" of type "data_obj_ref"
@@ -464,12 +634,14 @@ class kb_assembly_compare:
         # API Clients
         #SERVICE_VER = 'dev'  # DEBUG
         SERVICE_VER = 'release'
-        # wsClient
+        # wsClient (the large generated clients are imported on first use, not at service start)
+        from installed_clients.WorkspaceClient import Workspace as workspaceService
         try:
             wsClient = workspaceService(self.workspaceURL, token=token)
         except Exception as e:
             raise ValueError('Unable to instantiate wsClient with workspaceURL: '+ self.workspaceURL +' ERROR: ' + str(e))
         # setAPI_Client
+        from installed_clients.SetAPIServiceClient import SetAPI
         try:
             #setAPI_Client = SetAPI (url=self.callbackURL, token=ctx['token'])  # for SDK local.  local doesn't work for SetAPI
             setAPI_Client = SetAPI (url=self.serviceWizardURL, token=ctx['token'])  # for dynamic service
@@ -494,6 +666,30 @@ class kb_assembly_compare:
             if arg not in params or params[arg] == None or params[arg] == '':
                 raise ValueError ("Must define required param: '"+arg+"'")
 
+        # Nx/Lx percentiles and length buckets for the table, and whether to also export the full N1..N100 curve
+        percs = parse_percs(params.get('percentiles'))
+        len_buckets = parse_len_buckets(params.get('len_buckets'))
+        full_nx_curve = False
+        if 'full_nx_curve' in params and params['full_nx_curve'] != None and params['full_nx_curve'] != '' and int(params['full_nx_curve']) == 1:
+            full_nx_curve = True
+
+        # approximate mode keeps a fixed-size length sketch per assembly instead of every contig's values
+        approximate = False
+        if 'approximate' in params and params['approximate'] != None and params['approximate'] != '' and int(params['approximate']) == 1:
+            approximate = True
+        approx_rel_err = parse_approx_error_perc(params.get('approximate_error_perc'))
+
+        # per-contig base composition (GC, non-ACGT and softmasked bases) reads every sequence byte,
+        #   so it is only scored when asked for; otherwise lengths come from .fai sidecars or a length-only scan
+        composition_stats = False
+        if 'composition_stats' in params and params['composition_stats'] != None and params['composition_stats'] != '' and int(params['composition_stats']) == 1:
+            composition_stats = True
+
+        # interactive report draws the plots in the browser from a JSON payload, with no PNG/PDF rendering
+        interactive_report = False
+        if 'interactive_report' in params and params['interactive_report'] != None and params['interactive_report'] != '' and int(params['interactive_report']) == 1:
+            interactive_report = True
+
         # load provenance
         provenance = [{}]
         if 'provenance' in ctx:
@@ -524,6 +720,7 @@ class kb_assembly_compare:
             accepted_input_types = [set_obj_type] + assembly_obj_types
             assembly_refs = []
             assembly_names = []
+            assembly_infos = []  # resolved UPA and checksum key the stats cache
             assembly_refs_seen = dict()
 
             for i,input_ref in enumerate(params['input_assembly_refs']):
@@ -550,6 +747,7 @@ class kb_assembly_compare:
                         assembly_refs_seen[input_ref] = True
                         assembly_refs.append(input_ref)
                         assembly_names.append(input_obj_name)
+                        assembly_infos.append(input_obj_info)
                 elif input_obj_type != set_obj_type:
                     raise ValueError ("bad obj type for input_ref: "+input_ref)
                 else:  # add assembly set members
@@ -573,6 +771,7 @@ class kb_assembly_compare:
                                 this_input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
                                 this_input_obj_name = this_input_obj_info[NAME_I]
                                 assembly_names.append(this_input_obj_name)
+                                assembly_infos.append(this_input_obj_info)
                             except Exception as e:
                                 raise ValueError('Unable to get object from workspace: (' + this_assembly_ref +')' + str(e))
 
@@ -587,11 +786,38 @@ class kb_assembly_compare:
             #    os.makedirs(assembly_outdir)
             score_assembly_file_paths = []
 
+            # assemblies already scored at this version and checksum are served from the stats cache
+            #   (if composition is asked for, entries without composition columns, e.g. from filter previews, are scored again)
+            stats_cache = StatsCache(self.stats_cache_dir, self.stats_cache_max_bytes)
+            stats_cache_keys = []
+            compositions = []  # LengthSketches in approximate mode, else sorted lens or LengthAccumulators without composition
+            score_ass_indices = []  # assemblies that missed the cache, in the order of score_assembly_file_paths
+
             for ass_i,input_ref in enumerate(assembly_refs):
                 self.log (console, "\tAssembly: "+assembly_names[ass_i]+" ("+assembly_refs[ass_i]+")")  # DEBUG
+                stats_cache_keys.append(self.stats_cache_key(assembly_infos[ass_i]))
+                compositions.append(None)
+                cached_lens = stats_cache.get(stats_cache_keys[ass_i])
+                if cached_lens is not None:
+                    cached_attrs = []
+                    if composition_stats:
+                        cached_attrs = [stats_cache.get_attr(stats_cache_keys[ass_i], column) for column in ContigComposition.columns[1:]]
+                    if all([attr is not None for attr in cached_attrs]):
+                        if approximate:
+                            compositions[ass_i] = sketch_from_columns([cached_lens] + cached_attrs, approx_rel_err, len_buckets)
+                        elif composition_stats:
+                            compositions[ass_i] = ContigComposition(cached_lens, *cached_attrs)
+                        else:
+                            compositions[ass_i] = cached_lens
+                        self.log (console, "\t\tcontig "+("lengths and composition" if composition_stats else "lengths")+" found in stats cache.  Skipping download")  # DEBUG
+                        continue
+                score_ass_indices.append(ass_i)
                 contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
                 sys.stdout.flush()
-                contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                if can_stream_fasta(contig_file):
+                    contig_file_path = contig_file  # plain, gzip and BGZF are read directly
+                else:
+                    contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
                 score_assembly_file_paths.append(contig_file_path)
                 #clean_ass_ref = assembly_ref.replace('/','_')
                 #assembly_outfile_path = os.join(assembly_outdir, clean_assembly_ref+".fna")
@@ -602,124 +828,79 @@ class kb_assembly_compare:
         ##
         if len(invalid_msgs) == 0:
 
-            # score fasta lens in contig files
-            read_buf_size  = 65536
-            #write_buf_size = 65536
-
-            lens = []
-            for ass_i,assembly_file_path in enumerate(score_assembly_file_paths):
-                ass_name = assembly_names[ass_i]
-                self.log (console, "Reading contig lengths in assembly: "+ass_name)  # DEBUG
-
-                lens.append([])
-                with open (assembly_file_path, 'r', read_buf_size) as ass_handle:
-                    seq_buf = ''
-                    for fasta_line in ass_handle:
-                        if fasta_line.startswith('>'):
-                            if seq_buf != '':
-                                seq_len = len(seq_buf)
-                                lens[ass_i].append(seq_len)
-                                seq_buf = ''
-                        else:
-                            seq_buf += ''.join(fasta_line.split())
-                    if seq_buf != '':
-                        seq_len = len(seq_buf)
-                        lens[ass_i].append(seq_len)
-                        seq_buf = ''
-
-            # sort lens (absolutely critical to subsequent steps)
+            # score contig lengths and, if asked for, base composition (GC, non-ACGT and softmasked counts) in one
+            #   read of every sequence byte, in record-aligned ranges of plain files or by streaming compressed files.
+            #   Lengths alone are read from fresh .fai sidecars where present, and merged as distinct-length counts
+            #   (or, in approximate mode, as length sketches)
+            for ass_i in score_ass_indices:
+                self.log (console, "Reading contig "+("lengths and composition" if composition_stats else "lengths")+" in assembly: "+assembly_names[ass_i])  # DEBUG
+            if approximate:
+                # bounded memory: exact totals and buckets, N/L and histograms within approx_rel_err
+                if composition_stats:
+                    scored_compositions = contig_sketch_parallel(score_assembly_file_paths, self.num_workers, approx_rel_err, len_buckets)
+                else:
+                    scored_compositions = contig_length_sketch_parallel(score_assembly_file_paths, self.num_workers,
+                                                                        approx_rel_err, len_buckets)
+            elif not composition_stats:
+                scored_compositions = contig_length_stats_parallel(score_assembly_file_paths, self.num_workers)
+            else:
+                scored_compositions = contig_composition_parallel(score_assembly_file_paths, self.num_workers)
+            for score_i,ass_i in enumerate(score_ass_indices):
+                compositions[ass_i] = scored_compositions[score_i]
+                scored_compositions[score_i] = None
+            self.log (console, "PEAK MEMORY after reading assemblies: "+format_peak_memory())
+
+            # sort lens (absolutely critical to subsequent steps), with composition in the same order, and get
+            #   cumulative lens, N50 and L50 (and 75s, and 90s) and bucket summaries, all vectorized.  Stats cache
+            #   columns are already sorted and are used in place, and lengths scored without composition are
+            #   summarized from their distinct lengths and counts
+            assembly_stats = []
             for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Sorting contig lens for "+ass_name)  # DEBUG
-                lens[ass_i].sort(key=int, reverse=True)  # sorting is critical.  this sort() is in place
+                self.log (console, "Computing contig length stats for "+ass_name)  # DEBUG
+                if approximate:
+                    assembly_stats.append(ApproxAssemblyStats(ass_name, compositions[ass_i], percs))
+                    continue  # sketches have no per-contig columns to cache
+                if composition_stats:
+                    assembly_stats.append(AssemblyStats(ass_name, None, percs, len_buckets, compositions[ass_i],
+                                                        presorted=(ass_i not in score_ass_indices)))
+                elif ass_i in score_ass_indices:
+                    assembly_stats.append(AssemblyStats.from_accumulator(ass_name, compositions[ass_i], percs, len_buckets))
+                else:
+                    assembly_stats.append(AssemblyStats(ass_name, compositions[ass_i], percs, len_buckets, presorted=True))
+                compositions[ass_i] = None  # sorted columns are kept in assembly_stats
+                if ass_i in score_ass_indices:
+                    cache_attrs = None
+                    if composition_stats:
+                        this_dtype = length_dtype(assembly_stats[ass_i].max_len)
+                        cache_attrs = dict([(column, vals.astype(this_dtype)) for column,vals in assembly_stats[ass_i].composition.attrs().items()])
+                    if not stats_cache.put(stats_cache_keys[ass_i], assembly_stats[ass_i].lens, cache_attrs,
+                                           assembly_stats[ass_i].counts):
+                        self.log (console, "Unable to add "+ass_name+" to stats cache")  # DEBUG
+
+            # per-assembly composition summaries
+            composition_summaries = None
+            if composition_stats:
+                composition_summaries = [stats.composition.summary() for stats in assembly_stats]
+            def format_perc (perc):
+                if perc is None:
+                    return '-'
+                return '%.2f' % perc
 
             # get min_max ranges
-            huge_val = 100000000000000000
-            len_buckets = [ 1000000, 100000, 10000, 1000, 500, 1 ]
-            percs = [50, 75, 90]
-            max_len = 0
-            max_lens = []
-            best_val = { 'len': 0,
-                         'N': {},
-                         'L': {},
-                         'summary_stats': {},
-                         'cumulative_len_stats': {}
-                         }
-            worst_val = { 'len': huge_val,
-                          'N': {},
-                          'L': {},
-                          'summary_stats': {},
-                          'cumulative_len_stats': {}
-                          }
-            for perc in percs:
-                best_val['N'][perc] = 0
-                best_val['L'][perc] = huge_val
-                worst_val['N'][perc] = huge_val
-                worst_val['L'][perc] = 0
-            for bucket in len_buckets:
-                best_val['summary_stats'][bucket] = 0
-                best_val['cumulative_len_stats'][bucket] = 0
-                worst_val['summary_stats'][bucket] = huge_val
-                worst_val['cumulative_len_stats'][bucket] = huge_val
-
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Getting max lens "+ass_name)  # DEBUG
-                this_max_len = lens[ass_i][0]
-                max_lens.append(this_max_len)
-                if this_max_len > max_len:
-                    max_len = this_max_len
-
-            # Sum cumulative plot data
-            max_total = 0
-            total_lens = []
-            cumulative_lens = []
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Summing cumulative lens for "+ass_name)  # DEBUG
-                total_lens.append(0)
-                cumulative_lens.append([])
-                for val in lens[ass_i]:
-                    cumulative_lens[ass_i].append(total_lens[ass_i]+val)
-                    total_lens[ass_i] += val
-            for ass_i,ass_name in enumerate(assembly_names):
-                if total_lens[ass_i] > max_total:
-                    max_total = total_lens[ass_i]
-
-            """
-            # DEBUG
-            self.log (console, "SORTED VALS\n================================")
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, ass_name)
-                self.log (console, "\t\t"+"TOTAL_LEN: "+str(total_lens[ass_i]))
-                for val_i,val in enumerate(lens[ass_i]):
-                    self.log (console, "\t\t\t"+"VAL: "+str(val))
-                for len_i,length in enumerate(cumulative_lens[ass_i]):
-                    self.log (console, "\t\t\t"+"LEN: "+str(length))
-            # END DEBUG
-            """
-
-            # get N50 and L50 (and 75s, and 90s)
-            N = dict()
-            L = dict()
-            for perc in percs:
-                N[perc] = []
-                L[perc] = []
-            for perc in percs:
-                frac = perc/100.0
-                for ass_i,ass_name in enumerate(assembly_names):
-                    self.log (console, "Getting N/L"+str(perc)+" for "+ass_name)  # DEBUG
-                    for val_i,val in enumerate(lens[ass_i]):
-                        if cumulative_lens[ass_i][val_i] >= frac * total_lens[ass_i]:
-                            N[perc].append(val)
-                            L[perc].append(val_i+1)
-                            break
+            max_lens = [stats.max_len for stats in assembly_stats]
+            max_len = max(max_lens + [0])
+            total_lens = [stats.total_len for stats in assembly_stats]
+            max_total = max(total_lens + [0])
 
             """
             # DEBUG
             self.log (console, "N50, etc.\n================================")
             for ass_i,ass_name in enumerate(assembly_names):
                 self.log (console, ass_name)
+                self.log (console, "\t\t"+"TOTAL_LEN: "+str(total_lens[ass_i]))
                 for perc in percs:
-                    self.log (console, "\t"+"N"+str(perc)+": "+str(N[perc][ass_i]))
-                    self.log (console, "\t"+"L"+str(perc)+": "+str(L[perc][ass_i]))
+                    self.log (console, "\t"+"N"+str(perc)+": "+str(assembly_stats[ass_i].N[perc]))
+                    self.log (console, "\t"+"L"+str(perc)+": "+str(assembly_stats[ass_i].L[perc]))
             # END DEBUG
             """
 
@@ -729,210 +910,96 @@ class kb_assembly_compare:
             #hist_window_width = 10000  # make it log scale?
             #N_hist_windows = int(max_len % hist_window_width)
             #len_buckets = [ 1000000, 500000, 100000, 50000, 10000, 5000, 1000, 500, 0 ]
-            summary_stats = []
-            cumulative_len_stats = []
-            hist_vals = []
-            hist_cnt_by_bin = []  # just to get shared heights for separate hist graphs
-            top_hist_cnt = [0, 0, 0]
+            # hists hold only per-bin counts, not the lengths themselves
+            hist_cnt_by_bin = [[] for ass_name in assembly_names]
+            top_hist_cnt = [0, 0, 0]  # shared heights for separate hist graphs
             #hist_binwidth = [500, 5000, 20000]
             long_contig_nbins = 70
-            hist_binwidth = [500, 5000, (max_len // long_contig_nbins)]
+            hist_binwidth = [500, 5000, max(1, max_len // long_contig_nbins)]
             min_hist_val_accept = [0, 10000, 100000]
             max_hist_val_accept = [10000, 100000, 100000000000000000000]
-            #log_lens = []
-            #max_log_len = 0
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Building summary and histograms from assembly: "+ass_name)  # DEBUG
-                #lens[ass_i].sort(key=int, reverse=True)  # sorting is critical.  Already sorted
-
-                # hist
-                """
-                # get log lens
-                log_lens.append([])
-                for val in lens[ass_i]:
-                    log10_val = math.log10(val)
-                    if log10_val > max_log_len:
-                        max_log10_len = log10_val
-                    log_lens[ass_i].append(log10_val)
-                """
-                hist_vals.append([])
-                hist_cnt_by_bin.append([])
-                for hist_i,top_cnt in enumerate(top_hist_cnt):
-                    hist_vals[ass_i].append([])
-                    hist_cnt_by_bin[ass_i].append([])
-                    long_len = max_len
-                    if hist_i < len(top_hist_cnt)-1:
-                        long_len = max_hist_val_accept[hist_i]
-                    for bin_i in range((long_len // hist_binwidth[hist_i])+1):
-                        hist_cnt_by_bin[ass_i][hist_i].append(0)
-
-                for val in lens[ass_i]:
-                    this_hist_i = 0
-                    for hist_i,top_cnt in enumerate(top_hist_cnt):
-                        if val >= min_hist_val_accept[hist_i] and val < max_hist_val_accept[hist_i]:
-                            this_hist_i = hist_i
-                            break
-                    bin_i = val // hist_binwidth[this_hist_i]
-                    hist_cnt_by_bin[ass_i][this_hist_i][bin_i] += 1
-                    hist_vals[ass_i][this_hist_i].append(val)
-                    if hist_cnt_by_bin[ass_i][this_hist_i][bin_i] > top_hist_cnt[this_hist_i]:
-                        top_hist_cnt[this_hist_i] = hist_cnt_by_bin[ass_i][this_hist_i][bin_i]
-
-                # summary stats
-                summary_stats.append(dict())
-                cumulative_len_stats.append(dict())
-                for bucket in len_buckets:
-                    summary_stats[ass_i][bucket] = 0
-                    cumulative_len_stats[ass_i][bucket] = 0
-                curr_bucket_i = 0
-                for val in lens[ass_i]:
-                    for bucket_i in range(curr_bucket_i,len(len_buckets)):
-                        bucket = len_buckets[bucket_i]
-                        if val >= bucket:
-                            summary_stats[ass_i][bucket] += 1
-                            cumulative_len_stats[ass_i][bucket] += val
-                            #curr_bucket_i = bucket_i
-                            #break
-                        else:
-                            curr_bucket_i = bucket_i + 1
-
-            # adjust best and worst values
-            for ass_i,ass_name in enumerate(assembly_names):
-                if max_lens[ass_i] > best_val['len']:
-                    best_val['len'] = max_lens[ass_i]
-                if max_lens[ass_i] < worst_val['len']:
-                    worst_val['len'] = max_lens[ass_i]
 
-                for perc in percs:
-                    if N[perc][ass_i] > best_val['N'][perc]:
-                        best_val['N'][perc] = N[perc][ass_i]
-                    if N[perc][ass_i] < worst_val['N'][perc]:
-                        worst_val['N'][perc] = N[perc][ass_i]
-                    if L[perc][ass_i] < best_val['L'][perc]:
-                        best_val['L'][perc] = L[perc][ass_i]
-                    if L[perc][ass_i] > worst_val['L'][perc]:
-                        worst_val['L'][perc] = L[perc][ass_i]
+            # one binning plan per window from the global length range (log-spaced if the long
+            #   contig window spans 100 fold), then all assemblies binned together into a counts matrix
+            hist_plans = []
+            for hist_i,top_cnt in enumerate(top_hist_cnt):
+                long_len = max_len + 1
+                if hist_i < len(top_hist_cnt)-1:
+                    long_len = max_hist_val_accept[hist_i]
+                hist_plans.append(plan_histogram_bins(min_hist_val_accept[hist_i], long_len, hist_binwidth[hist_i], long_contig_nbins))
+                self.log (console, "Building histograms of contig lengths "+str(min_hist_val_accept[hist_i])+"-"+str(long_len)+" for all assemblies")  # DEBUG
+                hist_cnt_matrix = hist_plans[hist_i].count([stats.window_values(min_hist_val_accept[hist_i], max_hist_val_accept[hist_i])
+                                                            for stats in assembly_stats])
+                for ass_i,ass_name in enumerate(assembly_names):
+                    hist_cnt_by_bin[ass_i].append(hist_cnt_matrix[ass_i])
+                if hist_cnt_matrix.size > 0:
+                    top_hist_cnt[hist_i] = int(hist_cnt_matrix.max())
 
-                for bucket in len_buckets:
-                    if summary_stats[ass_i][bucket] > best_val['summary_stats'][bucket]:
-                        best_val['summary_stats'][bucket] = summary_stats[ass_i][bucket]
-                    if summary_stats[ass_i][bucket] < worst_val['summary_stats'][bucket]:
-                        worst_val['summary_stats'][bucket] = summary_stats[ass_i][bucket]
-                    if cumulative_len_stats[ass_i][bucket] > best_val['cumulative_len_stats'][bucket]:
-                        best_val['cumulative_len_stats'][bucket] = cumulative_len_stats[ass_i][bucket]
-                    if cumulative_len_stats[ass_i][bucket] < worst_val['cumulative_len_stats'][bucket]:
-                        worst_val['cumulative_len_stats'][bucket] = cumulative_len_stats[ass_i][bucket]
+            # best and worst values for colouring report cells
+            (best_val, worst_val) = best_worst_vals(assembly_stats)
 
 
         #### STEP 4: build text report
         ##
+        approx_mark = ''
+        approx_note = ''
+        if approximate:
+            approx_mark = '~'
+            approx_note = ("APPROXIMATE STATISTICS: Nx within "+('%g' % (100.0*approx_rel_err))+"% (~), Lx estimated, "
+                           +"and histograms and length plots binned to the same error.  "
+                           +"Contig counts, total and longest lengths"+(", length thresholds and composition" if composition_stats else " and length thresholds")+" are exact.")
         if len(invalid_msgs) == 0:
+            if approximate:
+                report_text += approx_note+"\n\n"
             for ass_i,ass_name in enumerate(assembly_names):
                 report_text += "ASSEMBLY STATS for "+ass_name+"\n"
 
                 report_text += "\t"+"Len longest contig: "+str(max_lens[ass_i])+" bp"+"\n"
                 for perc in percs:
-                    report_text += "\t"+"N"+str(perc)+" (L"+str(perc)+"):\t"+str(N[perc][ass_i])+" ("+str(L[perc][ass_i])+")"+"\n"
+                    report_text += "\t"+"N"+str(perc)+" (L"+str(perc)+"):\t"+approx_mark+str(assembly_stats[ass_i].N[perc])+" ("+approx_mark+str(assembly_stats[ass_i].L[perc])+")"+"\n"
                 for bucket in len_buckets:
-                    report_text += "\t"+"Num contigs >= "+str(bucket)+" bp:\t"+str(summary_stats[ass_i][bucket])+"\n"
+                    report_text += "\t"+"Num contigs >= "+str(bucket)+" bp:\t"+str(assembly_stats[ass_i].bucket_counts[bucket])+"\n"
                 report_text += "\n"
 
                 for bucket in len_buckets:
-                    report_text += "\t"+"Len contigs >= "+str(bucket)+" bp:\t"+str(cumulative_len_stats[ass_i][bucket])+" bp"+"\n"
+                    report_text += "\t"+"Len contigs >= "+str(bucket)+" bp:\t"+str(assembly_stats[ass_i].bucket_lens[bucket])+" bp"+"\n"
                 report_text += "\n"
 
+                if composition_stats:
+                    (gc_perc, ambig_count, softmask_perc, ambig_contig_count) = composition_summaries[ass_i]
+                    report_text += "\t"+"GC (% of ACGT bases):\t"+format_perc(gc_perc)+"\n"
+                    report_text += "\t"+"Non-ACGT bases:\t"+str(ambig_count)+" bp in "+str(ambig_contig_count)+" contigs"+"\n"
+                    report_text += "\t"+"Softmasked (lowercase) bases:\t"+format_perc(softmask_perc)+"%"+"\n"
+                    report_text += "\n"
+
         self.log(console, report_text)  # DEBUG
 
 
         #### STEP 5: Make figures with matplotlib
         ##
+        # every figure is an independent chart task (chart kind plus a spec of its data, labels and output
+        #   paths), drawn to PNG/PDF in a process pool, or passed to the browser as JSON in an interactive
+        #   report; uploads follow in report order
         file_links = []
+        report_files = []  # (file path, file name, link label, is figure) to upload, in report order
+        chart_tasks = []
         shared_img_in_height = 4.0
         total_ass = len(assembly_names)
+        img_dpi = 200
 
         # Key
         plot_name = "key_plot"
         plot_name_desc = "KEY"
         self.log (console, "GENERATING PLOT "+plot_name_desc)
-        img_dpi = 200
-        img_units = "in"
-        #spacing = 1.0 / float(total_ass+3)
-        spacing = 1.0
-        img_in_width  = 6.0
-        img_in_height = 0.5 * (total_ass)
-        x_text_margin = 0.01
-        y_text_margin = 0.01
-        title_fontsize = 12
-        #text_color = "#606060"
-        text_color = "#303030"
-        text_fontsize = 10
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            #ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            #ax.spines['bottom'].set_visible(False)  # bottom axis line
-            #ax.spines['left'].set_visible(False)    # left axis line
-            #ax.spines['right'].set_visible(False)   # right axis line
-        #ax.grid(True)
-        #ax.set_title (plot_name_desc)
-        #ax.set_xlabel ('sorted contig order (longest to shortest)')
-        #ax.set_ylabel ('sum of contig lengths (Mbp)')
-        #plt.tight_layout()
-
-        # build x and y coord lists
-        x0 = 1
-        x1 = 2
-        x_indent = 0.1
-        x_coords = [x0, x1]
-        ax.set_xlim(x0-x_indent, x1+x_indent)
-        #ax.set_ylim(-1*spacing, (total_ass+1)*spacing)
-        ax.set_ylim(0, (total_ass+1)*spacing)
-        for ass_i,ass_name in enumerate(assembly_names):
-            y_pos = (total_ass - ass_i) * spacing
-            y_coords = [y_pos, y_pos]
-            plt.plot(x_coords, y_coords, lw=2)
-            ax.text (x0+x_text_margin, y_pos+y_text_margin, ass_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=text_fontsize, zorder=1)
-        #ax.text (0.5*(x0+x1), -1*spacing+y_text_margin, plot_name_desc, verticalalignment="bottom", horizontalalignment="center", color=text_color, fontsize=title_fontsize, zorder=2)
-        ax.text (0.5*(x0+x1), 0+y_text_margin, plot_name_desc, verticalalignment="bottom", horizontalalignment="center", color=text_color, fontsize=title_fontsize, zorder=2)
-
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        key_png_file = png_file = plot_name+".png"
-        key_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
-
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
+        key_png_file = plot_name+".png"
+        key_pdf_file = plot_name+".pdf"
+        chart_tasks.append(('key', {'names': assembly_names,
+                                     'title': plot_name_desc,
+                                     'dpi': img_dpi,
+                                     'png_path': os.path.join (html_output_dir, key_png_file),
+                                     'pdf_path': os.path.join (html_output_dir, key_pdf_file)}))
+        report_files.append((os.path.join (html_output_dir, key_png_file), key_png_file, plot_name_desc+' PNG', True))
+        report_files.append((os.path.join (html_output_dir, key_pdf_file), key_pdf_file, plot_name_desc+' PDF', True))
 
 
         # Cumulative len plot
@@ -940,91 +1007,27 @@ class kb_assembly_compare:
         plot_name_desc = "Cumulative Length (in Mbp)"
         self.log (console, "GENERATING PLOT "+plot_name_desc)
         val_scale_shift = 1000000.0  # to make Mbp
-        img_dpi = 200
-        img_units = "in"
-        img_in_width  = 6.0
-        img_in_height = shared_img_in_height
-        x_margin = 0.01
-        y_margin = 0.01
-        title_fontsize = 12
-        text_color = "#606060"
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        """
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            ax.spines['bottom'].set_visible(False)  # bottom axis line
-            ax.spines['left'].set_visible(False)    # left axis line
-            ax.spines['right'].set_visible(False)   # right axis line
-        """
-        ax.grid(True)
-        ax.set_title (plot_name_desc)
-        ax.set_xlabel ('sorted contig order (longest to shortest)')
-        ax.set_ylabel ('sum of contig lengths (Mbp)')
-        plt.tight_layout()
-        #ax.text (x_margin, 1.0-(y_margin), plot_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=title_fontsize, zorder=1)
-
-        # build x and y coord lists
-        for ass_i,ass_name in enumerate(assembly_names):
-            x_coords = []
-            y_coords = []
-            for val_i,val in enumerate(cumulative_lens[ass_i]):
-                x_coords.append(val_i+1)
-                #y_coords.append(val)
-                y_coords.append(float(val) / val_scale_shift)
-            plt.plot(x_coords, y_coords, lw=2)
-
-        """
-        # capture data into pandas
-        cumulative_lens_by_ass_name = dict()
+        cumulative_lines = []
         for ass_i,ass_name in enumerate(assembly_names):
-            cumulative_lens_by_ass_name[ass_name] = pd.Series(cumulative_lens[ass_i])
-        cumulative_lens_df = pd.DataFrame(cumulative_lens_by_ass_name)
-        cumulative_lens_plot = cumulative_lens_df \
-                                .plot(kind="line", figsize=(15,5), ylim=(0,max_total), fontsize=15, lw=5)
-        cumulative_lens_plot.xaxis.grid(True)
-        cumulative_lens_plot.yaxis.grid(True) 
-        fig = cumulative_lens_plot.get_figure()
-        """
-
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        cumulative_lens_png_file = png_file = plot_name+".png"
-        cumulative_lens_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
-
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
+            (step_lens, step_counts, step_cumulative_lens) = assembly_stats[ass_i].length_steps()
+            x_coords = step_counts
+            y_coords = step_cumulative_lens / val_scale_shift
+            # at most plot_max_vertices vertices, keeping the endpoints and the Nx breakpoints exact
+            nx_steps = nx_step_indices(step_cumulative_lens, sorted(set(DEFAULT_PERCS + assembly_stats[ass_i].percs)))
+            cumulative_lines.append(downsample_curve(x_coords, y_coords, self.plot_max_vertices, nx_steps))
+        cumulative_lens_png_file = plot_name+".png"
+        cumulative_lens_pdf_file = plot_name+".pdf"
+        chart_tasks.append(('lines', {'lines': cumulative_lines,
+                                       'title': plot_name_desc,
+                                       'xlabel': 'sorted contig order (longest to shortest)',
+                                       'ylabel': 'sum of contig lengths (Mbp)',
+                                       'width': 6.0,
+                                       'height': shared_img_in_height,
+                                       'dpi': img_dpi,
+                                       'png_path': os.path.join (html_output_dir, cumulative_lens_png_file),
+                                       'pdf_path': os.path.join (html_output_dir, cumulative_lens_pdf_file)}))
+        report_files.append((os.path.join (html_output_dir, cumulative_lens_png_file), cumulative_lens_png_file, plot_name_desc+' PNG', True))
+        report_files.append((os.path.join (html_output_dir, cumulative_lens_pdf_file), cumulative_lens_pdf_file, plot_name_desc+' PDF', True))
 
 
         # Sorted Contig len plot
@@ -1032,85 +1035,87 @@ class kb_assembly_compare:
         plot_name_desc = "Sorted Contig Lengths (in Mbp)"
         self.log (console, "GENERATING PLOT "+plot_name_desc)
         val_scale_shift = 1000000.0  # to make Mbp
-        img_dpi = 200
-        img_units = "in"
-        img_in_width  = 6.0
-        img_in_height = shared_img_in_height
-        x_margin = 0.01
-        y_margin = 0.01
-        title_fontsize = 12
-        text_color = "#606060"
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        """
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            ax.spines['bottom'].set_visible(False)  # bottom axis line
-            ax.spines['left'].set_visible(False)    # left axis line
-            ax.spines['right'].set_visible(False)   # right axis line
-        """
-        ax.grid(True)
-        ax.set_title (plot_name_desc)
-        ax.set_xlabel ('sum of sorted contig lengths (Mbp)')
-        ax.set_ylabel ('sorted contig lengths (Mbp)')
-        plt.tight_layout()
-        #ax.text (x_margin, 1.0-(y_margin), plot_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=title_fontsize, zorder=1)
-
-        # build x and y coord lists
         mini_delta = .000001
+        sorted_lens_lines = []
         for ass_i,ass_name in enumerate(assembly_names):
-            x_coords = []
-            y_coords = []
-            running_sum = 0
-            for val_i,val in enumerate(lens[ass_i]):
-                x_coords.append(float(running_sum + mini_delta) / val_scale_shift)
-                y_coords.append(float(val) / val_scale_shift)
-                running_sum += val
-                x_coords.append(float(running_sum) / val_scale_shift)
-                y_coords.append(float(val) / val_scale_shift)
-            plt.plot(x_coords, y_coords, lw=2)
-
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        sorted_lens_png_file = png_file = plot_name+".png"
-        sorted_pens_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
-
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-
-
-        # Hist plots for each assembly
+            # each contig (or sketch bin) is a flat step from the running sum before it to the running sum after it
+            (step_lens, step_counts, this_cumulative_lens) = assembly_stats[ass_i].length_steps()
+            prev_cumulative_lens = np.concatenate(([0], this_cumulative_lens[:-1]))
+            x_coords = np.column_stack((prev_cumulative_lens + mini_delta, this_cumulative_lens)).ravel() / val_scale_shift
+            y_coords = np.repeat(step_lens, 2) / val_scale_shift
+            # keep both vertices of the endpoint and Nx breakpoint steps
+            nx_steps = nx_step_indices(this_cumulative_lens, sorted(set(DEFAULT_PERCS + assembly_stats[ass_i].percs)))
+            nx_vertices = np.concatenate((2 * nx_steps, 2 * nx_steps + 1))
+            sorted_lens_lines.append(downsample_curve(x_coords, y_coords, self.plot_max_vertices, nx_vertices))
+        sorted_lens_png_file = plot_name+".png"
+        sorted_lens_pdf_file = plot_name+".pdf"
+        chart_tasks.append(('lines', {'lines': sorted_lens_lines,
+                                       'title': plot_name_desc,
+                                       'xlabel': 'sum of sorted contig lengths (Mbp)',
+                                       'ylabel': 'sorted contig lengths (Mbp)',
+                                       'width': 6.0,
+                                       'height': shared_img_in_height,
+                                       'dpi': img_dpi,
+                                       'png_path': os.path.join (html_output_dir, sorted_lens_png_file),
+                                       'pdf_path': os.path.join (html_output_dir, sorted_lens_pdf_file)}))
+        report_files.append((os.path.join (html_output_dir, sorted_lens_png_file), sorted_lens_png_file, plot_name_desc+' PNG', True))
+        report_files.append((os.path.join (html_output_dir, sorted_lens_pdf_file), sorted_lens_pdf_file, plot_name_desc+' PDF', True))
+
+
+        # Nx curve plot and table (N1..N100 from one searchsorted per assembly)
+        nx_curve_png_file = None
+        if full_nx_curve:
+            plot_name = "nx_curve_plot"
+            plot_name_desc = "Nx Curve (in Kbp)"
+            self.log (console, "GENERATING PLOT "+plot_name_desc)
+
+            # export table
+            nx_curve_table_file = "nx_curve.tsv"
+            nx_curve_table_path = os.path.join (html_output_dir, nx_curve_table_file)
+            (nx_curve_N, nx_curve_L) = write_nx_curve_table (nx_curve_table_path, assembly_stats, NX_CURVE_PERCS)
+            report_files.append((nx_curve_table_path, nx_curve_table_file, 'Nx and Lx Curve TSV', False))
+
+            val_scale_shift = 1000.0  # to make Kbp
+            nx_curve_png_file = plot_name+".png"
+            nx_curve_pdf_file = plot_name+".pdf"
+            chart_tasks.append(('lines', {'lines': [(NX_CURVE_PERCS, nx_curve_N[ass_i] / val_scale_shift) for ass_i in range(total_ass)],
+                                           'drawstyle': 'steps-pre',
+                                           'title': plot_name_desc,
+                                           'xlabel': 'x (%)',
+                                           'ylabel': 'Nx (Kbp)',
+                                           'xlim': (0, 100),
+                                           'width': 6.0,
+                                           'height': shared_img_in_height,
+                                           'dpi': img_dpi,
+                                           'png_path': os.path.join (html_output_dir, nx_curve_png_file),
+                                           'pdf_path': os.path.join (html_output_dir, nx_curve_pdf_file)}))
+            report_files.append((os.path.join (html_output_dir, nx_curve_png_file), nx_curve_png_file, plot_name_desc+' PNG', True))
+            report_files.append((os.path.join (html_output_dir, nx_curve_pdf_file), nx_curve_pdf_file, plot_name_desc+' PDF', True))
+
+
+        # Composition distribution plots (contigs per 1% bin of GC, non-ACGT and softmasked bases), if asked for
+        if composition_stats:
+            plot_name = "composition_plot"
+            plot_name_desc = "Contig Composition Distributions"
+            self.log (console, "GENERATING PLOT "+plot_name_desc)
+            composition_panels = [('GC (% of ACGT bases)', 'gc_percs'),
+                                  ('non-ACGT bases (%)', 'ambig_percs'),
+                                  ('softmasked bases (%)', 'softmask_percs')]
+            composition_png_file = plot_name+".png"
+            composition_pdf_file = plot_name+".pdf"
+            chart_tasks.append(('composition', {'panels': [(panel_label, [stats.composition.perc_histogram(perc_method) for stats in assembly_stats])
+                                                            for panel_label, perc_method in composition_panels],
+                                                 'bin_edges': np.arange(101),
+                                                 'width': 9.0,
+                                                 'height': 0.75 * shared_img_in_height,
+                                                 'dpi': img_dpi,
+                                                 'png_path': os.path.join (html_output_dir, composition_png_file),
+                                                 'pdf_path': os.path.join (html_output_dir, composition_pdf_file)}))
+            report_files.append((os.path.join (html_output_dir, composition_png_file), composition_png_file, plot_name_desc+' PNG', True))
+            report_files.append((os.path.join (html_output_dir, composition_pdf_file), composition_pdf_file, plot_name_desc+' PDF', True))
+
+
+        # Hist plots for each assembly (shared bins and heights; zipped as one folder in STEP 7)
         hist_lens_png_files = []
         hist_lens_pdf_files = []
         units            = ['Kbp', 'Kbp', 'Mbp']
@@ -1120,7 +1125,7 @@ class kb_assembly_compare:
             hist_lens_png_files.append([])
             hist_lens_pdf_files.append([])
             for hist_i,top_cnt in enumerate(top_hist_cnt):
-                if len(hist_vals[ass_i][hist_i]) == 0:
+                if int(hist_cnt_by_bin[ass_i][hist_i].sum()) == 0:
                     continue
                 long_len = max_len
                 if hist_i < len(top_hist_cnt)-1:
@@ -1128,88 +1133,59 @@ class kb_assembly_compare:
                 plot_name = "hist_len_plot-"+ass_name+"_hist_window_"+str(min_hist_val_accept[hist_i])+"-"+str(long_len)
                 plot_name_desc = "Histogram of Contig Lengths "+str(min_hist_val_accept[hist_i])+"-"+str(long_len)+" (in bp)"
                 self.log (console, "GENERATING PLOT for "+ass_name+" "+plot_name_desc)
-                img_dpi = 200
-                img_units = "in"
-                #img_in_width  = 6.0
-                img_in_height = 3.0
-                x_margin = 0.01
-                y_margin = 0.01
-                title_fontsize = 12
-                text_color = "#606060"
-                hist_color = "slateblue"
-                fig = plt.figure()
-                fig.set_size_inches(img_in_width[hist_i], img_in_height)
-                ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-                #ax = fig.axes[0]
-                """
-                # Let's turn off visibility of all tic labels and boxes here
-                for ax in fig.axes:
-                    ax.xaxis.set_visible(False)  # remove axis labels and tics
-                    ax.yaxis.set_visible(False)
-                    for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                        t.set_visible(False)
-                    ax.spines['top'].set_visible(False)     # Get rid of top axis line
-                    ax.spines['bottom'].set_visible(False)  # bottom axis line
-                    ax.spines['left'].set_visible(False)    # left axis line
-                    ax.spines['right'].set_visible(False)   # right axis line
-                """
-                ax.grid(True)
-                min_hist_bin_beg = 0
-                max_hist_bin_end = float(long_len) / val_scale_adjust[hist_i]
-                binwidth = float (hist_binwidth[hist_i]) / val_scale_adjust[hist_i]
-                ax.set_xlim ([0, max_hist_bin_end + 2*binwidth])
-                ax.set_ylim ([0, top_hist_cnt[hist_i] + top_hist_cnt[hist_i] // 10])
-                ax.set_xlabel ('contig length bin ('+units[hist_i]+')')
-                ax.set_ylabel ('# contigs')
-                plt.tight_layout()
-                #ax.set_title (plot_name_desc)  # given in table column header
-
-                # plot hist
-                #min_log10_len = 0
-                ##max_log10_len  # set above
-                #log10_binwidth = 0.1
-
-                #plt.hist(hist_vals[ass_i][hist_i], log=False, bins=range(min_hist_bin_beg, max_hist_bin_end + binwidth, binwidth))
-                scaled_hist_vals = []
-                for val in hist_vals[ass_i][hist_i]:
-                    scaled_hist_vals.append(float(val) / val_scale_adjust[hist_i])
-                plt.hist(scaled_hist_vals, color=hist_color, log=False, bins=np.arange(min_hist_bin_beg, max_hist_bin_end + 3*binwidth, binwidth))
-
-                # save plot
-                self.log (console, "SAVING PLOT "+plot_name_desc)
+                hist_plan = hist_plans[hist_i]
+                bin_edges = hist_plan.edges / float(val_scale_adjust[hist_i])
+                if hist_plan.log_scale:
+                    hist_xlim = [bin_edges[0], bin_edges[-1]]
+                else:
+                    max_hist_bin_end = float(long_len) / val_scale_adjust[hist_i]
+                    binwidth = float (hist_binwidth[hist_i]) / val_scale_adjust[hist_i]
+                    hist_xlim = [0, max_hist_bin_end + 2*binwidth]
                 png_file = plot_name+".png"
                 hist_lens_png_files[ass_i].append(hist_folder_name+'/'+png_file)
                 pdf_file = plot_name+".pdf"
                 hist_lens_pdf_files[ass_i].append(hist_folder_name+'/'+pdf_file)
-                output_png_file_path = os.path.join (hist_output_dir, png_file)
-                output_pdf_file_path = os.path.join (hist_output_dir, pdf_file)
-                fig.savefig (output_png_file_path, dpi=img_dpi)
-                fig.savefig (output_pdf_file_path, format='pdf')
+                chart_tasks.append(('histogram', {'counts': hist_cnt_by_bin[ass_i][hist_i],
+                                                   'bin_edges': bin_edges,
+                                                   'log_scale': hist_plan.log_scale,
+                                                   'xlim': hist_xlim,
+                                                   'ylim': [0, top_hist_cnt[hist_i] + top_hist_cnt[hist_i] // 10],
+                                                   'xlabel': 'contig length bin ('+units[hist_i]+')',
+                                                   'width': img_in_width[hist_i],
+                                                   'height': 3.0,
+                                                   'color': "slateblue",
+                                                   'dpi': img_dpi,
+                                                   'png_path': os.path.join (hist_output_dir, png_file),
+                                                   'pdf_path': os.path.join (hist_output_dir, pdf_file)}))
+
+        # render (or write as the report's JSON payload), then upload the report figures and table
+        if interactive_report:
+            self.log (console, "WRITING REPORT DATA for "+str(len(chart_tasks))+" PLOTS")
+            report_data_file = "report_data.json"
+            report_data_path = os.path.join (output_dir, report_data_file)  # the page embeds its own copy
+            report_data_json = write_report_data (report_data_path, report_payload (chart_tasks, assembly_names))
+            report_files.append((report_data_path, report_data_file, 'Plotted Distributions JSON', False))
+        else:
+            # headless (Agg) rendering, loaded only when the report has images
+            from kb_assembly_compare.Utils.PlotUtil import RENDER_FUNCS, render_figures
+            self.log (console, "RENDERING "+str(len(chart_tasks))+" PLOTS with "+str(min(self.num_workers, len(chart_tasks)))+" workers")
+            render_figures ([(RENDER_FUNCS[chart_kind], spec) for chart_kind, spec in chart_tasks], self.num_workers)
+        chart_tasks = None
+        self.log (console, "PEAK MEMORY after "+("writing report data" if interactive_report else "rendering plots")+": "+format_peak_memory())
+        for file_path, file_name, file_label, is_figure in report_files:
+            if is_figure and interactive_report:
+                continue  # drawn in the page
+            try:
+                upload_ret = dfuClient.file_to_shock({'file_path': file_path,
+                                                      'make_handle': 0})
+                file_links.append({'shock_id': upload_ret['shock_id'],
+                                   'name': file_name,
+                                   'label': file_label
+                                   }
+                                  )
+            except:
+                raise ValueError ('Logging exception loading '+file_name+' to shock')
 
-                """
-                # upload PNG
-                try:
-                    upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                          'make_handle': 0})
-                    file_links.append({'shock_id': upload_ret['shock_id'],
-                                       'name': png_file,
-                                       'label': plot_name_desc+' PNG'
-                                       }
-                                      )
-                except:
-                    raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-                # upload PDF
-                try:
-                    upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                          'make_handle': 0})
-                    file_links.append({'shock_id': upload_ret['shock_id'],
-                                       'name': pdf_file,
-                                       'label': plot_name_desc+' PDF'
-                                       }
-                                      )
-                except:
-                    raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-                """
 
         #### STEP 6: Create and Upload HTML Report
         ##
@@ -1270,7 +1246,15 @@ class kb_assembly_compare:
             #self.log (console, "RGB: "+r+g+b)  # DEBUG
             return '#'+r+g+b
 
-        subtab_N_rows = 6
+        # a figure is an image, or in an interactive report a placeholder the bundled chart script draws into
+        def figure_html (png_file, width=None, height=None):
+            if interactive_report:
+                return chart_html (png_file, width=width, height=height)
+            if width is not None:
+                return '<img src="'+png_file+'" width='+str(width)+'>'
+            return '<img src="'+png_file+'" height='+str(height)+'>'
+
+        subtab_N_rows = max(2*len(percs), len(len_buckets))
         hist_colspan = 3 # in cells
         non_hist_colspan = 7 # in cells
         key_img_width = 475  # in pixels
@@ -1298,15 +1282,20 @@ class kb_assembly_compare:
 #        html_report_lines += [".vertical-text {\ndisplay: inline-block;\noverflow: hidden;\nwidth: 0.65em;\n}\n.vertical-text__inner {\ndisplay: inline-block;\nwhite-space: nowrap;\nline-height: 1.1;\ntransform: translate(0,100%) rotate(-90deg);\ntransform-origin: 0 0;\n}\n.vertical-text__inner:after {\ncontent: \"\";\ndisplay: block;\nmargin: 0.0em 0 100%;\n}"]
 #        html_report_lines += [".vertical-text_title {\ndisplay: inline-block;\noverflow: hidden;\nwidth: 1.0em;\n}\n.vertical-text__inner_title {\ndisplay: inline-block;\nwhite-space: nowrap;\nline-height: 1.0;\ntransform: translate(0,100%) rotate(-90deg);\ntransform-origin: 0 0;\n}\n.vertical-text__inner_title:after {\ncontent: \"\";\ndisplay: block;\nmargin: 0.0em 0 100%;\n}"]
 #        html_report_lines += ['</style>']
+        if interactive_report:
+            html_report_lines += [report_style_html()]
         html_report_lines += ['</head>']
         html_report_lines += ['<body bgcolor="white">']
 
         #html_report_lines += ['<tr><td valign=top align=left rowspan=1><div class="vertical-text_title"><div class="vertical-text__inner_title"><font color="'+text_color+'">'+label+'</font></div></div></td>']
 
         html_report_lines += ['<table cellpadding='+str(cellpadding)+' cellspacing='+str(cellspacing)+' border='+str(border)+'>']
-        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan+hist_colspan)+'><img src="'+key_png_file+'" width='+str(key_img_width)+'></td></tr>']
-        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan-1)+'><img src="'+cumulative_lens_png_file+'" height='+str(big_img_height)+'></td>']
-        html_report_lines += ['<td valign=top align=left rowspan=1 colspan='+str(hist_colspan)+'><img src="'+sorted_lens_png_file+'" height='+str(big_img_height)+'></td></tr>']
+        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan+hist_colspan)+'>'+figure_html(key_png_file, width=key_img_width)+'</td></tr>']
+        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan-1)+'>'+figure_html(cumulative_lens_png_file, height=big_img_height)+'</td>']
+        html_report_lines += ['<td valign=top align=left rowspan=1 colspan='+str(hist_colspan)+'>'+figure_html(sorted_lens_png_file, height=big_img_height)+'</td></tr>']
+        if nx_curve_png_file != None:
+            html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan-1)+'>'+figure_html(nx_curve_png_file, height=big_img_height)+'</td>']
+            html_report_lines += ['<td valign=top align=left rowspan=1 colspan='+str(hist_colspan)+'><font color="'+text_color+'" size='+text_fontsize+'><a href="'+nx_curve_table_file+'">Nx and Lx for x = 1..100 (TSV)</a></font></td></tr>']
 
         # key
         best = 10
@@ -1318,6 +1307,8 @@ class kb_assembly_compare:
             html_report_lines += ['<td bgcolor="'+get_cell_color(i, best, worst)+'"><font size='+text_fontsize+'>'+sp+'</font></td>']
         html_report_lines += ['<td bgcolor="'+get_cell_color(worst, best, worst)+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'WORST'+'</font></td>']
         html_report_lines += ['</tr></table></td></tr>']
+        if approximate:
+            html_report_lines += ['<tr><td></td><td colspan='+str(non_hist_colspan+hist_colspan-1)+'><font color="'+text_color+'" size='+text_fontsize+'><b>'+approx_note+'</b></font></td></tr>']
 
         # header
         html_report_lines += ['<tr bgcolor="'+head_color+'">']
@@ -1351,8 +1342,12 @@ class kb_assembly_compare:
             edges = ' style="border-right:solid 2px '+border_body_color+'"'
             bottom_edge = ''
             for sub_i in range(subtab_N_rows):
-                perc = percs[sub_i // 2]
-                bucket = len_buckets[sub_i]
+                perc = None
+                if sub_i // 2 < len(percs):
+                    perc = percs[sub_i // 2]
+                bucket = None
+                if sub_i < len(len_buckets):
+                    bucket = len_buckets[sub_i]
                 if sub_i == subtab_N_rows-1:
                     edges = ' style="border-right:solid 2px '+border_body_color+'; border-bottom:solid 2px '+border_body_color+'"'
                     bottom_edge = ' style="border-bottom:solid 2px '+border_body_color+'"'
@@ -1361,26 +1356,31 @@ class kb_assembly_compare:
                 if sub_i > 0:
                     html_report_lines += ['<tr>']
 
-                if (sub_i % 2) == 0:
-                    cell_color = get_cell_color (N[perc][ass_i], best_val['N'][perc], worst_val['N'][perc])
-                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'N'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+str(N[perc][ass_i])+'</font></td>']
+                if perc == None:
+                    html_report_lines += ['<td'+bottom_edge+'></td><td'+edges+'></td>']
+                elif (sub_i % 2) == 0:
+                    cell_color = get_cell_color (assembly_stats[ass_i].N[perc], best_val['N'][perc], worst_val['N'][perc])
+                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'N'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+approx_mark+str(assembly_stats[ass_i].N[perc])+'</font></td>']
                 else:
-                    cell_color = get_cell_color (L[perc][ass_i], best_val['L'][perc], worst_val['L'][perc], low_good=True)
-                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'L'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+'('+str(L[perc][ass_i])+')'+'</font></td>']
+                    cell_color = get_cell_color (assembly_stats[ass_i].L[perc], best_val['L'][perc], worst_val['L'][perc], low_good=True)
+                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'L'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+'('+approx_mark+str(assembly_stats[ass_i].L[perc])+')'+'</font></td>']
 
                 # Summary Stats
-                html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>']
-                if bucket >= 1000:
-                    html_report_lines += ['<nobr>'+'&gt;= '+'10'+'<sup>'+str(int(math.log(bucket,10)+0.1))+'</sup>'+'</nobr>']
+                if bucket == None:
+                    html_report_lines += ['<td'+bottom_edge+'></td><td'+bottom_edge+'></td><td'+edges+'></td>']
                 else:
-                    html_report_lines += ['<nobr>'+'&gt;= '+str(bucket)+'</nobr>']
-                html_report_lines += ['</font></td>']
+                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>']
+                    if bucket >= 1000 and bucket == 10**int(math.log(bucket,10)+0.1):
+                        html_report_lines += ['<nobr>'+'&gt;= '+'10'+'<sup>'+str(int(math.log(bucket,10)+0.1))+'</sup>'+'</nobr>']
+                    else:
+                        html_report_lines += ['<nobr>'+'&gt;= '+str(bucket)+'</nobr>']
+                    html_report_lines += ['</font></td>']
 
-                cell_color = get_cell_color (summary_stats[ass_i][bucket], best_val['summary_stats'][bucket], worst_val['summary_stats'][bucket])
-                html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(summary_stats[ass_i][bucket])+'</font></td>']
+                    cell_color = get_cell_color (assembly_stats[ass_i].bucket_counts[bucket], best_val['summary_stats'][bucket], worst_val['summary_stats'][bucket])
+                    html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(assembly_stats[ass_i].bucket_counts[bucket])+'</font></td>']
 
-                cell_color = get_cell_color (cumulative_len_stats[ass_i][bucket], best_val['cumulative_len_stats'][bucket], worst_val['cumulative_len_stats'][bucket])
-                html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(cumulative_len_stats[ass_i][bucket])+'</font></td>']
+                    cell_color = get_cell_color (assembly_stats[ass_i].bucket_lens[bucket], best_val['cumulative_len_stats'][bucket], worst_val['cumulative_len_stats'][bucket])
+                    html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(assembly_stats[ass_i].bucket_lens[bucket])+'</font></td>']
                 if sub_i > 0:
                     html_report_lines += ['</tr>']
                 else:
@@ -1389,10 +1389,31 @@ class kb_assembly_compare:
                     for hist_i,hist_lens_png_file in enumerate(hist_lens_png_files[ass_i]):
                         if hist_i == len(hist_lens_png_files[ass_i])-1:
                             hist_edge = ' style="border-right:solid 2px '+border_body_color+'; border-bottom:solid 2px '+border_body_color+'"'
-                        html_report_lines += ['<td valign=top align=left rowspan='+str(subtab_N_rows)+' colspan=1'+hist_edge+'><img src="'+hist_lens_png_file+'" height='+str(hist_img_height)+'></td>']
+                        html_report_lines += ['<td valign=top align=left rowspan='+str(subtab_N_rows)+' colspan=1'+hist_edge+'>'+figure_html(hist_lens_png_file, height=hist_img_height)+'</td>']
                     html_report_lines += ['</tr>']
 
+        # composition summary, if asked for
+        if composition_stats:
+            html_report_lines += ['<tr><td>'+sp+'</td></tr>']
+            html_report_lines += ['<tr bgcolor="'+head_color+'">']
+            html_report_lines += ['<td style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+' align="left">'+'ASSEMBLY'+'</font></td>']
+            for composition_head in ['GC<br>(% of ACGT)', 'NON-ACGT<br>BASES', 'CONTIGS WITH<br>NON-ACGT', 'SOFTMASKED<br>(%)']:
+                html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+composition_head+'</font></td>']
+            html_report_lines += ['<td align="center" style="border-bottom:solid 2px '+border_head_color+'" colspan='+str(non_hist_colspan+hist_colspan-5)+'><font color="'+text_color+'" size='+text_fontsize+'>'+'Contig Composition Distributions'+'</font></td>']
+            html_report_lines += ['</tr>']
+            for ass_i,ass_name in enumerate(assembly_names):
+                (gc_perc, ambig_count, softmask_perc, ambig_contig_count) = composition_summaries[ass_i]
+                html_report_lines += ['<tr>']
+                html_report_lines += ['<td align="left" bgcolor="'+base_cell_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+ass_name+'</font></td>']
+                for composition_val in [format_perc(gc_perc), str(ambig_count), str(ambig_contig_count), format_perc(softmask_perc)]:
+                    html_report_lines += ['<td align="right"><font color="'+text_color+'" size='+text_fontsize+'>'+composition_val+'</font></td>']
+                if ass_i == 0:
+                    html_report_lines += ['<td valign=top align=left rowspan='+str(len(assembly_names))+' colspan='+str(non_hist_colspan+hist_colspan-5)+'>'+figure_html(composition_png_file, height=hist_img_height)+'</td>']
+                html_report_lines += ['</tr>']
+
         html_report_lines += ['</table>']
+        if interactive_report:
+            html_report_lines += [report_script_html(report_data_json)]
         html_report_lines += ['</body>']
         html_report_lines += ['</html>']
 
@@ -1413,16 +1434,17 @@ class kb_assembly_compare:
 
         #### STEP 7
         ##
-        try:
-            hist_upload_ret = dfuClient.file_to_shock({'file_path': hist_output_dir,
-                                                       'make_handle': 0,
-                                                       'pack': 'zip'})
-            file_links.append({'shock_id': hist_upload_ret['shock_id'],
-                               'name': 'histogram_figures.zip',
-                               'label': 'Histogram Figures'
-                           })
-        except:
-            raise ValueError ('Logging exception loading html_report to shock')
+        if not interactive_report:  # histograms are drawn in the page
+            try:
+                hist_upload_ret = dfuClient.file_to_shock({'file_path': hist_output_dir,
+                                                           'make_handle': 0,
+                                                           'pack': 'zip'})
+                file_links.append({'shock_id': hist_upload_ret['shock_id'],
+                                   'name': 'histogram_figures.zip',
+                                   'label': 'Histogram Figures'
+                               })
+            except:
+                raise ValueError ('Logging exception loading html_report to shock')
 
 
 
@@ -1516,12 +1538,14 @@ class kb_assembly_compare:
         # API Clients
         #SERVICE_VER = 'dev'  # DEBUG
         SERVICE_VER = 'release'
-        # wsClient
+        # wsClient (the large generated clients are imported on first use, not at service start)
+        from installed_clients.WorkspaceClient import Workspace as workspaceService
         try:
             wsClient = workspaceService(self.workspaceURL, token=token)
         except Exception as e:
             raise ValueError('Unable to instantiate wsClient with workspaceURL: '+ self.workspaceURL +' ERROR: ' + str(e))
         # setAPI_Client
+        from installed_clients.SetAPIServiceClient import SetAPI
         try:
             #setAPI_Client = SetAPI (url=self.callbackURL, token=ctx['token'])  # for SDK local.  local doesn't work for SetAPI
             setAPI_Client = SetAPI (url=self.serviceWizardURL, token=ctx['token'])  # for dynamic service
@@ -0,0 +1,61 @@
+"""
+Report cold-start import time of the service and of each method's first call
+
+Every measurement runs in a fresh interpreter, so nothing is already in
+sys.modules.  'service start' imports the Impl module, which every server
+worker and async job pays; each method row also imports the modules that
+method loads on first use (generated clients, the plotting module).  For a
+per-module breakdown, run one of the rows under 'python -X importtime'.
+
+Usage: python scripts/benchmark_import_time.py [repeats]
+"""
+import os
+import subprocess
+import sys
+
+LIB_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+IMPL_MODULE = 'kb_assembly_compare.kb_assembly_compareImpl'
+CLIENT_MODULES = ['installed_clients.WorkspaceClient', 'installed_clients.SetAPIServiceClient']
+METHOD_MODULES = [
+    ('run_filter_contigs_by_length', CLIENT_MODULES),
+    ('run_contig_distribution_compare', CLIENT_MODULES + ['kb_assembly_compare.Utils.PlotUtil']),
+    ('run_benchmark_assemblies_against_genomes_with_MUMmer4', CLIENT_MODULES),
+]
+
+TIMER_SRC = ("import importlib, sys, time\n" +
+             "t0 = time.perf_counter()\n" +
+             "for module in sys.argv[1:]:\n" +
+             "    importlib.import_module(module)\n" +
+             "print(time.perf_counter() - t0)\n")
+
+
+def cold_import_secs (modules):
+    env = os.environ.copy()
+    env['PYTHONPATH'] = LIB_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    out = subprocess.check_output([sys.executable, '-c', TIMER_SRC] + modules, env=env)
+    return float(out.decode().strip().splitlines()[-1])
+
+
+def median (vals):
+    vals = sorted(vals)
+    mid = len(vals) // 2
+    if len(vals) % 2 == 1:
+        return vals[mid]
+    return (vals[mid-1] + vals[mid]) / 2.0
+
+
+if __name__ == "__main__":
+    repeats = 5
+    if len(sys.argv) > 1:
+        repeats = int(sys.argv[1])
+
+    rows = [('service start', [IMPL_MODULE])]
+    for method, modules in METHOD_MODULES:
+        rows.append((method, [IMPL_MODULE] + modules))
+
+    print("cold-start import time over "+str(repeats)+" fresh interpreters (ms)")
+    print("\t".join(['min', 'median', 'method']))
+    for name, modules in rows:
+        secs = [cold_import_secs(modules) for i in range(repeats)]
+        print("\t".join(['%.1f' % (1000.0 * min(secs)), '%.1f' % (1000.0 * median(secs)), name]))
@@ -14,8 +14,7 @@ elif [ "${1}" = "test" ] ; then
   echo "Run Tests"
   make test
 elif [ "${1}" = "async" ] ; then
-  #sh ./scripts/run_async.sh
-  xvfb-run bash ./scripts/run_async.sh
+  sh ./scripts/run_async.sh
 elif [ "${1}" = "init" ] ; then
   echo "Initialize module"
 elif [ "${1}" = "bash" ] ; then
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from kb_assembly_compare.Utils.CacheUtil import length_dtype, StatsCache
+
+
+class CacheUtilTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.scratch, 'stats_cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_entry_key(self):
+        self.assertEqual('7_3_2-abc123', StatsCache.entry_key('7/3/2', 'abc123'))
+        self.assertNotEqual(StatsCache.entry_key('7/3/2', 'abc123'), StatsCache.entry_key('7/3/3', 'abc123'))
+        self.assertIsNone(StatsCache.entry_key('7/3/2', None))
+
+    def test_get_put(self):
+        cache = StatsCache(self.cache_dir, 1024 * 1024)
+        key = StatsCache.entry_key('7/1/1', 'aaaa')
+        self.assertIsNone(cache.get(key))
+        self.assertTrue(cache.put(key, [300, 200, 100]))
+        self.assertEqual([300, 200, 100], cache.get(key).tolist())
+        self.assertEqual(np.uint32, cache.get(key).dtype)
+        self.assertIsInstance(cache.get(key), np.memmap)
+        self.assertEqual(np.uint32, length_dtype((1 << 32) - 1))
+        self.assertEqual(np.uint64, length_dtype(1 << 32))
+
+        # attribute columns are optional and stored in length order
+        self.assertIsNone(cache.get_attr(key, 'gc_perc'))
+        self.assertTrue(cache.put(key, [300, 200, 100], {'gc_perc': np.array([40.0, 50.5, 61.0])}))
+        self.assertEqual([40.0, 50.5, 61.0], cache.get_attr(key, 'gc_perc').tolist())
+
+        # lengths given as distinct values and counts are stored expanded
+        self.assertTrue(cache.put(key, [300, 200, 100], counts=[1, 3, 2]))
+        self.assertEqual([300, 200, 200, 200, 100, 100], cache.get(key).tolist())
+        cache.write_repeated_column(cache.entry_path(key), np.array([9, 5, 2], dtype=np.uint32), [5, 1, 4], block_size=2)
+        self.assertEqual([9]*5 + [5] + [2]*4, cache.get(key).tolist())
+
+        # corrupt entries are dropped
+        with open(cache.entry_path(key), 'wb') as entry_handle:
+            entry_handle.write(b'not an array')
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(cache.entry_path(key)))
+
+    def test_disabled(self):
+        cache = StatsCache(self.cache_dir, 0)
+        key = StatsCache.entry_key('7/1/1', 'aaaa')
+        self.assertFalse(cache.put(key, [1, 2]))
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_lru_eviction(self):
+        entry_lens = np.arange(1000, 0, -1)
+        probe = StatsCache(os.path.join(self.scratch, 'probe'), 1024 * 1024)
+        probe.put('probe', entry_lens)
+        entry_size = os.path.getsize(probe.entry_path('probe'))
+
+        cache = StatsCache(self.cache_dir, 3 * entry_size)
+        keys = ['entry_'+str(i) for i in range(4)]
+        for key_i,key in enumerate(keys[:3]):
+            cache.put(key, entry_lens)
+            os.utime(cache.entry_path(key), (key_i, key_i))
+        # touching entry_0 makes entry_1 the least recently used
+        self.assertIsNotNone(cache.get(keys[0]))
+        cache.put(keys[3], entry_lens)
+        self.assertIsNone(cache.get(keys[1]))
+        for key in [keys[0], keys[2], keys[3]]:
+            self.assertIsNotNone(cache.get(key))
+
+        # eviction takes attribute columns with their entry
+        cache.put(keys[2], entry_lens, {'n_count': np.zeros(entry_lens.size, dtype=np.int64)})
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[3]))
+        self.assertIsNotNone(cache.get_attr(keys[2], 'n_count'))
+
+        # an entry larger than the whole cache is not kept
+        small_cache = StatsCache(self.cache_dir, entry_size // 2)
+        small_cache.put('too_big', entry_lens)
+        self.assertEqual([], os.listdir(self.cache_dir))
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from kb_assembly_compare.Utils import FastaUtil
+from kb_assembly_compare.Utils.FastaUtil import (filter_fasta_by_length,
+                                                 filter_fasta_by_length_parallel,
+                                                 build_fasta_index,
+                                                 can_stream_fasta,
+                                                 contig_composition_parallel,
+                                                 contig_length_sketch_parallel,
+                                                 contig_sketch_parallel,
+                                                 contig_length_stats_parallel,
+                                                 fasta_compression,
+                                                 filter_fasta_stream,
+                                                 FastaIndex,
+                                                 load_fasta_index,
+                                                 iter_contig_lengths,
+                                                 plan_fasta_ranges,
+                                                 scan_contig_lengths,
+                                                 scan_contig_lengths_range,
+                                                 split_fasta_ranges)
+from kb_assembly_compare.Utils.FilterUtil import ContigFilter
+from kb_assembly_compare.Utils.ParallelUtil import get_num_workers, run_parallel
+from kb_assembly_compare.Utils.StatsUtil import ContigComposition, LengthSketch
+
+
+def read_fasta_records(fasta_path):
+    # a plain line-by-line reader, kept as a reference for the block and indexed readers
+    records = []
+    with open(fasta_path, 'rb') as fasta_handle:
+        for fasta_line in fasta_handle:
+            if fasta_line.startswith(b'>'):
+                records.append((fasta_line[1:].rstrip(b'\r\n'), []))
+            elif len(records) > 0:
+                records[-1][1].append(fasta_line.translate(None, b' \t\r\n\x0b\x0c'))
+    return [(header, b''.join(seq_lines)) for header, seq_lines in records]
+
+
+def write_bgzf(bgzf_path, data, block_size=7):
+    with open(bgzf_path, 'wb') as bgzf_handle:
+        for beg in list(range(0, len(data), block_size)) + [len(data)]:
+            chunk = data[beg:beg+block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflate_data = compressor.compress(chunk) + compressor.flush()
+            bgzf_handle.write(b'\x1f\x8b\x08\x04' + b'\x00'*4 + b'\x00\xff' +
+                              struct.pack('<H', 6) + b'BC' + struct.pack('<HH', 2, len(deflate_data) + 25) +
+                              deflate_data + struct.pack('<II', zlib.crc32(chunk), len(chunk)))
+
+
+class FastaUtilTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.mkdtemp()
+        cls.wrapped_fasta_path = os.path.join(cls.scratch, 'wrapped.fa')
+        with open(cls.wrapped_fasta_path, 'w') as fasta_handle:
+            fasta_handle.write(">contig_1 desc one\n" +
+                               "ACGTACGTAC\n" +
+                               "GTACG\n" +
+                               ">contig_2\r\n" +
+                               "acgt acgt\r\n" +
+                               ">empty_contig\n" +
+                               ">contig_3\n" +
+                               "NNNNACGT\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.scratch)
+
+    def composition_columns(self, fasta_path):
+        columns = [[], [], [], []]
+        for header, seq in read_fasta_records(fasta_path):
+            if len(seq) == 0:
+                continue
+            columns[0].append(len(seq))
+            columns[1].append(len([base for base in seq.decode() if base in 'GCgc']))
+            columns[2].append(len([base for base in seq.decode() if base not in 'ACGTacgt']))
+            columns[3].append(len([base for base in seq.decode() if base.islower()]))
+        return columns
+
+    def test_iter_contig_lengths(self):
+        self.assertEqual([15, 8, 0, 8], list(iter_contig_lengths(self.wrapped_fasta_path)))
+        self.assertEqual([15, 8, 8], scan_contig_lengths(self.wrapped_fasta_path))
+
+    def test_iter_contig_lengths_block_boundaries(self):
+        expected = list(iter_contig_lengths(self.wrapped_fasta_path))
+        saved_block_size = FastaUtil.scan_block_size
+        try:
+            out_path = os.path.join(self.scratch, 'block_filtered.fa')
+            for block_size in range(1, 12):
+                FastaUtil.scan_block_size = block_size
+                self.assertEqual(expected, list(iter_contig_lengths(self.wrapped_fasta_path)))
+                self.assertEqual((3, [3]), filter_fasta_stream(self.wrapped_fasta_path, [out_path], [1]))
+                with open(out_path, 'rb') as out_handle:
+                    self.assertEqual(b">contig_1 desc one\nACGTACGTAC\nGTACG\n" +
+                                     b">contig_2\r\nacgt acgt\r\n" +
+                                     b">contig_3\nNNNNACGT\n",
+                                     out_handle.read())
+        finally:
+            FastaUtil.scan_block_size = saved_block_size
+
+    def test_composition_batches(self):
+        gzip_path = os.path.join(self.scratch, 'composition_batches.fa.gz')
+        with open(self.wrapped_fasta_path, 'rb') as fasta_handle, gzip.open(gzip_path, 'wb') as gzip_handle:
+            gzip_handle.write(fasta_handle.read())
+        expected = [self.composition_columns(self.wrapped_fasta_path)] * 2
+        saved_sizes = (FastaUtil.bincount_block_size, FastaUtil.pair_count_min_size,
+                       FastaUtil.short_record_size, FastaUtil.composition_batch_size)
+        try:
+            # long records counted as (odd-length) byte pairs, short ones batched a few at a time
+            for sizes in [(2, 4, 12, 1), (4, 1, 9, 20), (8, 100, 1, 1), (6, 10, 100, 100)]:
+                (FastaUtil.bincount_block_size, FastaUtil.pair_count_min_size,
+                 FastaUtil.short_record_size, FastaUtil.composition_batch_size) = sizes
+                self.assertEqual(expected, [[getattr(composition, column).tolist() for column in composition.columns]
+                                            for composition in contig_composition_parallel([self.wrapped_fasta_path, gzip_path], 1)])
+        finally:
+            (FastaUtil.bincount_block_size, FastaUtil.pair_count_min_size,
+             FastaUtil.short_record_size, FastaUtil.composition_batch_size) = saved_sizes
+
+    def test_iter_contig_lengths_matches_records(self):
+        for ass_file in ['assembly_1.fa', 'assembly_2.fa']:
+            ass_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', ass_file)
+            self.assertEqual([len(seq) for header, seq in read_fasta_records(ass_path)],
+                             list(iter_contig_lengths(ass_path)))
+
+    def test_filter_fasta_by_length(self):
+        out_path = os.path.join(self.scratch, 'filtered.fa')
+        counts = filter_fasta_by_length(self.wrapped_fasta_path, [out_path], [10])
+        self.assertEqual((3, [1]), counts)
+        with open(out_path, 'r') as out_handle:
+            self.assertEqual(">contig_1 desc one\nACGTACGTAC\nGTACG\n", out_handle.read())
+
+        counts = filter_fasta_by_length(self.wrapped_fasta_path, [out_path], [8])
+        self.assertEqual((3, [3]), counts)
+        self.assertEqual([b'contig_1 desc one', b'contig_2', b'contig_3'],
+                         [header for header, seq in read_fasta_records(out_path)])
+
+    def test_filter_fasta_by_length_without_copy_file_range(self):
+        out_path = os.path.join(self.scratch, 'filtered_no_cfr.fa')
+        copy_file_range = getattr(os, 'copy_file_range', None)
+        if copy_file_range is not None:
+            del os.copy_file_range
+        try:
+            counts = filter_fasta_by_length(self.wrapped_fasta_path, [out_path], [9])
+        finally:
+            if copy_file_range is not None:
+                os.copy_file_range = copy_file_range
+        self.assertEqual((3, [1]), counts)
+        with open(out_path, 'r') as out_handle:
+            self.assertEqual(">contig_1 desc one\nACGTACGTAC\nGTACG\n", out_handle.read())
+
+    def test_run_parallel_keeps_order(self):
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+        scan_args = [(os.path.join(data_dir, ass_file),) for ass_file in ['assembly_1.fa', 'assembly_2.fa']]
+        scan_args.append((self.wrapped_fasta_path,))
+        self.assertEqual([scan_contig_lengths(*args) for args in scan_args],
+                         run_parallel(scan_contig_lengths, scan_args, 3))
+        self.assertTrue(get_num_workers('0') >= 1)
+        self.assertEqual(4, get_num_workers('4'))
+
+    def test_split_fasta_ranges(self):
+        with open(self.wrapped_fasta_path, 'rb') as fasta_handle:
+            fasta_bytes = fasta_handle.read()
+        for num_ranges in range(1, 10):
+            ranges = split_fasta_ranges(self.wrapped_fasta_path, num_ranges)
+            self.assertEqual(0, ranges[0][0])
+            self.assertEqual(len(fasta_bytes), ranges[-1][1])
+            for range_i,(beg, end) in enumerate(ranges):
+                if range_i > 0:
+                    self.assertEqual(ranges[range_i-1][1], beg)
+                    self.assertEqual(b'\n>', fasta_bytes[beg-1:beg+1])
+            self.assertEqual(scan_contig_lengths(self.wrapped_fasta_path),
+                             [seq_len for beg, end in ranges
+                              for seq_len in scan_contig_lengths_range(self.wrapped_fasta_path, beg, end)])
+
+    def test_parallel_scan_and_filter_split_files(self):
+        saved_split_min_size = FastaUtil.split_min_size
+        FastaUtil.split_min_size = 1
+        try:
+            data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+            ass_path = os.path.join(self.scratch, 'assembly_1.fa')
+            shutil.copy(os.path.join(data_dir, 'assembly_1.fa'), ass_path)
+            fasta_paths = [ass_path, self.wrapped_fasta_path]
+            self.assertTrue(len(plan_fasta_ranges(fasta_paths, 4)) > len(fasta_paths))
+            self.assertEqual([sorted(scan_contig_lengths(fasta_path), reverse=True) for fasta_path in fasta_paths],
+                             [accumulator.sorted_lens().tolist() for accumulator in contig_length_stats_parallel(fasta_paths, 4)])
+            for file_i,composition in enumerate(contig_composition_parallel(fasta_paths, 4)):
+                self.assertEqual(self.composition_columns(fasta_paths[file_i]),
+                                 [getattr(composition, column).tolist() for column in composition.columns])
+            # split ranges reduce to the sketch of the whole file
+            for file_i,sketch in enumerate(contig_sketch_parallel(fasta_paths, 4, 0.01, [1000, 1])):
+                whole_sketch = LengthSketch(0.01, [1000, 1]).add(ContigComposition(*self.composition_columns(fasta_paths[file_i])))
+                for attr in ['bin_counts', 'bin_sums', 'bucket_counts', 'bucket_lens']:
+                    self.assertEqual(getattr(whole_sketch, attr).tolist(), getattr(sketch, attr).tolist())
+                self.assertEqual(whole_sketch.summary(), sketch.summary())
+            # and so do length-only sketches, without composition
+            for file_i,sketch in enumerate(contig_length_sketch_parallel(fasta_paths, 4, 0.01, [1000, 1])):
+                whole_sketch = LengthSketch(0.01, [1000, 1]).add_lengths(scan_contig_lengths(fasta_paths[file_i]))
+                for attr in ['bin_counts', 'bin_sums', 'bucket_counts', 'bucket_lens']:
+                    self.assertEqual(getattr(whole_sketch, attr).tolist(), getattr(sketch, attr).tolist())
+                self.assertEqual((whole_sketch.num_contigs, whole_sketch.total_len, whole_sketch.max_len, 0),
+                                 (sketch.num_contigs, sketch.total_len, sketch.max_len, sketch.gc_count))
+
+            # split files are filtered range by range, and ranked predicates still rank the whole file
+            for (min_contig_lengths, compress_output, contig_filter) in [([9], False, None),
+                                                                         ([8, 1000], False, ContigFilter(top_n_longest=2)),
+                                                                         ([1, 9], True, ContigFilter(cumulative_perc=60))]:
+                serial_out_paths = [[os.path.join(self.scratch, 'serial_'+str(i)+'_'+str(t)+'.fa') for t in min_contig_lengths]
+                                    for i in range(len(fasta_paths))]
+                parallel_out_paths = [[os.path.join(self.scratch, 'parallel_'+str(i)+'_'+str(t)+'.fa') for t in min_contig_lengths]
+                                      for i in range(len(fasta_paths))]
+                serial_counts = [filter_fasta_by_length(fasta_path, serial_out_paths[i], min_contig_lengths,
+                                                        compress_output=compress_output, contig_filter=contig_filter)
+                                 for i,fasta_path in enumerate(fasta_paths)]
+                self.assertEqual(serial_counts,
+                                 filter_fasta_by_length_parallel(fasta_paths, parallel_out_paths, min_contig_lengths, 4,
+                                                                 compress_output=compress_output, contig_filter=contig_filter))
+                open_func = gzip.open if compress_output else open
+                for i in range(len(fasta_paths)):
+                    for t in range(len(min_contig_lengths)):
+                        with open_func(serial_out_paths[i][t], 'rb') as serial_handle, \
+                             open_func(parallel_out_paths[i][t], 'rb') as parallel_handle:
+                            self.assertEqual(serial_handle.read(), parallel_handle.read())
+                self.assertEqual([], [out_file for out_file in os.listdir(self.scratch) if '.part' in out_file])
+        finally:
+            FastaUtil.split_min_size = saved_split_min_size
+
+    def test_parallel_filter_empty_file(self):
+        empty_path = os.path.join(self.scratch, 'empty.fa')
+        open(empty_path, 'wb').close()
+        fasta_paths = [empty_path, self.wrapped_fasta_path]
+        for compress_output in [False, True]:
+            out_paths = [[os.path.join(self.scratch, 'empty_out_'+str(i)+'_'+str(t)+'.fa') for t in [1, 9]]
+                         for i in range(len(fasta_paths))]
+            self.assertEqual([(0, [0, 0]), (3, [3, 1])],
+                             filter_fasta_by_length_parallel(fasta_paths, out_paths, [1, 9], 2, compress_output=compress_output))
+            open_func = gzip.open if compress_output else open
+            for out_path in out_paths[0]:
+                with open_func(out_path, 'rb') as out_handle:
+                    self.assertEqual(b'', out_handle.read())
+        self.assertEqual([0, 3], [accumulator.num_contigs() for accumulator in contig_length_stats_parallel(fasta_paths, 2)])
+        self.assertEqual([0, 3], [composition.lens.size for composition in contig_composition_parallel(fasta_paths, 2)])
+        self.assertEqual([0, 3], [sketch.num_contigs for sketch in contig_sketch_parallel(fasta_paths, 2, 0.01, [1])])
+        self.assertEqual([0, 3], [sketch.num_contigs for sketch in contig_length_sketch_parallel(fasta_paths, 2, 0.01, [1])])
+
+    def test_build_fasta_index(self):
+        fasta_path = os.path.join(self.scratch, 'indexed.fa')
+        shutil.copy(self.wrapped_fasta_path, fasta_path)
+        fasta_index = build_fasta_index(fasta_path)
+        self.assertTrue(fasta_index.regular)
+        with open(fasta_path+'.fai', 'r') as fai_handle:
+            self.assertEqual("contig_1\t15\t19\t10\t11\n" +
+                             "contig_2\t8\t47\t8\t11\n" +
+                             "empty_contig\t0\t72\t0\t0\n" +
+                             "contig_3\t8\t82\t8\t9\n",
+                             fai_handle.read())
+        self.assertEqual([15, 8, 8], fasta_index.contig_lengths())
+        reloaded_index = load_fasta_index(fasta_path)
+        self.assertEqual(fasta_index.names, reloaded_index.names)
+        self.assertEqual(list(fasta_index.offsets), list(reloaded_index.offsets))
+
+    def test_contig_length_stats_from_index(self):
+        fasta_path = os.path.join(self.scratch, 'indexed_stats.fa')
+        shutil.copy(self.wrapped_fasta_path, fasta_path)
+        build_fasta_index(fasta_path)
+        # a fresh .fai is read instead of the sequence (these lengths are not the file's)
+        with open(fasta_path+'.fai', 'w') as fai_handle:
+            fai_handle.write("contig_1\t100\t19\t10\t11\n" +
+                             "empty_contig\t0\t72\t0\t0\n" +
+                             "contig_3\t7\t82\t8\t9\n")
+        self.assertEqual([[100, 7], [15, 8, 8]],
+                         [accumulator.sorted_lens().tolist()
+                          for accumulator in contig_length_stats_parallel([fasta_path, self.wrapped_fasta_path], 2)])
+        self.assertEqual([(2, 107, 100), (3, 31, 15)],
+                         [(sketch.num_contigs, sketch.total_len, sketch.max_len)
+                          for sketch in contig_length_sketch_parallel([fasta_path, self.wrapped_fasta_path], 2, 0.01, [1])])
+        # a stale one is not
+        fasta_mtime = os.path.getmtime(fasta_path)
+        os.utime(fasta_path+'.fai', (fasta_mtime - 10, fasta_mtime - 10))
+        self.assertEqual([15, 8, 8], contig_length_stats_parallel([fasta_path], 1)[0].sorted_lens().tolist())
+
+    def test_build_fasta_index_irregular_lines(self):
+        fasta_path = os.path.join(self.scratch, 'irregular.fa')
+        with open(fasta_path, 'w') as fasta_handle:
+            fasta_handle.write(">a\nACGTAC\nACG\nACG\n>b\nAC\n")
+        fasta_index = build_fasta_index(fasta_path)
+        self.assertFalse(fasta_index.regular)
+        self.assertEqual([12, 2], list(fasta_index.lengths))
+        self.assertFalse(os.path.exists(fasta_path+'.fai'))
+        self.assertIsNone(load_fasta_index(fasta_path))
+
+    def test_filter_fasta_by_length_from_index(self):
+        fasta_path = os.path.join(self.scratch, 'indexed_filter.fa')
+        shutil.copy(self.wrapped_fasta_path, fasta_path)
+        fasta_index = FastaIndex()
+        fasta_index.append('contig_1', 15, 19, 10, 11)
+        fasta_index.append('contig_2', 8, 47, 8, 11)
+        fasta_index.append('empty_contig', 0, 72, 0, 0)
+        fasta_index.append('contig_3', 8, 82, 8, 9)
+        out_path = os.path.join(self.scratch, 'indexed_filtered.fa')
+        self.assertEqual((3, [1]), filter_fasta_by_length(fasta_path, [out_path], [9], fasta_index))
+        with open(out_path, 'r') as out_handle:
+            self.assertEqual(">contig_1 desc one\nACGTACGTAC\nGTACG\n", out_handle.read())
+
+    def test_compressed_fasta_streaming(self):
+        with open(self.wrapped_fasta_path, 'rb') as fasta_handle:
+            fasta_bytes = fasta_handle.read()
+        gzip_path = os.path.join(self.scratch, 'wrapped.fa.gz')
+        with gzip.open(gzip_path, 'wb') as gzip_handle:
+            gzip_handle.write(fasta_bytes)
+        bgzf_path = os.path.join(self.scratch, 'wrapped.fa.bgz')
+        write_bgzf(bgzf_path, fasta_bytes)
+
+        self.assertIsNone(fasta_compression(self.wrapped_fasta_path))
+        self.assertEqual('gzip', fasta_compression(gzip_path))
+        self.assertEqual('bgzf', fasta_compression(bgzf_path))
+        for fasta_path in [self.wrapped_fasta_path, gzip_path, bgzf_path]:
+            self.assertTrue(can_stream_fasta(fasta_path))
+        tgz_path = os.path.join(self.scratch, 'wrapped.tgz')
+        shutil.copy(gzip_path, tgz_path)
+        self.assertFalse(can_stream_fasta(tgz_path))
+
+        expected_lens = scan_contig_lengths(self.wrapped_fasta_path)
+        for fasta_path in [gzip_path, bgzf_path]:
+            for num_threads in [1, 3]:
+                self.assertEqual(expected_lens, scan_contig_lengths(fasta_path, num_threads))
+        self.assertEqual([self.composition_columns(self.wrapped_fasta_path)] * 3,
+                         [[getattr(composition, column).tolist() for column in composition.columns]
+                          for composition in contig_composition_parallel([gzip_path, self.wrapped_fasta_path, bgzf_path], 2)])
+        whole_sketch = LengthSketch(0.01, [1]).add(ContigComposition(*self.composition_columns(self.wrapped_fasta_path)))
+        self.assertEqual([(3, 31, whole_sketch.summary(), whole_sketch.bin_counts.tolist())] * 3,
+                         [(sketch.num_contigs, sketch.total_len, sketch.summary(), sketch.bin_counts.tolist())
+                          for sketch in contig_sketch_parallel([gzip_path, self.wrapped_fasta_path, bgzf_path], 2, 0.01, [1])])
+        self.assertEqual([(3, 31, whole_sketch.bin_counts.tolist())] * 3,
+                         [(sketch.num_contigs, sketch.total_len, sketch.bin_counts.tolist())
+                          for sketch in contig_length_sketch_parallel([gzip_path, self.wrapped_fasta_path, bgzf_path], 2, 0.01, [1])])
+        self.assertEqual([sorted(expected_lens, reverse=True)] * 3,
+                         [accumulator.sorted_lens().tolist()
+                          for accumulator in contig_length_stats_parallel([gzip_path, self.wrapped_fasta_path, bgzf_path], 2)])
+
+    def test_compressed_fasta_filter(self):
+        with open(self.wrapped_fasta_path, 'rb') as fasta_handle:
+            fasta_bytes = fasta_handle.read()
+        bgzf_path = os.path.join(self.scratch, 'filter_in.fa.bgz')
+        write_bgzf(bgzf_path, fasta_bytes, block_size=5)
+        plain_path = os.path.join(self.scratch, 'filter_in.fa')
+        shutil.copy(self.wrapped_fasta_path, plain_path)
+
+        out_path = os.path.join(self.scratch, 'filter_out.fa')
+        self.assertEqual((3, [1]), filter_fasta_stream(bgzf_path, [out_path], [9], num_threads=2))
+        with open(out_path, 'rb') as out_handle:
+            self.assertEqual(b">contig_1 desc one\nACGTACGTAC\nGTACG\n", out_handle.read())
+        self.assertEqual((3, [3]), filter_fasta_stream(bgzf_path, [out_path], [8]))
+        with open(out_path, 'rb') as out_handle:
+            self.assertEqual(fasta_bytes.replace(b">empty_contig\n", b""), out_handle.read())
+
+        out_paths = [os.path.join(self.scratch, 'filter_out_'+str(i)+'.fa.gz') for i in range(2)]
+        self.assertEqual([(3, [1]), (3, [1])],
+                         filter_fasta_by_length_parallel([plain_path, bgzf_path], [[out_path] for out_path in out_paths], [9], 2,
+                                                         compress_output=True))
+        for out_path in out_paths:
+            self.assertEqual('gzip', fasta_compression(out_path))
+            with gzip.open(out_path, 'rb') as out_handle:
+                self.assertEqual(b">contig_1 desc one\nACGTACGTAC\nGTACG\n", out_handle.read())
+
+    def test_filter_fasta_multiple_thresholds(self):
+        with open(self.wrapped_fasta_path, 'rb') as fasta_handle:
+            fasta_bytes = fasta_handle.read()
+        bgzf_path = os.path.join(self.scratch, 'thresholds.fa.bgz')
+        write_bgzf(bgzf_path, fasta_bytes)
+        plain_path = os.path.join(self.scratch, 'thresholds.fa')
+        shutil.copy(self.wrapped_fasta_path, plain_path)
+        min_contig_lengths = [8, 9, 16]
+        expected_bytes = [fasta_bytes.replace(b">empty_contig\n", b""),
+                          b">contig_1 desc one\nACGTACGTAC\nGTACG\n",
+                          b""]
+        for compress_output in [False, True]:
+            out_paths = [[os.path.join(self.scratch, 'thresholds_'+str(file_i)+'_'+str(t)+'.fa')
+                          for t in min_contig_lengths]
+                         for file_i in range(2)]
+            self.assertEqual([(3, [3, 1, 0]), (3, [3, 1, 0])],
+                             filter_fasta_by_length_parallel([plain_path, bgzf_path], out_paths, min_contig_lengths, 2,
+                                                             compress_output=compress_output))
+            for file_out_paths in out_paths:
+                for thresh_i,out_path in enumerate(file_out_paths):
+                    open_func = gzip.open if compress_output else open
+                    with open_func(out_path, 'rb') as out_handle:
+                        self.assertEqual(expected_bytes[thresh_i], out_handle.read())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from kb_assembly_compare.Utils.FastaUtil import (filter_fasta_by_length_parallel,
+                                                 preview_filter_by_length_parallel,
+                                                 scan_contig_lengths)
+from kb_assembly_compare.Utils.FilterUtil import ContigFilter, count_gc_acgt_n, preview_sorted_lengths
+from kb_assembly_compare.Utils.StatsUtil import composition_from_byte_counts, ContigComposition
+
+
+class FilterUtilTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.mkdtemp()
+        cls.fasta_bytes = (b">contig_1 desc one\n" +
+                           b"ACGTACGTAC\n" +
+                           b"GTACG\n" +
+                           b">contig_2\n" +
+                           b"acgtacgt\n" +
+                           b">empty_contig\n" +
+                           b">contig_3\n" +
+                           b"NNNNACGT\n" +
+                           b">contig_4\n" +
+                           b"GGGGGCCCCCAT\n")
+        cls.plain_path = os.path.join(cls.scratch, 'predicates.fa')
+        with open(cls.plain_path, 'wb') as fasta_handle:
+            fasta_handle.write(cls.fasta_bytes)
+        cls.gzip_path = os.path.join(cls.scratch, 'predicates.fa.gz')
+        with gzip.open(cls.gzip_path, 'wb') as gzip_handle:
+            gzip_handle.write(cls.fasta_bytes)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.scratch)
+
+    def filter_names(self, contig_filter, min_contig_length=1):
+        names = []
+        for fasta_path in [self.plain_path, self.gzip_path]:
+            out_path = fasta_path+'.out.fa'
+            counts = filter_fasta_by_length_parallel([fasta_path], [[out_path]], [min_contig_length], 1,
+                                                     contig_filter=contig_filter)
+            with open(out_path, 'r') as out_handle:
+                these_names = [out_line[1:].rstrip('\n') for out_line in out_handle if out_line.startswith('>')]
+            self.assertEqual([(4, [len(these_names)])], counts)
+            names.append(these_names)
+        self.assertEqual(names[0], names[1])
+        return names[0]
+
+    def test_count_gc_acgt_n(self):
+        self.assertEqual((8, 15, 0), count_gc_acgt_n(b"ACGTACGTAC\nGTACG\n"))
+        self.assertEqual((2, 4, 4), count_gc_acgt_n(b"NNnnAcgT"))
+
+        # GC% is of ACGT bases, as in the distribution report, so ambiguity codes do not dilute it
+        seq_bytes = b"GCRYatNn\n"
+        byte_counts = np.bincount(np.frombuffer(seq_bytes, dtype=np.uint8), minlength=256)
+        composition = ContigComposition(*[[val] for val in composition_from_byte_counts(byte_counts)])
+        self.assertEqual([50.0], composition.gc_percs().tolist())
+        self.assertTrue(ContigFilter(min_gc_perc=50, max_gc_perc=50).keep(8, seq_bytes))
+        self.assertFalse(ContigFilter(max_gc_perc=49.9).keep(8, seq_bytes))
+
+    def test_from_params(self):
+        self.assertIsNone(ContigFilter.from_params({'min_contig_length': 1000, 'max_gc_perc': ''}))
+        contig_filter = ContigFilter.from_params({'max_contig_length': '5000', 'min_gc_perc': 30})
+        self.assertEqual(5000, contig_filter.max_contig_length)
+        self.assertEqual(30.0, contig_filter.min_gc_perc)
+        self.assertTrue(contig_filter.needs_composition())
+        self.assertFalse(contig_filter.needs_lengths())
+        with self.assertRaises(ValueError):
+            ContigFilter.from_params({'max_n_perc': 101})
+        with self.assertRaises(ValueError):
+            ContigFilter.from_params({'min_gc_perc': 60, 'max_gc_perc': 40})
+        with self.assertRaises(ValueError):
+            ContigFilter.from_params({'top_n_longest': 'many'})
+
+    def test_select_ranked(self):
+        lengths = [10, 40, 0, 30, 20, 30]
+        self.assertEqual(bytearray([0, 1, 0, 1, 0, 0]), ContigFilter(top_n_longest=2).select_ranked(lengths))
+        # 90% of 130 bases is reached by 40+30+30
+        self.assertEqual(bytearray([0, 1, 0, 1, 1, 1]), ContigFilter(cumulative_perc=90).select_ranked(lengths))
+        self.assertEqual(bytearray([0, 1, 0, 1, 0, 1]), ContigFilter(cumulative_perc=75).select_ranked(lengths))
+        self.assertIsNone(ContigFilter(max_n_perc=5).select_ranked(lengths))
+
+    def test_filter_predicates(self):
+        self.assertEqual(['contig_2', 'contig_3', 'contig_4'], self.filter_names(ContigFilter(max_contig_length=12)))
+        self.assertEqual(['contig_1 desc one', 'contig_2', 'contig_3'], self.filter_names(ContigFilter(max_gc_perc=60)))
+        self.assertEqual(['contig_1 desc one', 'contig_4'], self.filter_names(ContigFilter(min_gc_perc=51)))
+        self.assertEqual(['contig_1 desc one', 'contig_2', 'contig_4'], self.filter_names(ContigFilter(max_n_perc=10)))
+        self.assertEqual(['contig_1 desc one', 'contig_4'], self.filter_names(ContigFilter(top_n_longest=2)))
+        self.assertEqual(['contig_1 desc one', 'contig_2', 'contig_4'], self.filter_names(ContigFilter(cumulative_perc=80)))
+        self.assertEqual(['contig_1 desc one'], self.filter_names(ContigFilter(top_n_longest=2), min_contig_length=13))
+
+    def test_preview_matches_filter(self):
+        min_contig_lengths = [1, 9, 13]
+        for contig_filter in [None, ContigFilter(max_n_perc=10), ContigFilter(top_n_longest=3, max_gc_perc=60)]:
+            out_paths = [[fasta_path+'.preview_'+str(t)+'.fa' for t in min_contig_lengths]
+                         for fasta_path in [self.plain_path, self.gzip_path]]
+            filter_counts = filter_fasta_by_length_parallel([self.plain_path, self.gzip_path], out_paths, min_contig_lengths, 2,
+                                                            contig_filter=contig_filter)
+            preview_counts = preview_filter_by_length_parallel([self.plain_path, self.gzip_path], min_contig_lengths, 2,
+                                                               contig_filter=contig_filter)
+            for file_i in range(2):
+                (original_count, original_bases, kept_counts, kept_bases) = preview_counts[file_i]
+                self.assertEqual((4, 43), (original_count, original_bases))
+                self.assertEqual(filter_counts[file_i], (original_count, kept_counts))
+                for thresh_i in range(len(min_contig_lengths)):
+                    self.assertEqual(sum(scan_contig_lengths(out_paths[file_i][thresh_i])),
+                                     kept_bases[thresh_i])
+
+    def test_preview_sorted_lengths(self):
+        min_contig_lengths = [0, 1, 8, 9, 13, 16]
+        sorted_lens = sorted(scan_contig_lengths(self.plain_path), reverse=True)
+        for contig_filter in [None, ContigFilter(max_contig_length=12), ContigFilter(top_n_longest=2),
+                              ContigFilter(top_n_longest=3, max_contig_length=8), ContigFilter(cumulative_perc=0),
+                              ContigFilter(cumulative_perc=60), ContigFilter(cumulative_perc=100)]:
+            preview_counts = preview_filter_by_length_parallel([self.plain_path], min_contig_lengths, 1, contig_filter=contig_filter)[0]
+            self.assertEqual(preview_counts, preview_sorted_lengths(sorted_lens, min_contig_lengths, contig_filter))
+            # distinct lengths longest first, with the contigs of each
+            (length_values, length_counts) = np.unique(sorted_lens + sorted_lens[:2], return_counts=True)
+            doubled_counts = preview_sorted_lengths(length_values[::-1], min_contig_lengths, contig_filter, length_counts[::-1])
+            self.assertEqual(preview_sorted_lengths(sorted(sorted_lens + sorted_lens[:2], reverse=True), min_contig_lengths,
+                                                    contig_filter),
+                             doubled_counts)
+        self.assertEqual((0, 0, [0, 0], [0, 0]), preview_sorted_lengths([], [1, 10]))
+        with self.assertRaises(ValueError):
+            preview_sorted_lengths(sorted_lens, min_contig_lengths, ContigFilter(max_n_perc=5))
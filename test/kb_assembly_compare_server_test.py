@@ -124,6 +124,51 @@ class kb_assembly_compareTest(unittest.TestCase):
         pass
 
 
+    #### test_filter_contigs_by_length_02()
+    ##
+    def test_filter_contigs_by_length_02 (self):
+        method = 'filter_contigs_by_length_02'
+        
+        print ("\n\nRUNNING: test_filter_contigs_by_length_02()")
+        print ("===========================================\n\n")
+
+        # upload test data
+        try:
+            auClient = AssemblyUtil(self.callback_url, token=self.getContext()['token'])
+        except Exception as e:
+            raise ValueError('Unable to instantiate auClient with callbackURL: '+ self.callback_url +' ERROR: ' + str(e))
+        ass_file_1 = 'assembly_1.fa'
+        ass_file_2 = 'assembly_2.fa'
+        ass_path_1 = os.path.join(self.scratch, ass_file_1)
+        ass_path_2 = os.path.join(self.scratch, ass_file_2)
+        shutil.copy(os.path.join("data", ass_file_1), ass_path_1)
+        shutil.copy(os.path.join("data", ass_file_2), ass_path_2)
+        ass_ref_1 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_1},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_1'
+        })
+        ass_ref_2 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_2},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_2'
+        })
+
+        # run method
+        input_refs = [ ass_ref_1, ass_ref_2 ]
+        base_output_name = method+'_output'
+        params = {
+            'workspace_name': self.getWsName(),
+            'input_assembly_refs': input_refs,
+            'min_contig_length': [500, 1000, 5000],
+            'output_name': 'test_filtered'
+        }
+        result = self.getImpl().run_filter_contigs_by_length(self.getContext(),params)
+        print('RESULT:')
+        pprint(result)
+        pass
+
+
     #### test_contig_distribution_compare_01()
     ##
     def test_contig_distribution_compare_01 (self):
@@ -167,6 +212,98 @@ class kb_assembly_compareTest(unittest.TestCase):
         pass
 
 
+    #### test_contig_distribution_compare_02()
+    ##
+    def test_contig_distribution_compare_02 (self):
+        method = 'contig_distribution_compare_02'
+        
+        print ("\n\nRUNNING: test_contig_distribution_compare_02()")
+        print ("==============================================\n\n")
+
+        # upload test data
+        try:
+            auClient = AssemblyUtil(self.callback_url, token=self.getContext()['token'])
+        except Exception as e:
+            raise ValueError('Unable to instantiate auClient with callbackURL: '+ self.callback_url +' ERROR: ' + str(e))
+        ass_file_1 = 'assembly_1.fa'
+        ass_file_2 = 'assembly_2.fa'
+        ass_path_1 = os.path.join(self.scratch, ass_file_1)
+        ass_path_2 = os.path.join(self.scratch, ass_file_2)
+        shutil.copy(os.path.join("data", ass_file_1), ass_path_1)
+        shutil.copy(os.path.join("data", ass_file_2), ass_path_2)
+        ass_ref_1 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_1},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_1'
+        })
+        ass_ref_2 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_2},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_2'
+        })
+
+        # run method
+        input_refs = [ ass_ref_1, ass_ref_2 ]
+        base_output_name = method+'_output'
+        params = {
+            'workspace_name': self.getWsName(),
+            'input_assembly_refs': input_refs,
+            'percentiles': [10, 25, 50, 95],
+            'full_nx_curve': 1,
+            'composition_stats': 1
+        }
+        result = self.getImpl().run_contig_distribution_compare(self.getContext(),params)
+        print('RESULT:')
+        pprint(result)
+        pass
+
+
+    #### test_contig_distribution_compare_03()
+    ##
+    def test_contig_distribution_compare_03 (self):
+        method = 'contig_distribution_compare_03'
+        
+        print ("\n\nRUNNING: test_contig_distribution_compare_03()")
+        print ("==============================================\n\n")
+
+        # upload test data
+        try:
+            auClient = AssemblyUtil(self.callback_url, token=self.getContext()['token'])
+        except Exception as e:
+            raise ValueError('Unable to instantiate auClient with callbackURL: '+ self.callback_url +' ERROR: ' + str(e))
+        ass_file_1 = 'assembly_1.fa'
+        ass_file_2 = 'assembly_2.fa'
+        ass_path_1 = os.path.join(self.scratch, ass_file_1)
+        ass_path_2 = os.path.join(self.scratch, ass_file_2)
+        shutil.copy(os.path.join("data", ass_file_1), ass_path_1)
+        shutil.copy(os.path.join("data", ass_file_2), ass_path_2)
+        ass_ref_1 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_1},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_1'
+        })
+        ass_ref_2 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_2},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_2'
+        })
+
+        # run method
+        input_refs = [ ass_ref_1, ass_ref_2 ]
+        base_output_name = method+'_output'
+        params = {
+            'workspace_name': self.getWsName(),
+            'input_assembly_refs': input_refs,
+            'full_nx_curve': 1,
+            'composition_stats': 1,
+            'interactive_report': 1
+        }
+        result = self.getImpl().run_contig_distribution_compare(self.getContext(),params)
+        print('RESULT:')
+        pprint(result)
+        pass
+
+
     def HIDE_run_benchmark_assemblies_against_genomes_with_MUMmer4_01 (self):
         # Prepare test objects in workspace if needed using
         # self.getWsClient().save_objects({'workspace': self.getWsName(),
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+import weakref
+
+import numpy as np
+
+from kb_assembly_compare.Utils import PlotUtil
+from kb_assembly_compare.Utils.ParallelUtil import peak_memory_mb
+from kb_assembly_compare.Utils.PlotUtil import (render_figures,
+                                                render_key_plot,
+                                                render_length_histogram,
+                                                render_lines_plot)
+
+
+class PlotUtilTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def out_paths(self, name):
+        return {'png_path': os.path.join(self.scratch, name+'.png'),
+                'pdf_path': os.path.join(self.scratch, name+'.pdf'),
+                'dpi': 50}
+
+    def test_render_figures(self):
+        render_tasks = []
+        key_spec = {'names': ['a', 'b'], 'title': 'KEY'}
+        key_spec.update(self.out_paths('key_plot'))
+        render_tasks.append((render_key_plot, key_spec))
+        lines_spec = {'lines': [(np.arange(1, 4), np.array([3.0, 5.0, 6.0])),
+                                (np.arange(1, 3), np.array([4.0, 6.0]))],
+                      'title': 'Cumulative', 'xlabel': 'x', 'ylabel': 'y',
+                      'width': 3.0, 'height': 2.0, 'drawstyle': 'steps-pre', 'xlim': (0, 4)}
+        lines_spec.update(self.out_paths('lines_plot'))
+        render_tasks.append((render_lines_plot, lines_spec))
+        for hist_i, log_scale in enumerate([False, True]):
+            hist_spec = {'counts': np.array([2, 0, 5]),
+                         'bin_edges': np.array([1.0, 10.0, 100.0, 1000.0]),
+                         'log_scale': log_scale, 'xlim': [1.0, 1000.0], 'ylim': [0, 6],
+                         'xlabel': 'contig length bin (Kbp)', 'width': 3.0}
+            hist_spec.update(self.out_paths('hist_'+str(hist_i)))
+            render_tasks.append((render_length_histogram, hist_spec))
+
+        # paths come back in task order from the pool, same as rendering inline
+        expected = [(spec['png_path'], spec['pdf_path']) for render_func, spec in render_tasks]
+        self.assertEqual(expected, render_figures(render_tasks, 2))
+        for png_path, pdf_path in expected:
+            with open(png_path, 'rb') as png_handle:
+                self.assertEqual(b'\x89PNG', png_handle.read(4))
+            with open(pdf_path, 'rb') as pdf_handle:
+                self.assertEqual(b'%PDF', pdf_handle.read(4))
+        self.assertEqual(expected[:1], render_figures(render_tasks[:1], 1))
+
+    def test_figures_are_freed(self):
+        # every figure is released once saved, so rendering many keeps no figures alive
+        made_figures = []
+        new_figure = PlotUtil.new_figure
+
+        def tracked_new_figure(width, height):
+            fig = new_figure(width, height)
+            made_figures.append(weakref.ref(fig))
+            return fig
+        PlotUtil.new_figure = tracked_new_figure
+        try:
+            for hist_i in range(5):
+                hist_spec = {'counts': np.arange(1000), 'bin_edges': np.arange(1001.0),
+                             'log_scale': False, 'xlim': [0, 1000], 'ylim': [0, 1000],
+                             'xlabel': 'contig length bin (Kbp)', 'width': 3.0}
+                hist_spec.update(self.out_paths('hist_'+str(hist_i)))
+                render_figures([(render_length_histogram, hist_spec)], 1)
+        finally:
+            PlotUtil.new_figure = new_figure
+        gc.collect()
+        self.assertEqual(5, len(made_figures))
+        self.assertEqual([None] * 5, [fig_ref() for fig_ref in made_figures])
+
+        (self_mb, children_mb) = peak_memory_mb()
+        self.assertGreater(self_mb, 0)
+        self.assertGreaterEqual(children_mb, 0)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from kb_assembly_compare.Utils.PlotUtil import RENDER_FUNCS
+from kb_assembly_compare.Utils.ReportUtil import (CHART_SPEC_KEYS,
+                                                  chart_html,
+                                                  chart_payload,
+                                                  report_payload,
+                                                  report_script_html,
+                                                  write_report_data)
+
+
+class ReportUtilTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def chart_tasks(self):
+        return [('key', {'names': ['a.fa', 'b</script>'], 'title': 'KEY',
+                         'png_path': '/out/html/key_plot.png', 'pdf_path': '/out/html/key_plot.pdf'}),
+                ('lines', {'lines': [(np.arange(1, 4), np.array([0.1234567891, 0.5, 0.75]))],
+                           'title': 'Cumulative Length (in Mbp)', 'xlabel': 'x', 'ylabel': 'y',
+                           'width': 6.0, 'height': 4.0, 'dpi': 200,
+                           'png_path': '/out/html/cumulative_len_plot.png', 'pdf_path': '/out/html/cumulative_len_plot.pdf'}),
+                ('composition', {'panels': [('GC (% of ACGT bases)', [np.array([1, 0]), np.array([0, 2])])],
+                                 'bin_edges': np.arange(3), 'width': 9.0, 'height': 3.0,
+                                 'png_path': '/out/html/composition_plot.png', 'pdf_path': '/out/html/composition_plot.pdf'}),
+                ('histogram', {'counts': np.array([2, 0, 5], dtype=np.int64), 'bin_edges': np.array([0.0, 1.0, 2.0, 3.0]),
+                               'log_scale': False, 'xlim': [0, 3.0], 'ylim': [0, np.int64(5)],
+                               'xlabel': 'contig length bin (Kbp)', 'width': 3.0,
+                               'png_path': '/out/html/histograms/hist_len_plot-a.fa_hist_window_0-10000.png',
+                               'pdf_path': '/out/html/histograms/hist_len_plot-a.fa_hist_window_0-10000.pdf'})]
+
+    def test_report_payload(self):
+        # every chart kind drawn on the server can also be drawn in the page
+        self.assertEqual(sorted(RENDER_FUNCS.keys()), sorted(CHART_SPEC_KEYS.keys()))
+
+        payload = report_payload(self.chart_tasks(), ['a.fa', 'b</script>'])
+        self.assertEqual(['a.fa', 'b</script>'], payload['assemblies'])
+        charts = payload['charts']
+        self.assertEqual(sorted(['key_plot', 'cumulative_len_plot', 'composition_plot', 'hist_len_plot-a.fa_hist_window_0-10000']),
+                         sorted(charts.keys()))
+        self.assertEqual({'type': 'key', 'names': ['a.fa', 'b</script>'], 'title': 'KEY', 'width': 6.0, 'height': 1.0},
+                         charts['key_plot'])
+        # values only, as plain JSON numbers; file paths and dpi stay on the server
+        self.assertEqual([[[1, 2, 3], [0.123457, 0.5, 0.75]]], charts['cumulative_len_plot']['lines'])
+        self.assertNotIn('png_path', charts['cumulative_len_plot'])
+        self.assertNotIn('dpi', charts['cumulative_len_plot'])
+        self.assertEqual([['GC (% of ACGT bases)', [[1, 0], [0, 2]]]], charts['composition_plot']['panels'])
+        hist = charts['hist_len_plot-a.fa_hist_window_0-10000']
+        self.assertEqual(('bars', [2, 0, 5], [0, 5], 3.0), (hist['type'], hist['counts'], hist['ylim'], hist['height']))
+
+        report_data_path = os.path.join(self.scratch, 'report_data.json')
+        payload_json = write_report_data(report_data_path, payload)
+        with open(report_data_path, 'r') as report_data_handle:
+            self.assertEqual(payload, json.load(report_data_handle))
+        self.assertEqual(payload, json.loads(payload_json))
+
+        with self.assertRaises(ValueError):
+            chart_payload('pie', {})
+
+    def test_report_html(self):
+        self.assertEqual('<div class="kbchart" data-chart="key_plot" data-width="475"></div>',
+                         chart_html('key_plot.png', width=475))
+        self.assertEqual('<div class="kbchart" data-chart="hist_len_plot-a&quot;b" data-height="200"></div>',
+                         chart_html('histograms/hist_len_plot-a"b.png', height=200))
+
+        # names cannot close the inline JSON early, and the chart script is bundled in the page
+        payload_json = json.dumps(report_payload(self.chart_tasks(), ['a.fa', 'b</script>']))
+        script_html = report_script_html(payload_json)
+        self.assertEqual(2, script_html.count('</script>'))
+        json_html = script_html[:script_html.index('</script>')]
+        self.assertEqual(json.loads(payload_json), json.loads(json_html[json_html.index('>') + 1:]))
+        self.assertIn('function drawChart', script_html)
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from kb_assembly_compare.Utils.StatsUtil import (ApproxAssemblyStats,
+                                                 AssemblyStats,
+                                                 COMPOSITION_PERC_METHODS,
+                                                 DEFAULT_LEN_BUCKETS,
+                                                 LengthSketch,
+                                                 merge_sketches,
+                                                 parse_approx_error_perc,
+                                                 sketch_from_columns,
+                                                 LengthAccumulator,
+                                                 merge_accumulators,
+                                                 best_worst_vals,
+                                                 composition_from_byte_counts,
+                                                 ContigComposition,
+                                                 perc_histogram,
+                                                 bucket_stats,
+                                                 nx_lx,
+                                                 nx_step_indices,
+                                                 lttb_indices,
+                                                 downsample_curve,
+                                                 parse_len_buckets,
+                                                 parse_percs,
+                                                 plan_histogram_bins,
+                                                 sort_lens,
+                                                 write_nx_curve_table)
+
+
+def loop_nx_lx(lens, perc):
+    # the original list-based scan, kept as a reference
+    lens = sorted(lens, reverse=True)
+    total_len = sum(lens)
+    cumulative_len = 0
+    for val_i,val in enumerate(lens):
+        cumulative_len += val
+        if cumulative_len >= perc/100.0 * total_len:
+            return (val, val_i+1)
+
+
+class StatsUtilTest(unittest.TestCase):
+
+    def test_nx_lx_matches_loop(self):
+        rng = random.Random(7)
+        for trial in range(20):
+            lens = [rng.randint(1, 100000) for i in range(rng.randint(1, 500))]
+            if trial % 3 == 0:
+                lens += [5000] * 10  # ties
+            sorted_lens = sort_lens(lens)
+            cumulative_lens = np.cumsum(sorted_lens)
+            percs = [1, 10, 25, 50, 75, 90, 95, 100]
+            (N, L) = nx_lx(sorted_lens, cumulative_lens, percs)
+            for perc_i,perc in enumerate(percs):
+                self.assertEqual(loop_nx_lx(lens, perc), (N[perc_i], L[perc_i]))
+
+    def test_bucket_stats(self):
+        sorted_lens = sort_lens([500, 1000, 1, 1000000, 999, 10000, 500])
+        (counts, bucket_sums) = bucket_stats(sorted_lens, np.cumsum(sorted_lens), [2000000, 1000000, 1000, 500, 1])
+        self.assertEqual([0, 1, 3, 6, 7], list(counts))
+        self.assertEqual([0, 1000000, 1011000, 1012999, 1013000], list(bucket_sums))
+
+    def test_assembly_stats(self):
+        stats = AssemblyStats('ass', [100, 400, 300, 200])
+        self.assertEqual([400, 300, 200, 100], list(stats.lens))
+        self.assertEqual(np.int64, stats.lens.dtype)
+        self.assertEqual((4, 1000, 400), (stats.num_contigs, stats.total_len, stats.max_len))
+        self.assertEqual({50: 300, 75: 200, 90: 200}, stats.N)
+        self.assertEqual({50: 2, 75: 3, 90: 3}, stats.L)
+        self.assertEqual(4, stats.bucket_counts[1])
+        self.assertEqual(0, stats.bucket_lens[500])
+
+        empty_stats = AssemblyStats('empty', [])
+        self.assertEqual((0, 0, 0), (empty_stats.num_contigs, empty_stats.total_len, empty_stats.max_len))
+        self.assertEqual({50: 0, 75: 0, 90: 0}, empty_stats.N)
+
+        (best_val, worst_val) = best_worst_vals([stats, AssemblyStats('other', [1000, 10])])
+        self.assertEqual((1000, 400), (best_val['len'], worst_val['len']))
+        self.assertEqual((1, 3), (best_val['L'][75], worst_val['L'][75]))
+        self.assertEqual((4, 2), (best_val['summary_stats'][1], worst_val['summary_stats'][1]))
+
+    def test_parse_percs(self):
+        self.assertEqual([50, 75, 90], parse_percs(None))
+        self.assertEqual([10, 25, 50, 95], parse_percs(['95', 50, 10, 25.0, 50]))
+        self.assertEqual([12.5], parse_percs(12.5))
+        for bad_perc in [0, 101, 'N50']:
+            with self.assertRaises(ValueError):
+                parse_percs([bad_perc])
+
+    def test_parse_len_buckets(self):
+        self.assertEqual([1000000, 100000, 10000, 1000, 500, 1], parse_len_buckets(None))
+        self.assertEqual([250000, 50000, 5000, 2000, 200], parse_len_buckets(['200', 2000, 5000, 50000, 250000, 200]))
+        for bad_bucket in [0, -5, '2K']:
+            with self.assertRaises(ValueError):
+                parse_len_buckets([bad_bucket])
+
+    def test_many_buckets(self):
+        rng = random.Random(11)
+        lens = [rng.randint(1, 300000) for i in range(2000)]
+        len_buckets = parse_len_buckets([200, 2000, 5000, 50000, 250000, 1, 300001])
+        stats = AssemblyStats('many', lens, len_buckets=len_buckets)
+        for bucket in len_buckets:
+            self.assertEqual(len([val for val in lens if val >= bucket]), stats.bucket_counts[bucket])
+            self.assertEqual(sum([val for val in lens if val >= bucket]), stats.bucket_lens[bucket])
+
+    def test_histogram_plan(self):
+        random.seed(3)
+        assembly_stats = [AssemblyStats(name, [random.randint(1, 300000) for i in range(n)])
+                          for name, n in [('a', 500), ('b', 0), ('c', 2000)]]
+        # linear plans are aligned at 0 and match per-assembly binning
+        plan = plan_histogram_bins(10000, 100000, 5000, 70)
+        self.assertFalse(plan.log_scale)
+        self.assertEqual(20, plan.num_bins)
+        counts = plan.count([stats.window_values(10000, 100000) for stats in assembly_stats])
+        self.assertEqual((3, 20), counts.shape)
+        for ass_i,stats in enumerate(assembly_stats):
+            window_lens = stats.lens[(stats.lens >= 10000) & (stats.lens < 100000)]
+            self.assertEqual(np.bincount(window_lens // 5000, minlength=20).tolist(), counts[ass_i].tolist())
+
+        # windows spanning 100 fold get log-spaced bins, shared by every assembly
+        plan = plan_histogram_bins(1000, 300001, 10000, 70)
+        self.assertTrue(plan.log_scale)
+        self.assertEqual((1000, 300001), (plan.edges[0], plan.edges[-1]))
+        self.assertTrue(np.all(np.diff(plan.edges) > 0))
+        counts = plan.count([stats.window_values(1000, 300001) for stats in assembly_stats])
+        for ass_i,stats in enumerate(assembly_stats):
+            self.assertEqual(len([l for l in stats.lens if l >= 1000]), int(counts[ass_i].sum()))
+            bin_i = np.digitize(stats.lens[stats.lens >= 1000], plan.edges) - 1
+            self.assertEqual(np.bincount(bin_i, minlength=plan.num_bins).tolist(), counts[ass_i].tolist())
+
+        # weighted groups (e.g. sketch bins) mix with unweighted ones
+        counts = plan_histogram_bins(0, 100, 10, 70).count([([5, 15, 15], None), ([5, 95], [3, 4]), ([], None)])
+        self.assertEqual([[1, 2] + [0] * 8, [3] + [0] * 8 + [4], [0] * 10], counts.tolist())
+        self.assertEqual((0, 10), plan_histogram_bins(0, 100, 10, 70).count([]).shape)
+
+    def test_downsample_curve(self):
+        random.seed(5)
+        stats = AssemblyStats('a', [random.randint(1, 100000) for i in range(20000)])
+        (step_lens, step_counts, cumulative_lens) = stats.length_steps()
+        nx_steps = nx_step_indices(cumulative_lens, [50, 90])
+        self.assertEqual([stats.L[50] - 1, stats.L[90] - 1], nx_steps.tolist())
+
+        # about max_vertices points, keeping the endpoints and breakpoints exactly
+        keep = lttb_indices(step_counts, cumulative_lens, 500, nx_steps)
+        self.assertTrue(len(keep) <= 500 + 3)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        for i in [0, len(step_counts) - 1] + nx_steps.tolist():
+            self.assertIn(i, keep)
+        (x_coords, y_coords) = downsample_curve(step_counts, cumulative_lens, 500, nx_steps)
+        self.assertEqual(cumulative_lens[stats.L[50] - 1], y_coords[x_coords.tolist().index(stats.L[50])])
+
+        # shape: the kept vertices follow the full curve closely
+        interpolated = np.interp(step_counts, x_coords, y_coords)
+        self.assertLess(np.abs(interpolated - cumulative_lens).max(), 0.01 * cumulative_lens[-1])
+
+        # a sharp corner is found rather than averaged away
+        corner_y = np.concatenate((np.zeros(1000), np.ones(1000)))
+        corner_keep = lttb_indices(np.arange(2000), corner_y, 20)
+        self.assertTrue(999 in corner_keep or 1000 in corner_keep)
+
+        # short curves and a budget of 0 keep every point
+        self.assertEqual(list(range(10)), lttb_indices(np.arange(10), np.arange(10), 20).tolist())
+        self.assertEqual(20000, len(lttb_indices(step_counts, cumulative_lens, 0)))
+
+    def test_length_accumulator(self):
+        rng = random.Random(3)
+        percs = [0.5, 1, 10, 33.3, 50, 75, 90, 99.9, 100]
+        len_buckets = [250000, 50000, 5000, 2000, 1000, 200, 1]
+        for lens in [[], [7], [5, 5, 5, 5], [rng.choice([100, 200, 200, 5000, 70000, 150000]) for i in range(997)],
+                     [rng.randint(1, 200000) for i in range(5000)]]:
+            stats = AssemblyStats('acc', lens, percs, len_buckets)
+            accumulator = LengthAccumulator()
+            for chunk_beg in range(0, len(lens), 100):
+                accumulator.add(lens[chunk_beg:chunk_beg+100])
+            self.assertEqual(stats.num_contigs, accumulator.num_contigs())
+            self.assertEqual(stats.total_len, accumulator.total_len())
+            self.assertEqual(stats.max_len, accumulator.max_len())
+            self.assertEqual(stats.lens.tolist(), accumulator.sorted_lens().tolist())
+            # the distinct lengths and counts give the same stats as the original list
+            accumulated_stats = AssemblyStats.from_accumulator('acc', accumulator, percs, len_buckets)
+            self.assertEqual((stats.num_contigs, stats.total_len, stats.max_len),
+                             (accumulated_stats.num_contigs, accumulated_stats.total_len, accumulated_stats.max_len))
+            self.assertEqual((stats.N, stats.L, stats.bucket_counts, stats.bucket_lens),
+                             (accumulated_stats.N, accumulated_stats.L, accumulated_stats.bucket_counts, accumulated_stats.bucket_lens))
+            for (vals, accumulated_vals) in zip(stats.nx_curve(), accumulated_stats.nx_curve()):
+                self.assertEqual(vals.tolist(), accumulated_vals.tolist())
+            num_contigs = list(range(len(lens)+1))
+            self.assertEqual(stats.prefix_lens(num_contigs).tolist(), accumulated_stats.prefix_lens(num_contigs).tolist())
+            thresholds = [0, 1, 150, 200, 201, 70000, 300000]
+            self.assertEqual(stats.count_at_least(thresholds).tolist(), accumulated_stats.count_at_least(thresholds).tolist())
+            # each step ends where the per-contig curves do
+            (step_lens, step_counts, step_cumulative_lens) = accumulated_stats.length_steps()
+            if len(lens) > 0:
+                self.assertEqual(stats.cumulative_lens[step_counts - 1].tolist(), step_cumulative_lens.tolist())
+                self.assertEqual(stats.lens[step_counts - 1].tolist(), step_lens.tolist())
+            plan = plan_histogram_bins(100, 200001, 1000, 20)
+            self.assertEqual(plan.count([stats.window_values(plan.min_len, plan.max_len)]).tolist(),
+                             plan.count([accumulated_stats.window_values(plan.min_len, plan.max_len)]).tolist())
+
+    def test_merge_accumulators(self):
+        rng = random.Random(8)
+        lens = [rng.randint(1, 3000) for i in range(4000)]
+        shards = [LengthAccumulator(lens[beg:beg+500]) for beg in range(0, len(lens), 500)]
+        left = merge_accumulators(shards)
+        right = LengthAccumulator()
+        for shard in reversed(shards):
+            right = merge_accumulators([shard, right])
+        nested = merge_accumulators([merge_accumulators(shards[:3]), merge_accumulators(shards[3:])])
+        whole = LengthAccumulator(lens)
+        (values, counts) = whole.length_counts()
+        for merged in [left, right, nested]:
+            self.assertEqual(values.tolist(), merged.length_counts()[0].tolist())
+            self.assertEqual(counts.tolist(), merged.length_counts()[1].tolist())
+        self.assertEqual(sorted(lens, reverse=True), left.sorted_lens().tolist())
+
+    def test_composition(self):
+        seq_bytes = b"ACGTNNacgtRY\nggcc\r\n"
+        byte_counts = np.bincount(np.frombuffer(seq_bytes, dtype=np.uint8), minlength=256)
+        self.assertEqual((16, 8, 4, 8), composition_from_byte_counts(byte_counts))
+
+        composition = ContigComposition([10, 40, 0, 40], [5, 10, 0, 40], [0, 20, 0, 0], [10, 0, 0, 4])
+        sorted_composition = composition.sorted_by_length()
+        self.assertEqual([40, 40, 10, 0], sorted_composition.lens.tolist())
+        self.assertEqual([10, 40, 5, 0], sorted_composition.gc_counts.tolist())
+        gc_percs = composition.gc_percs()
+        self.assertEqual([50.0, 50.0, 100.0], gc_percs[[0, 1, 3]].tolist())
+        self.assertTrue(np.isnan(gc_percs[2]))
+        self.assertEqual([0.0, 50.0, 0.0], composition.ambig_percs()[[0, 1, 3]].tolist())
+        (gc_perc, ambig_count, softmask_perc, ambig_contig_count) = composition.summary()
+        self.assertAlmostEqual(100.0 * 55 / 70, gc_perc)
+        self.assertEqual((20, 1), (ambig_count, ambig_contig_count))
+        self.assertAlmostEqual(100.0 * 14 / 90, softmask_perc)
+        self.assertEqual((None, 0, None, 0), ContigComposition().summary())
+
+        stats = AssemblyStats('comp', None, composition=composition)
+        self.assertEqual([40, 40, 10, 0], stats.lens.tolist())
+        self.assertEqual([20, 0, 0, 0], stats.composition.ambig_counts.tolist())
+
+        # sorted uint32 columns (as from the stats cache) are used in place and give the same stats
+        cached_columns = [getattr(stats.composition, column).astype(np.uint32) for column in ContigComposition.columns]
+        cached_stats = AssemblyStats('comp', None, stats.percs, stats.len_buckets, ContigComposition(*cached_columns),
+                                     presorted=True)
+        self.assertIs(cached_columns[0], cached_stats.lens)
+        self.assertEqual(np.int64, cached_stats.cumulative_lens.dtype)
+        self.assertEqual((stats.N, stats.L, stats.bucket_counts, stats.bucket_lens),
+                         (cached_stats.N, cached_stats.L, cached_stats.bucket_counts, cached_stats.bucket_lens))
+        self.assertEqual(stats.composition.summary(), cached_stats.composition.summary())
+        self.assertEqual(stats.composition.perc_histogram('gc_percs').tolist(),
+                         cached_stats.composition.perc_histogram('gc_percs', block_size=3).tolist())
+        self.assertEqual([40, 40, 10], cached_stats.window_values(1, 10**20)[0][::-1].tolist())
+        unsigned_composition = ContigComposition(*[np.asarray(getattr(composition, column), dtype=np.uint32)
+                                                   for column in ContigComposition.columns])
+        self.assertEqual(sorted_composition.gc_counts.tolist(), unsigned_composition.sorted_by_length().gc_counts.tolist())
+
+        perc_counts = perc_histogram([0.0, 0.5, 1.0, 99.9, 100.0, float('nan')], num_bins=10)
+        self.assertEqual([3, 0, 0, 0, 0, 0, 0, 0, 0, 2], perc_counts.tolist())
+
+    def test_length_sketch(self):
+        random.seed(7)
+        lens = [random.randint(1, 3000) for i in range(20000)] + [int(random.lognormvariate(9, 1.5))+1 for i in range(2000)]
+        columns = [lens, [l // 2 for l in lens], [l % 3 for l in lens], [l // 4 for l in lens]]
+        composition = ContigComposition(*columns)
+        exact = AssemblyStats('exact', None, [1, 10, 50, 90, 100], composition=composition)
+        for rel_err in [0.01, 0.05]:
+            sketches = [sketch_from_columns([column[i::3] for column in columns], rel_err, DEFAULT_LEN_BUCKETS, chunk_size=1000)
+                        for i in range(3)]
+            approx = ApproxAssemblyStats('approx', merge_sketches(sketches, rel_err, DEFAULT_LEN_BUCKETS), [1, 10, 50, 90, 100])
+            self.assertTrue(approx.approximate)
+            self.assertEqual((exact.num_contigs, exact.total_len, exact.max_len),
+                             (approx.num_contigs, approx.total_len, approx.max_len))
+            self.assertEqual((exact.bucket_counts, exact.bucket_lens), (approx.bucket_counts, approx.bucket_lens))
+            self.assertEqual(composition.summary(), approx.composition.summary())
+            for perc_method in COMPOSITION_PERC_METHODS:
+                self.assertEqual(composition.perc_histogram(perc_method).tolist(),
+                                 approx.composition.perc_histogram(perc_method).tolist())
+            for perc in exact.percs:
+                self.assertLessEqual(abs(approx.N[perc] - exact.N[perc]), rel_err * exact.N[perc] + 0.5)
+                self.assertLessEqual(abs(approx.L[perc] - exact.L[perc]), 0.1 * exact.L[perc] + 1)
+            (step_lens, step_counts, step_cumulative_lens) = approx.length_steps()
+            self.assertEqual((exact.max_len, exact.num_contigs, exact.total_len),
+                             (step_lens[0], step_counts[-1], step_cumulative_lens[-1]))
+            self.assertTrue(np.all(step_lens[:-1] > step_lens[1:]))
+            self.assertEqual(exact.num_contigs, int(plan_histogram_bins(1, 10**12, 1000, 70).count([approx.window_values(1, 10**12)]).sum()))
+            # lengths without composition, in chunks or as a single cached column, sketch the same
+            length_sketches = [merge_sketches([LengthSketch(rel_err).add_lengths(lens[beg:beg+300]) for beg in range(0, len(lens), 300)],
+                                              rel_err, DEFAULT_LEN_BUCKETS),
+                               sketch_from_columns([exact.lens], rel_err, DEFAULT_LEN_BUCKETS)]
+            for length_sketch in length_sketches:
+                self.assertEqual(merge_sketches(sketches, rel_err, DEFAULT_LEN_BUCKETS).bin_counts.tolist(),
+                                 length_sketch.bin_counts.tolist())
+                self.assertEqual((exact.num_contigs, exact.total_len, exact.max_len),
+                                 (length_sketch.num_contigs, length_sketch.total_len, length_sketch.max_len))
+
+        # Nx in the longest bin is its representative, not max_len from the top of the bin
+        top_lens = np.array([1119, 1097, 1097, 1097])
+        top_sketch = LengthSketch(0.01).add(ContigComposition(top_lens, np.zeros(4), np.zeros(4), np.zeros(4)))
+        self.assertEqual(1, np.count_nonzero(top_sketch.bin_counts))
+        exact = AssemblyStats('exact', top_lens, [50, 90, 100])
+        approx = ApproxAssemblyStats('approx', top_sketch, [50, 90, 100])
+        for perc in exact.percs:
+            self.assertLessEqual(abs(approx.N[perc] - exact.N[perc]), 0.01 * exact.N[perc] + 0.5)
+        self.assertEqual(1119, approx.length_steps()[0][0])
+
+        # memory is fixed by the error bound, not the input
+        self.assertEqual(LengthSketch(0.01).num_bins, sketch_from_columns(columns, 0.01, DEFAULT_LEN_BUCKETS).bin_counts.size)
+        self.assertEqual((0, 0, [0, 0]), (ApproxAssemblyStats('empty', LengthSketch()).num_contigs,
+                                          LengthSketch().total_len, LengthSketch().nx_lx([50, 90])[0].tolist()))
+        with self.assertRaises(ValueError):
+            LengthSketch(0.01).merge(LengthSketch(0.02))
+        self.assertEqual(0.01, parse_approx_error_perc(None))
+        self.assertEqual(0.005, parse_approx_error_perc('0.5'))
+        for bad_perc in [0, -1, 50, 'many']:
+            with self.assertRaises(ValueError):
+                parse_approx_error_perc(bad_perc)
+
+    def test_nx_curve_table(self):
+        scratch = tempfile.mkdtemp()
+        try:
+            assembly_stats = [AssemblyStats('a', [100, 400, 300, 200]), AssemblyStats('b', [])]
+            (N, L) = assembly_stats[0].nx_curve()
+            self.assertEqual(100, len(N))
+            self.assertEqual((400, 1), (N[39], L[39]))
+            self.assertEqual((300, 2), (N[40], L[40]))
+            self.assertEqual((100, 4), (N[99], L[99]))
+            table_path = os.path.join(scratch, 'nx_curve.tsv')
+            write_nx_curve_table(table_path, assembly_stats, [50, 100])
+            with open(table_path, 'r') as table_handle:
+                self.assertEqual("x\tN(a)\tL(a)\tN(b)\tL(b)\n" +
+                                 "50\t300\t2\t0\t0\n" +
+                                 "100\t100\t4\t0\t0\n",
+                                 table_handle.read())
+        finally:
+            shutil.rmtree(scratch)